@@ -0,0 +1,474 @@
+""" Benchmarks of the CSO Classifier, measuring the time and the memory of its components on the real ontology and
+model (which must be set up, see CSOClassifier.setup). They are not part of the package: run them from the root of the
+repository, e.g., python -c "from benchmarks.benchmark import benchmark_enhancement; benchmark_enhancement()".
+The equivalence of the optimised functions with the ones they replaced is tested in tests/.
+"""
+import json
+import math
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+from itertools import islice
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from cso_classifier.ontology import Ontology, UNREACHABLE_DISTANCE
+from cso_classifier.misc import chunks, get_similar_strings, get_resident_memory, get_unique_memory, print_header
+
+
+def benchmark_distance_oracle(samples: int = 100000, cso: Optional[Ontology] = None) -> None:
+    """ Functionality that reports the memory footprint of the distance oracle of the ontology and
+    cross-checks its distances against the ones computed by igraph (shortest_paths_dijkstra).
+
+    Args:
+        samples (int, optional): Number of random pairs of topics to cross-check. Defaults to 100000.
+        cso (Optional[Ontology], optional): The ontology to analyse. If None, it will be loaded.
+    """
+    if cso is None:
+        cso = Ontology(silent = True)
+    cso.read_distance_oracle()
+
+    print_header("DISTANCE ORACLE: MEMORY FOOTPRINT")
+    num_topics = len(cso.topics)
+    print("Topics: {}".format(num_topics))
+    print("Stored pairs: {}".format(cso.distances.size))
+    print("Size on disk: {:.1f} MB (uint8, memory-mapped)".format(os.path.getsize(cso.config.get_cso_distances_path()) / 2**20))
+    print("Full square matrix would take: {:.1f} MB as uint8, {:.1f} MB as int64".format(num_topics**2 / 2**20, num_topics**2 * 8 / 2**20))
+    print("Graph pickle (igraph) on disk: {:.1f} MB".format(os.path.getsize(cso.config.get_cso_graph_path()) / 2**20))
+
+    print_header("DISTANCE ORACLE: CROSS-CHECK")
+    topics = list(cso.topics.keys())
+    graph = cso.get_ontology_graph()
+    pairs = [(random.choice(topics), random.choice(topics)) for _ in range(samples)]
+
+    start = time.perf_counter()
+    expected = list()
+    for first_topic, second_topic in pairs:
+        distance = graph.shortest_paths_dijkstra(first_topic, second_topic)[0][0]
+        expected.append(99 if np.isinf(distance) or distance >= UNREACHABLE_DISTANCE else int(distance))
+    igraph_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    topic_ids = cso.get_topic_ids([topic for pair in pairs for topic in pair]).reshape(-1, 2)
+    found = [int(cso.get_graph_distances_in_topics(list(pair))[0][1]) for pair in pairs]
+    oracle_time = time.perf_counter() - start
+
+    mismatches = sum(1 for exp, fnd in zip(expected, found) if exp != fnd)
+    print("Checked pairs: {} ({} with the same topic)".format(samples, int((topic_ids[:, 0] == topic_ids[:, 1]).sum())))
+    print("Mismatches: {}".format(mismatches))
+    print("shortest_paths_dijkstra: {:.2f}s, distance oracle: {:.2f}s".format(igraph_time, oracle_time))
+
+
+def benchmark_similar_topics(samples: int = 200000, cso: Optional[Ontology] = None) -> None:
+    """ Functionality that cross-checks the string similarity used to promote topics in the post-processing
+    module (misc.get_similar_strings) against strsimpy's MetricLCS, on random pairs of labels, and compares
+    their running times. It requires the strsimpy package.
+
+    Args:
+        samples (int, optional): Number of random pairs of labels to cross-check. Defaults to 200000.
+        cso (Optional[Ontology], optional): The ontology providing the labels. If None, it will be loaded.
+    """
+    try:
+        from strsimpy.metric_lcs import MetricLCS
+    except ImportError:
+        raise ImportError("This benchmark requires strsimpy. Please run 'pip install strsimpy'.")
+
+    if cso is None:
+        cso = Ontology(silent = True)
+
+    print_header("STRING SIMILARITY: CROSS-CHECK WITH MetricLCS")
+    topics = list(cso.topics.keys())
+    alphabet = "abcdefghijklmnopqrstuvwxyz "
+
+    def mutate(label: str) -> str:
+        characters = list(label)
+        for _ in range(random.randint(0, max(1, len(characters) // 2))):
+            operation = random.random()
+            position = random.randint(0, len(characters))
+            if operation < 0.4 and len(characters) > 0 and position < len(characters):
+                del characters[position]
+            elif operation < 0.7:
+                characters.insert(position, random.choice(alphabet))
+            elif position < len(characters):
+                characters[position] = random.choice(alphabet)
+        return "".join(characters)
+
+    pairs = list()
+    for _ in range(samples):
+        first = random.choice(topics)
+        second = mutate(first) if random.random() < 0.5 else random.choice(topics)
+        pairs.append((first, second))
+
+    metric_lcs = MetricLCS()
+    start = time.perf_counter()
+    expected = [metric_lcs.distance(first, second) < 0.5 for first, second in pairs]
+    metric_lcs_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    found = [len(get_similar_strings([first], [second], 0.5)) > 0 for first, second in pairs]
+    fast_time = time.perf_counter() - start
+
+    mismatches = sum(1 for exp, fnd in zip(expected, found) if exp != fnd)
+    print("Checked pairs: {} ({} similar)".format(samples, sum(expected)))
+    print("Mismatches: {}".format(mismatches))
+    print("MetricLCS: {:.2f}s, get_similar_strings: {:.2f}s".format(metric_lcs_time, fast_time))
+
+
+def benchmark_enhancement(sizes: Optional[list] = None, repetitions: int = 5, cso: Optional[Ontology] = None) -> None:
+    """ Functionality that measures the time taken to enhance (climb_ontology) sets of topics of increasing
+    size, with both the 'first' and 'all' strategies. For 'all', it also runs the previous fixed-point
+    iteration (get_broader_of_topics until no more broaders are found) and checks that both return the same broaders.
+
+    Args:
+        sizes (Optional[list], optional): Sizes of the random sets of topics. Defaults to [10, 100, 1000, 10000].
+        repetitions (int, optional): Number of random sets for each size. Defaults to 5.
+        cso (Optional[Ontology], optional): The ontology to analyse. If None, it will be loaded.
+    """
+    if sizes is None:
+        sizes = [10, 100, 1000, 10000]
+    if cso is None:
+        cso = Ontology(silent = True)
+
+    def fixed_point(found_topics: list) -> dict:
+        all_broaders = dict()
+        while True:
+            all_broaders_back = {topic: set(narrowers) for topic, narrowers in all_broaders.items()}
+            all_broaders = cso.get_broader_of_topics(found_topics, all_broaders)
+            if all_broaders_back == all_broaders:
+                break
+        return all_broaders
+
+    print_header("ENHANCEMENT: 'first' VS 'all'")
+    topics = list(cso.topics.keys())
+    cso.get_all_broaders_of_topics(topics[:1]) # builds the ancestor closure
+    for size in sizes:
+        timings = {"first": 0.0, "all": 0.0, "fixed-point": 0.0}
+        mismatches = 0
+        for _ in range(repetitions):
+            found_topics = random.sample(topics, min(size, len(topics)))
+
+            start = time.perf_counter()
+            cso.climb_ontology(found_topics, 'first')
+            timings["first"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            cso.climb_ontology(found_topics, 'all')
+            timings["all"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            expected = fixed_point(found_topics)
+            timings["fixed-point"] += time.perf_counter() - start
+            mismatches += int(expected != cso.get_all_broaders_of_topics(found_topics))
+
+        print("Topics: {:>6} | first: {:.4f}s | all: {:.4f}s | all (fixed-point): {:.4f}s | mismatches: {}".format(
+            size, timings["first"] / repetitions, timings["all"] / repetitions, timings["fixed-point"] / repetitions, mismatches))
+
+
+STARTUP_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+from cso_classifier import CSOClassifier, Ontology
+from cso_classifier.ontology import COMPONENTS
+imported = time.perf_counter()
+imported_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+parameters = json.loads(sys.argv[1])
+if parameters is None:
+    Ontology(silent = True, components = list(COMPONENTS))
+else:
+    CSOClassifier(**parameters, silent = True)._load_resources()
+loaded = time.perf_counter()
+print(json.dumps({"import": imported - start, "load": loaded - imported, "imported_rss": imported_rss, "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+
+def benchmark_startup(configurations: Optional[Dict[str, Any]] = None) -> None:
+    """ Functionality that measures, for different configurations of the classifier, the time taken to load the
+    resources (ontology and model) and the peak resident memory of the process. Each configuration runs in a fresh
+    interpreter, loading only the components it needs (see CSOClassifier.get_required_components).
+    The configuration None loads all the components of the ontology, for comparison.
+
+    Args:
+        configurations (Optional[Dict[str, Any]], optional): The parameters of the classifier for each configuration, by name.
+    """
+    if configurations is None:
+        configurations = {"syntactic, no enhancement, no outliers": {"modules": "syntactic", "enhancement": "no", "delete_outliers": False},
+                          "syntactic, no outliers": {"modules": "syntactic", "delete_outliers": False},
+                          "syntactic": {"modules": "syntactic"},
+                          "semantic, no outliers": {"modules": "semantic", "delete_outliers": False},
+                          "both (default)": {},
+                          "both, full model": {"fast_classification": False},
+                          "ontology, all components": None}
+
+    print_header("STARTUP TIME AND MEMORY")
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for name, parameters in configurations.items():
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, json.dumps(parameters)], cwd=package_dir,
+                                capture_output=True, text=True, check=True).stdout
+        startup = json.loads(output.strip().splitlines()[-1])
+        unit = 2**10 if sys.platform != "darwin" else 2**20 # ru_maxrss is in kilobytes on Linux, bytes on macOS
+        print("{:<40} import: {:.2f}s | load: {:.2f}s | peak RSS: {:.1f} MB (+{:.1f} MB after import)".format(
+            name, startup["import"], startup["load"], startup["rss"] / unit, (startup["rss"] - startup["imported_rss"]) / unit))
+
+
+def benchmark_batch_memory(papers: Dict[str, Any], workers: int = 4, parameters: Optional[Dict[str, Any]] = None) -> None:
+    """ Functionality that runs the classifier in batch mode with workers loading their own resources and with workers
+    sharing the resources of the parent process (batch_run with share_resources), and reports the wall time and the
+    unique memory of each worker (see misc.get_unique_memory), which is available only on Linux.
+
+    Args:
+        papers (Dict[str, Any]): The papers to classify, by id.
+        workers (int, optional): Number of workers. Defaults to 4.
+        parameters (Optional[Dict[str, Any]], optional): The parameters of the classifier. Defaults to the default ones.
+    """
+    from cso_classifier.classifier import CSOClassifier
+
+    print_header("BATCH MODE: UNIQUE MEMORY OF THE WORKERS")
+    print("Start method: {}".format(multiprocessing.get_start_method()))
+    for share_resources in (False, True):
+        with CSOClassifier(**(parameters or dict()), silent = True) as classifier:
+            start = time.perf_counter()
+            classifier.batch_run(papers, workers = workers, share_resources = share_resources)
+            elapsed = time.perf_counter() - start
+            memory = list(classifier.workers_memory.values())
+            parent_memory = get_unique_memory()
+
+        if len(memory) == 0:
+            print("The unique memory of the workers cannot be measured on this platform.")
+            return
+        print("{:<24} time: {:.2f}s | workers: {} | unique memory per worker: {:.1f} MB (max {:.1f} MB) | total: {:.1f} MB | parent: {:.1f} MB".format(
+            "shared resources" if share_resources else "resources per worker", elapsed, len(memory),
+            sum(memory) / len(memory) / 2**20, max(memory) / 2**20, sum(memory) / 2**20, parent_memory / 2**20))
+
+
+def benchmark_batch_scaling(papers: Dict[str, Any], worker_counts: Optional[List[int]] = None,
+                            parameters: Optional[Dict[str, Any]] = None) -> None:
+    """ Functionality that runs the classifier in batch mode with a pool of processes and with a pool of threads
+    (batch_run with threads), for an increasing number of workers, and reports the throughput and the resident memory
+    of this process and of the worker processes, which is available only on Linux. The threads share one copy of the
+    ontology, the model and the spaCy pipeline, so their memory hardly grows with their number, while their throughput
+    depends on how much of the classification releases the GIL.
+
+    Args:
+        papers (Dict[str, Any]): The papers to classify, by id.
+        worker_counts (Optional[List[int]], optional): The numbers of workers to compare. Defaults to [1, 2, 4, 8].
+        parameters (Optional[Dict[str, Any]], optional): The parameters of the classifier. Defaults to the default ones.
+    """
+    from cso_classifier.classifier import CSOClassifier
+
+    print_header("BATCH MODE: PROCESSES VS THREADS")
+    print("Papers: {} | cores: {}".format(len(papers), os.cpu_count()))
+    for workers in worker_counts or [1, 2, 4, 8]:
+        for threads in (False, True):
+            with CSOClassifier(**(parameters or dict()), silent = True) as classifier:
+                classifier.batch_run(dict(islice(papers.items(), workers)), workers = workers, threads = threads) # warming up
+                start = time.perf_counter()
+                classifier.batch_run(papers, workers = workers, threads = threads)
+                elapsed = time.perf_counter() - start
+                memory = [get_resident_memory()] + [get_resident_memory(pid) for pid in classifier.workers_memory]
+
+            if None in memory:
+                print("The resident memory cannot be measured on this platform.")
+                return
+            print("{:<10} workers: {:>2} | time: {:.2f}s | throughput: {:.1f} papers/s | resident memory: {:.1f} MB".format(
+                "threads" if threads else "processes", workers, elapsed, len(papers) / elapsed, sum(memory) / 2**20))
+
+
+def benchmark_batch_scheduling(papers: Dict[str, Any], workers: int = 4, parameters: Optional[Dict[str, Any]] = None,
+                               long_papers: float = 0.1, length_factor: int = 10) -> None:
+    """ Functionality that compares, on a corpus with skewed lengths, the scheduling of batch_run (small tasks of similar
+    estimated cost, the most expensive first, assigned to the workers as soon as they are free) with the previous static
+    scheduling (one equal chunk of papers per worker). It reports the wall time and the utilisation of the workers,
+    i.e., the processor time they spent classifying divided by the wall time and the number of workers.
+    The corpus is created from the given papers, by making the last ones (long_papers) length_factor times longer.
+
+    Args:
+        papers (Dict[str, Any]): The papers to classify, by id.
+        workers (int, optional): Number of workers. Defaults to 4.
+        parameters (Optional[Dict[str, Any]], optional): The parameters of the classifier. Defaults to the default ones.
+        long_papers (float, optional): Fraction of papers to make longer. Defaults to 0.1.
+        length_factor (int, optional): How many times longer these papers become. Defaults to 10.
+    """
+    from cso_classifier.classifier import CSOClassifier, _run_worker
+
+    def lengthen(value: Any) -> Any:
+        if isinstance(value, str):
+            return " ".join([value] * length_factor)
+        if isinstance(value, list):
+            return value * length_factor
+        return value
+
+    first_long = int(len(papers) * (1 - long_papers))
+    corpus = dict()
+    for position, (paper_id, paper) in enumerate(papers.items()):
+        if position < first_long:
+            corpus[paper_id] = paper
+        elif isinstance(paper, dict):
+            corpus[paper_id] = {key: lengthen(value) for key, value in paper.items()}
+        else:
+            corpus[paper_id] = lengthen(paper)
+
+    print_header("BATCH MODE: SCHEDULING ON A LENGTH-SKEWED CORPUS")
+    print("Papers: {} ({} of them {} times longer) | workers: {} | cores: {}".format(len(corpus), len(corpus) - first_long, length_factor, workers, os.cpu_count()))
+    with CSOClassifier(**(parameters or dict()), silent = True) as classifier:
+        classifier.batch_run(dict(list(corpus.items())[:workers]), workers = workers) # starts the workers
+
+        start = time.perf_counter()
+        outputs = classifier.get_pool(workers).map(_run_worker, list(chunks(corpus, math.ceil(len(corpus) / workers))))
+        static_time = time.perf_counter() - start
+        static_busy = sum(output["time"] for output in outputs)
+
+        start = time.perf_counter()
+        classifier.batch_run(corpus, workers = workers)
+        dynamic_time = time.perf_counter() - start
+        dynamic_busy = sum(classifier.workers_time.values())
+
+    print("{:<40} time: {:.2f}s | utilisation: {:.0%}".format("static (one chunk per worker)", static_time, static_busy / (static_time * workers)))
+    print("{:<40} time: {:.2f}s | utilisation: {:.0%}".format("dynamic (cost-ordered small tasks)", dynamic_time, dynamic_busy / (dynamic_time * workers)))
+
+
+def benchmark_service(papers: Dict[str, Any], clients: int = 16, requests_per_client: int = 50, workers: int = 2,
+                      configurations: Optional[Dict[str, Dict[str, Any]]] = None, parameters: Optional[Dict[str, Any]] = None) -> None:
+    """ Functionality that starts the HTTP classification service locally and sends it single-paper requests from
+    concurrent clients (each one sending its next request when the previous one is answered). For each configuration of
+    the micro-batching, it reports the throughput, the latency percentiles and the mean size of the batches.
+
+    Args:
+        papers (Dict[str, Any]): The papers sent by the clients, in turn.
+        clients (int, optional): Number of concurrent clients. Defaults to 16.
+        requests_per_client (int, optional): Number of requests sent by each client. Defaults to 50.
+        workers (int, optional): Number of workers of the service. Defaults to 2.
+        configurations (Optional[Dict[str, Dict[str, Any]]], optional): max_batch_size and max_wait (seconds) of each
+            configuration, by name. Defaults to no batching and to batches of up to 32 papers waiting up to 5 ms.
+        parameters (Optional[Dict[str, Any]], optional): The parameters of the classifier. Defaults to the default ones.
+    """
+    import http.client
+    import threading
+    from cso_classifier.classifier import CSOClassifier
+    from cso_classifier.service import ClassificationService
+
+    if configurations is None:
+        configurations = {"no batching": {"max_batch_size": 1, "max_wait": 0.0},
+                          "micro-batching": {"max_batch_size": 32, "max_wait": 0.005}}
+    bodies = [json.dumps(paper).encode("utf-8") for paper in papers.values()]
+
+    print_header("HTTP SERVICE: MICRO-BATCHING")
+    print("Clients: {} | requests per client: {} | workers: {}".format(clients, requests_per_client, workers))
+    for name, configuration in configurations.items():
+        with CSOClassifier(**(parameters or dict()), silent = True) as classifier:
+            service = ClassificationService(("127.0.0.1", 0), classifier, workers, silent = True, **configuration)
+            server_thread = threading.Thread(target=service.serve_forever, daemon=True)
+            server_thread.start()
+            host, port = service.server_address[:2]
+
+            latencies = list()
+            lock = threading.Lock()
+
+            def client(number: int) -> None:
+                connection = http.client.HTTPConnection(host, port)
+                for request in range(requests_per_client):
+                    body = bodies[(number * requests_per_client + request) % len(bodies)]
+                    start = time.perf_counter()
+                    connection.request("POST", "/classify", body, {"Content-Type": "application/json"})
+                    connection.getresponse().read()
+                    with lock:
+                        latencies.append(time.perf_counter() - start)
+                connection.close()
+
+            client(0) # starts the workers
+            latencies.clear()
+            start = time.perf_counter()
+            threads = [threading.Thread(target=client, args=(number,)) for number in range(clients)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            statistics = service.batcher.get_statistics()
+
+            service.shutdown()
+            service.server_close()
+
+        latencies = np.array(latencies) * 1000
+        print("{:<20} throughput: {:.1f} papers/s | latency p50: {:.1f} ms, p95: {:.1f} ms, p99: {:.1f} ms | mean batch size: {:.1f}".format(
+            name, len(latencies) / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 95), np.percentile(latencies, 99),
+            statistics["mean_batch_size"]))
+
+
+def benchmark_lanes(papers: Dict[str, Any], workers: int = 2, bulk_clients: int = 2, bulk_size: int = 256,
+                    interactive_requests: int = 100, think_time: float = 0.02, parameters: Optional[Dict[str, Any]] = None) -> None:
+    """ Functionality that measures the latency of interactive (single-paper) requests to the HTTP classification service
+    while bulk clients keep it busy with large requests. It compares a single queue (every request in the bulk lane),
+    priority lanes without reserved workers, and priority lanes with one worker reserved to the interactive lane.
+
+    Args:
+        papers (Dict[str, Any]): The papers sent by the clients.
+        workers (int, optional): Number of workers of the service. Defaults to 2.
+        bulk_clients (int, optional): Number of clients sending bulk requests. Defaults to 2.
+        bulk_size (int, optional): Number of papers in each bulk request. Defaults to 256.
+        interactive_requests (int, optional): Number of interactive requests. Defaults to 100.
+        think_time (float, optional): Pause (seconds) between two interactive requests. Defaults to 0.02.
+        parameters (Optional[Dict[str, Any]], optional): The parameters of the classifier. Defaults to the default ones.
+    """
+    import http.client
+    import threading
+    from cso_classifier.classifier import CSOClassifier
+    from cso_classifier.service import ClassificationService
+
+    configurations = {"single queue": ("bulk", 0),
+                      "lanes": ("interactive", 0),
+                      "lanes, 1 reserved worker": ("interactive", 1)}
+    paper_list = list(papers.values())
+    bulk_body = json.dumps({"papers": {str(number): paper_list[number % len(paper_list)] for number in range(bulk_size)}}).encode("utf-8")
+
+    print_header("HTTP SERVICE: PRIORITY LANES")
+    print("Workers: {} | bulk clients: {} ({} papers per request) | interactive requests: {}".format(workers, bulk_clients, bulk_size, interactive_requests))
+    for name, (interactive_lane, reserved_workers) in configurations.items():
+        if reserved_workers >= workers:
+            continue
+        with CSOClassifier(**(parameters or dict()), silent = True) as classifier:
+            service = ClassificationService(("127.0.0.1", 0), classifier, workers, reserved_workers = reserved_workers, silent = True)
+            threading.Thread(target=service.serve_forever, daemon=True).start()
+            host, port = service.server_address[:2]
+            stopped = threading.Event()
+            bulk_papers = [0]
+            max_queued = [0]
+
+            def bulk_client() -> None:
+                connection = http.client.HTTPConnection(host, port)
+                while not stopped.is_set():
+                    connection.request("POST", "/classify?lane=bulk", bulk_body, {"Content-Type": "application/json"})
+                    connection.getresponse().read()
+                    bulk_papers[0] += bulk_size
+                connection.close()
+
+            threads = [threading.Thread(target=bulk_client) for _ in range(bulk_clients)]
+            for thread in threads:
+                thread.start()
+
+            start = time.perf_counter()
+            latencies = list()
+            connection = http.client.HTTPConnection(host, port)
+            for number in range(interactive_requests):
+                body = json.dumps(paper_list[number % len(paper_list)]).encode("utf-8")
+                request_start = time.perf_counter()
+                connection.request("POST", "/classify?lane={}".format(interactive_lane), body, {"Content-Type": "application/json"})
+                connection.getresponse().read()
+                latencies.append(time.perf_counter() - request_start)
+                max_queued[0] = max(max_queued[0], service.batcher.get_statistics()["lanes"]["bulk"]["queued_papers"])
+                time.sleep(think_time)
+            connection.close()
+            elapsed = time.perf_counter() - start
+
+            stopped.set()
+            for thread in threads:
+                thread.join()
+            service.shutdown()
+            service.server_close()
+
+        latencies = np.array(latencies) * 1000
+        print("{:<28} interactive latency p50: {:.1f} ms, p95: {:.1f} ms, p99: {:.1f} ms | bulk throughput: {:.1f} papers/s | max bulk queue: {} papers".format(
+            name, np.percentile(latencies, 50), np.percentile(latencies, 95), np.percentile(latencies, 99), bulk_papers[0] / elapsed, max_queued[0]))
@@ -1,10 +1,18 @@
-import math
-from functools import partial
-from multiprocessing.pool import Pool
-from typing import Any, Dict, List, Union
+import asyncio
+import gc
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from multiprocessing.pool import Pool, ThreadPool
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from update_checker import UpdateChecker
 
-from .misc import chunks, download_language_model, print_header, download_croissant_specification
+from .misc import download_language_model, print_header, download_croissant_specification, get_file_digest, get_unique_memory
 from .semanticmodule import Semantic as sema
 from .syntacticmodule import Syntactic as synt
 from .postprocmodule import PostProcess as post
@@ -13,6 +21,13 @@ from .model import Model as MODEL
 from .paper import Paper
 from .result import Result
 from .config import Config
+from .resources import ResourceHandle
+from .columnar import encode_results, decode_results
+from .sharedarrays import SharedArrays
+
+
+TASKS_PER_WORKER = 16   # in batch mode, the papers are split in about these many tasks per worker
+STREAM_TASK_SIZE = 8    # in streaming mode, the papers are sent to the workers in tasks of this size
 
 
 
@@ -58,13 +73,64 @@ class CSOClassifier:
 
         self.__check_parameters(parameters)
 
-        self.use_full_model = self.delete_outliers or not self.fast_classification
+        self.use_full_model = not self.fast_classification
+
+        self.resources = ResourceHandle(self._load_resources, self.silent) # ontology and model, loaded at the first run
+
+        self.pool = None        # pool of workers of batch_run, kept across calls (see close)
+        self.pool_key = None    # number of workers, threads or processes, sharing of resources and version of the resources of the pool (processes)
+        self.pool_resources = None  # resources of the parent process in use by the pool, when shared
+        self.pool_arrays = None     # arrays of the resources published in shared memory for the pool (spawn and forkserver)
+        self.workers_memory = dict()    # unique memory (bytes) of each worker process, by process id, after the last batch
+        self.workers_time = dict()      # processor time (seconds) spent by each worker, by process or thread id, in the last batch
+
+        self.async_settings = {"executor": "thread", "workers": os.cpu_count() or 1, "max_concurrency": None} # see configure_async
+        self.async_executor = None      # executor of the asynchronous functions, kept across calls (see close)
+        self.async_executor_key = None  # settings and version of the resources of the executor
+        self.async_semaphore = None     # event loop and semaphore limiting the concurrent requests in it
+        self.thread_state = threading.local()   # modules of each thread of the executor or of the thread pool
+        self.tagger = None                      # spaCy pipeline shared by the threads (see get_tagger)
+        self.tagger_lock = threading.Lock()
+
+
+    @property
+    def cso(self) -> CSO:
+        """The ontology currently in use (None if it is not loaded yet). Setting it replaces the ontology used by the
+        following requests, as reload does; if the model is not loaded yet, it is loaded when first needed."""
+        return self.resources.current.cso if self.resources.current is not None else None
+
+
+    @cso.setter
+    def cso(self, cso: CSO) -> None:
+        self.resources.set(cso = cso)
+
+
+    @property
+    def model(self) -> MODEL:
+        """The model currently in use (None if it is not loaded yet). Setting it replaces the model used by the
+        following requests, as reload does; if the ontology is not loaded yet, it is loaded when first needed."""
+        return self.resources.current.model if self.resources.current is not None else None
+
+
+    @model.setter
+    def model(self, model: MODEL) -> None:
+        self.resources.set(model = model)
+
 
-        self.models_loaded = False
-        self.cso = None
-        self.model = None
+    @property
+    def models_loaded(self) -> bool:
+        """Whether the ontology and the model are loaded. Setting it to False drops them, so that they are loaded
+        again by the following request; setting it to True loads them straight away, if needed."""
+        return self.resources.current is not None and self.resources.current.is_complete()
 
 
+    @models_loaded.setter
+    def models_loaded(self, models_loaded: bool) -> None:
+        if models_loaded:
+            self.resources.get()
+        else:
+            self.resources.unload()
+
 
     def run(self, paper: Union[Dict[str, str], str]) -> Dict[str, Any]:
         """Run the CSO Classifier.
@@ -84,51 +150,30 @@ class CSOClassifier:
             class_res (Dict[str, Any]): containing the result of each classification
         """
 
-        if not self.models_loaded:
-            # Loading ontology and model
-            self.cso = CSO(silent = self.silent)
-            self.model = MODEL(use_full_model=self.use_full_model, silent = self.silent)
-            self.models_loaded = True
-
-        t_paper = Paper(paper, self.modules)
-        result = Result(self.explanation, self.get_weights, self.filter_output)
-        
-
-            
-
-
-        # Passing parameters to the two classes (synt and sema) and actioning classifiers
+        # Loading ontology and model (the first time), and keeping them for the whole classification
+        with self.resources.acquire() as resources:
+            return self.__classify(resources.cso, resources.model, paper)
 
-        if self.modules in ('syntactic','both'):
-            synt_module = synt(self.cso, t_paper)
-            result.set_syntactic(synt_module.classify_syntactic())
-            if self.get_weights:
-                result.set_syntactic_topics_weights(synt_module.get_syntactic_topics_weights())
-            if self.explanation:
-                result.dump_temporary_explanation(synt_module.get_explanation())
-
-        if self.modules in ('semantic','both'):
-            sema_module = sema(self.model, self.cso, self.fast_classification, t_paper)
-            result.set_semantic(sema_module.classify_semantic())
-            if self.get_weights:
-                result.set_semantic_topics_weights(sema_module.get_semantic_topics_weights())
-            if self.explanation:
-                result.dump_temporary_explanation(sema_module.get_explanation())
 
+    def __classify(self, cso: CSO, model: MODEL, paper: Union[Dict[str, str], str]) -> Dict[str, Any]:
+        """Function that classifies one paper with the given ontology and model.
 
-        postprocess = post(self.model, 
-                           self.cso, 
-                           enhancement=self.enhancement, 
-                           result=result, 
-                           delete_outliers=self.delete_outliers, 
-                           get_weights=self.get_weights,
-                           filter_by=self.filter_by)
-        result = postprocess.process()
-
-        return result.get_dict()
+        Args:
+            cso (CSO): The ontology.
+            model (MODEL): The model.
+            paper (Union[Dict[str, str], str]): contains the metadata of the paper.
+        Returns:
+            class_res (Dict[str, Any]): containing the result of the classification
+        """
+        t_paper = Paper(paper, self.modules, tagger = self.get_tagger())
+        modules = {"syntactic": synt(cso),
+                   "semantic": sema(model, cso, self.fast_classification),
+                   "postprocess": post(model, cso, enhancement=self.enhancement, delete_outliers=self.delete_outliers,
+                                       get_weights=self.get_weights, filter_by=self.filter_by)}
+        return self._classify_paper(modules, t_paper)
 
 
-    def batch_run(self, papers: Dict[str, Any], workers: int = 1) -> Dict[str, Any]:
+    def batch_run(self, papers: Dict[str, Any], workers: int = 1, share_resources: bool = False, threads: bool = False) -> Dict[str, Any]:
         """Run the CSO Classifier in *BATCH MODE* and with multiprocessing.
 
         It takes as input a set of papers, which include abstract, title, and keywords and for each one of them returns a
@@ -141,30 +186,510 @@ class CSOClassifier:
             papers (Dict[str, Any]): contains the metadata of the papers, e.g., for each paper, there is title, abstract and
                     keywords {"id1":{"title": "","abstract": "","keywords": ""},"id2":{"title": "","abstract": "","keywords": ""}}.
             workers (int, optional): Number of workers for multiprocessing. Defaults to 1.
+                    The workers are kept alive (with their ontology and model) for the following calls, until close is called.
+            share_resources (bool, optional): If True, the ontology and the model are loaded once by this process and the
+                    workers share them instead of loading their own copy (see get_pool). Defaults to False.
+            threads (bool, optional): If True, the workers are threads of this process, sharing a single copy of the
+                    ontology, the model and the spaCy pipeline. Defaults to False.
         Returns:
             class_res (Dict[str, Any]): containing the result of each classification
         """
 
-        if not isinstance(workers, int):
-            raise TypeError("Number of workers must be integer. Got %s instead." % type(workers).__name__)
-
-        if workers < 1:
-            raise ValueError("Number of workers must be equal or greater than 1")
+        self.__check_workers(workers)
 
+        # Splitting the corpus in small tasks, starting from the most expensive, which are then assigned to the
+        # workers as soon as they are free
+        tasks = self.get_batch_tasks(papers, workers * TASKS_PER_WORKER)
 
-        size_of_corpus = len(papers)
-        chunk_size = math.ceil(size_of_corpus / workers)
-        papers_list = list(chunks(papers, chunk_size))
-        annotate = partial(self._batch_run_single_worker)
+        results = dict()
+        self.workers_memory = dict()
+        self.workers_time = dict()
+        for output in self.get_pool(workers, share_resources, threads).imap_unordered(self.__get_task_function(threads), tasks):
+            results.update(_get_results(output))
+            if output["memory"] is not None:
+                self.workers_memory[output["worker"]] = output["memory"]
+            self.workers_time[output["worker"]] = self.workers_time.get(output["worker"], 0.0) + output["time"]
 
-        with Pool(workers) as p_w:
-            result = p_w.map(annotate, papers_list)
+        if not self.silent and len(self.workers_memory) > 0:
+            print("Unique memory of the workers: {}".format(", ".join("{:.1f} MB".format(memory / 2**20) for memory in self.workers_memory.values())))
 
-        class_res = {k: v for d in result for k, v in d.items()}
+        class_res = {paper_id: results[paper_id] for paper_id in papers}
 
         return class_res
 
 
+    def classify_stream(self, papers: Iterable[Tuple[str, Any]], workers: int = 1, ordered: bool = True,
+                        max_in_flight: Optional[int] = None, share_resources: bool = False,
+                        threads: bool = False) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Run the CSO Classifier in *STREAMING MODE* and with multiprocessing.
+
+        It takes as input an iterable of papers, e.g., read lazily from a file, and yields their results as soon as
+        they are available. The papers are read from the iterable only when there is room for them: at most
+        max_in_flight papers are being classified (or waiting to be yielded) at any time, so the memory used does not
+        depend on the size of the corpus. The workers are the same used by batch_run.
+        Unlike in batch_run, the ids of the papers do not need to be unique: each pair is classified, and its result
+        yielded, once, whether its id has already occurred or not.
+
+        Args:
+            papers (Iterable[Tuple[str, Any]]): pairs of paper id and metadata of the paper, e.g., ("id1", {"title": "",
+                    "abstract": "","keywords": ""}).
+            workers (int, optional): Number of workers for multiprocessing. Defaults to 1.
+            ordered (bool, optional): If True, the results are yielded in the same order of the papers; otherwise, in
+                    the order in which they are completed. Defaults to True.
+            max_in_flight (Optional[int], optional): Maximum number of papers being classified at any time.
+                    Defaults to 4 tasks of STREAM_TASK_SIZE papers per worker.
+            share_resources (bool, optional): If True, the workers share the resources of this process (see batch_run).
+                    Defaults to False.
+            threads (bool, optional): If True, the workers are threads of this process (see batch_run). Defaults to False.
+        Yields:
+            Iterator[Tuple[str, Dict[str, Any]]]: pairs of paper id and result of its classification.
+        """
+        self.__check_workers(workers)
+        if max_in_flight is None:
+            max_in_flight = 4 * STREAM_TASK_SIZE * workers
+        if not isinstance(max_in_flight, int) or max_in_flight < 1:
+            raise ValueError("The maximum number of papers in flight must be an integer equal or greater than 1")
+
+        pool = self.get_pool(workers, share_resources, threads)
+        task_function = self.__get_task_function(threads)
+        task_size = max(1, min(STREAM_TASK_SIZE, max_in_flight // workers))
+        papers = iter(papers)
+        pending = deque()           # tasks sent to the workers, in order (ordered mode)
+        completed = queue.Queue()   # outputs of the completed tasks (unordered mode)
+        in_flight = 0
+
+        while True:
+            # Sending new tasks while there is room for them
+            while in_flight < max_in_flight:
+                window = list(islice(papers, min(task_size, max_in_flight - in_flight)))
+                if len(window) == 0:
+                    break
+                in_flight += len(window)
+                for task in self.__get_stream_tasks(window):
+                    if ordered:
+                        pending.append(pool.apply_async(task_function, (task,)))
+                    else:
+                        pool.apply_async(task_function, (task,), callback=completed.put, error_callback=completed.put)
+            if in_flight == 0:
+                break
+
+            # Waiting for the first task (ordered mode) or any task (unordered mode) to complete
+            if ordered:
+                output = pending.popleft().get()
+            else:
+                output = completed.get()
+                if isinstance(output, BaseException):
+                    raise output
+            results = _get_results(output)
+            in_flight -= len(results)
+            yield from results.items()
+
+
+    @staticmethod
+    def __get_stream_tasks(window: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+        """Function that splits the papers read by classify_stream into tasks, i.e., dicts of papers by id. A new task
+        starts at each id already in the current one, so that no paper is dropped (as in a dict) when an id repeats.
+
+        Args:
+            window (List[Tuple[str, Any]]): pairs of paper id and metadata of the paper.
+        Returns:
+            List[Dict[str, Any]]: the tasks, with the papers in the same order (a single task if the ids are unique).
+        """
+        tasks = [dict()]
+        for paper_id, paper in window:
+            if paper_id in tasks[-1]:
+                tasks.append(dict())
+            tasks[-1][paper_id] = paper
+        return tasks
+
+
+    def configure_async(self, executor: str = "thread", workers: Optional[int] = None, max_concurrency: Optional[int] = None) -> None:
+        """Function that configures the asynchronous functions (arun, abatch_run and aclassify_stream).
+
+        Args:
+            executor (str, optional): Either "thread" or "process". With "thread" the papers are classified by a pool of
+                    threads of this process, sharing its ontology and model. With "process" they are classified by a pool
+                    of processes, each one loading the ontology and the model once. Defaults to "thread".
+            workers (Optional[int], optional): Number of threads or processes. Defaults to the number of processors.
+            max_concurrency (Optional[int], optional): Maximum number of papers being classified at any time; the
+                    following requests wait for their turn. Defaults to four times the number of workers.
+        """
+        if executor not in ("thread", "process"):
+            raise ValueError("Field executor must be 'thread' or 'process'")
+        workers = workers if workers is not None else os.cpu_count() or 1
+        self.__check_workers(workers)
+        if max_concurrency is not None and (not isinstance(max_concurrency, int) or max_concurrency < 1):
+            raise ValueError("The maximum number of concurrent requests must be an integer equal or greater than 1")
+
+        self.async_settings = {"executor": executor, "workers": workers, "max_concurrency": max_concurrency}
+        self.async_semaphore = None
+
+
+    async def arun(self, paper: Union[Dict[str, str], str]) -> Dict[str, Any]:
+        """Run the CSO Classifier without blocking the event loop: the paper is classified by the executor set with
+        configure_async. If the request is cancelled before the classification starts, the paper is not classified.
+
+        Args:
+            paper (Union[Dict[str, str], str]): contains the metadata of the paper, e.g., title, abstract and keywords {"title": "",
+                        "abstract": "","keywords": ""} or a string representation.
+        Returns:
+            class_res (Dict[str, Any]): containing the result of the classification
+        """
+        results = await self.__aclassify({"paper": paper})
+        return results["paper"]
+
+
+    async def abatch_run(self, papers: Dict[str, Any]) -> Dict[str, Any]:
+        """Run the CSO Classifier in *BATCH MODE* without blocking the event loop. The papers are classified concurrently
+        by the executor set with configure_async, within its maximum concurrency.
+
+        Args:
+            papers (Dict[str, Any]): contains the metadata of the papers, by id.
+        Returns:
+            class_res (Dict[str, Any]): containing the result of each classification
+        """
+        results = dict()
+        async for paper_id, result in self.aclassify_stream(papers.items()):
+            results[paper_id] = result
+        return {paper_id: results[paper_id] for paper_id in papers}
+
+
+    async def aclassify_stream(self, papers: Union[Iterable[Tuple[str, Any]], AsyncIterable[Tuple[str, Any]]],
+                               ordered: bool = False) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Run the CSO Classifier in *STREAMING MODE* without blocking the event loop. It takes as input an iterable
+        (or asynchronous iterable) of papers and yields their results as soon as they are available. The papers are read
+        only when there is room for them within the maximum concurrency (see configure_async).
+        If the iteration is stopped or cancelled, the papers not yet started are not classified.
+
+        Args:
+            papers (Union[Iterable[Tuple[str, Any]], AsyncIterable[Tuple[str, Any]]]): pairs of paper id and metadata of the paper.
+            ordered (bool, optional): If True, the results are yielded in the same order of the papers; otherwise, in
+                    the order in which they are completed. Defaults to False.
+        Yields:
+            AsyncIterator[Tuple[str, Dict[str, Any]]]: pairs of paper id and result of its classification.
+        """
+        if not hasattr(papers, "__aiter__"):
+            papers = self.__to_async_iterator(papers)
+        papers = papers.__aiter__()
+        max_in_flight = self.__get_max_concurrency()
+        pending = deque()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < max_in_flight:
+                    try:
+                        paper_id, paper = await papers.__anext__()
+                    except StopAsyncIteration:
+                        exhausted = True
+                        break
+                    pending.append(asyncio.ensure_future(self.__aclassify({paper_id: paper})))
+                if len(pending) == 0:
+                    break
+
+                if ordered:
+                    done = [pending.popleft()]
+                    await done[0]
+                else:
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        pending.remove(task)
+                for task in done:
+                    for paper_id, result in task.result().items():
+                        yield paper_id, result
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+    @staticmethod
+    async def __to_async_iterator(papers: Iterable[Tuple[str, Any]]) -> AsyncIterator[Tuple[str, Any]]:
+        """Function that turns an iterable into an asynchronous iterator."""
+        for item in papers:
+            yield item
+
+
+    def __get_max_concurrency(self) -> int:
+        """Function that returns the maximum number of papers being classified at any time by the asynchronous functions."""
+        if self.async_settings["max_concurrency"] is not None:
+            return self.async_settings["max_concurrency"]
+        return 4 * self.async_settings["workers"]
+
+
+    async def __aclassify(self, papers: Dict[str, Any]) -> Dict[str, Any]:
+        """Function that classifies a set of papers with the executor of the asynchronous functions, waiting for a free
+        slot within their maximum concurrency.
+
+        Args:
+            papers (Dict[str, Any]): contains the metadata of the papers, by id.
+        Returns:
+            class_res (Dict[str, Any]): containing the result of each classification
+        """
+        loop = asyncio.get_running_loop()
+        if self.async_semaphore is None or self.async_semaphore[0] is not loop:
+            self.async_semaphore = (loop, asyncio.Semaphore(self.__get_max_concurrency()))
+
+        async with self.async_semaphore[1]:
+            executor = self.get_async_executor()
+            if self.async_settings["executor"] == "process":
+                output = await loop.run_in_executor(executor, _run_worker, papers)
+                return _get_results(output)
+            return await loop.run_in_executor(executor, self._classify_in_thread, papers)
+
+
+    def get_async_executor(self) -> Executor:
+        """Function that returns the executor of the asynchronous functions, set with configure_async. It is created the
+        first time and then kept, unless the settings change or, for processes, the resources have been reloaded.
+
+        Returns:
+            Executor: the pool of threads or processes.
+        """
+        settings = self.async_settings
+        executor_key = (settings["executor"], settings["workers"], self.resources.versions if settings["executor"] == "process" else None)
+        if self.async_executor is None or self.async_executor_key != executor_key:
+            if self.async_executor is not None:
+                self.async_executor.shutdown(wait=False)
+            if settings["executor"] == "process":
+                self.async_executor = ProcessPoolExecutor(settings["workers"], initializer=_initialise_worker, initargs=(self.get_parameters(),))
+            else:
+                self.async_executor = ThreadPoolExecutor(settings["workers"], thread_name_prefix="cso-classifier")
+            self.async_executor_key = executor_key
+        return self.async_executor
+
+
+    def _classify_in_thread(self, papers: Dict[str, Any]) -> Dict[str, Any]:
+        """Function that classifies a set of papers in a thread of the executor or of the thread pool. The ontology, the
+        model and the spaCy pipeline are the ones in use by the classifier, while the modules are created once per thread.
+
+        Args:
+            papers (Dict[str, Any]): contains the metadata of the papers, by id.
+        Returns:
+            class_res (Dict[str, Any]): containing the result of each classification
+        """
+        with self.resources.acquire() as resources:
+            if getattr(self.thread_state, "version", None) != resources.version:
+                self.thread_state.modules = self._create_batch_modules(resources.cso, resources.model, self.get_tagger())
+                self.thread_state.version = resources.version
+            return self._classify_batch(self.thread_state.modules, papers)
+
+
+    def _run_in_thread(self, papers: Dict[str, Any]) -> Dict[str, Any]:
+        """Function that classifies a set of papers in a thread of the thread pool (see get_pool), with the same output
+        of _run_worker, except that the results are not encoded. The memory of the threads is not measured, as it is the
+        one of this process.
+
+        Args:
+            papers (Dict[str, Any]): contains the metadata of the papers, by id.
+        Returns:
+            Dict[str, Any]: the result of each classification ('results'), the id of the thread ('worker'), no memory
+                ('memory') and the processor time spent by the thread on the task ('time').
+        """
+        start = time.thread_time()
+        class_res = self._classify_in_thread(papers)
+        return {"results": class_res, "worker": threading.get_ident(), "memory": None, "time": time.thread_time() - start}
+
+
+    def get_tagger(self) -> Any:
+        """Function that returns the spaCy pipeline shared by the threads, loading it the first time.
+
+        Returns:
+            Any: the spaCy pipeline (see Paper.load_tagger).
+        """
+        with self.tagger_lock:
+            if self.tagger is None:
+                self.tagger = Paper.load_tagger()
+            return self.tagger
+
+
+    def __get_task_function(self, threads: bool) -> Any:
+        """Function that returns the function classifying a task in the pool of workers.
+
+        Args:
+            threads (bool): If True, the workers are threads.
+        Returns:
+            Any: either _run_in_thread or _run_worker.
+        """
+        return self._run_in_thread if threads else _run_worker
+
+
+    @staticmethod
+    def get_batch_tasks(papers: Dict[str, Any], number_of_tasks: int) -> List[Dict[str, Any]]:
+        """Function that splits a set of papers into tasks of about the same estimated cost (see get_paper_cost).
+        The papers are sorted by decreasing cost, so the first tasks contain few expensive papers and the last ones
+        many cheap papers: when the tasks are assigned in this order, the longest work starts first and the short
+        tasks at the end keep all workers busy.
+
+        Args:
+            papers (Dict[str, Any]): contains the metadata of the papers, by id.
+            number_of_tasks (int): The number of tasks to create (fewer if there are fewer papers).
+        Returns:
+            List[Dict[str, Any]]: the tasks, each one containing some of the papers, by id.
+        """
+        costs = {paper_id: CSOClassifier.get_paper_cost(paper) for paper_id, paper in papers.items()}
+        budget = sum(costs.values()) / max(1, number_of_tasks)
+
+        tasks = list()
+        task, task_cost = dict(), 0
+        for paper_id in sorted(papers, key=costs.get, reverse=True):
+            task[paper_id] = papers[paper_id]
+            task_cost += costs[paper_id]
+            if task_cost >= budget:
+                tasks.append(task)
+                task, task_cost = dict(), 0
+        if len(task) > 0:
+            tasks.append(task)
+        return tasks
+
+
+    @staticmethod
+    def get_paper_cost(paper: Union[Dict[str, Any], str]) -> int:
+        """Function that estimates the cost of classifying a paper, as the length of its text.
+
+        Args:
+            paper (Union[Dict[str, Any], str]): contains the metadata of the paper, or a string representation.
+        Returns:
+            int: the estimated cost.
+        """
+        if isinstance(paper, dict):
+            return 1 + sum(len(value) if isinstance(value, str) else len(str(value)) for value in paper.values())
+        return 1 + len(str(paper))
+
+
+    def get_pool(self, workers: int, share_resources: bool = False, threads: bool = False) -> Pool:
+        """Function that returns the pool of workers used in batch mode. Each worker loads the ontology, the model and
+        the modules of the classifier once, when it starts, and reuses them for all the papers it receives. The pool is
+        created the first time and then kept, unless a different number of workers or sharing is requested or the
+        resources have been reloaded (see reload).
+
+        When resources are shared, they are loaded (once) by this process. With the fork start method, the modules are
+        created as well, and the workers are forked from it: they read the same memory pages until they write to them.
+        Before forking, the objects are moved out of the reach of the garbage collector (gc.freeze), so that its
+        bookkeeping does not copy those pages in each worker. With the spawn and forkserver start methods (see
+        multiprocessing.set_start_method), the arrays of the model are published in a shared memory segment, which the
+        workers attach to without copying it (see SharedArrays and Model.get_shared_arrays), while the arrays of the
+        ontology and the topic embeddings are memory-mapped from disk by each worker, and so shared as well. The segment
+        is released when the pool is closed.
+
+        When the workers are threads, there is a single copy of the resources and of the spaCy pipeline, the ones of
+        this process, and each thread creates only its own modules (see _classify_in_thread). As they are used only
+        for reading, the threads do not need to lock them. The threads are kept when the resources are reloaded, as they
+        switch to the new ones by themselves.
+
+        Args:
+            workers (int): Number of workers.
+            share_resources (bool, optional): If True, the workers share the resources of this process. Defaults to False.
+            threads (bool, optional): If True, the workers are threads rather than processes. Defaults to False.
+        Returns:
+            Pool: the pool of workers.
+        """
+        pool_key = (workers, threads, share_resources and not threads, multiprocessing.get_start_method(), None if threads else self.resources.versions)
+        if self.pool is None or self.pool_key != pool_key:
+            self.close()
+            if threads:
+                self.pool = self.create_pool(workers, threads=True)
+            elif share_resources and multiprocessing.get_start_method() == "fork":
+                self.pool_resources = self.resources.get()
+                self.pool_resources.acquire()
+                batch_modules = self._create_batch_modules(self.pool_resources.cso, self.pool_resources.model)
+                gc.collect()
+                gc.freeze()
+                try:
+                    self.pool = Pool(workers, initializer=_initialise_shared_worker, initargs=(self.get_parameters(), batch_modules))
+                finally:
+                    gc.unfreeze()
+            elif share_resources:
+                self.pool_resources = self.resources.get()
+                self.pool_resources.acquire()
+                try:
+                    self.pool_arrays = SharedArrays(self.pool_resources.model.get_shared_arrays())
+                    self.pool = Pool(workers, initializer=_initialise_shared_memory_worker, initargs=(self.get_parameters(), self.pool_arrays.get_descriptor()))
+                except BaseException:
+                    if self.pool_arrays is not None:
+                        self.pool_arrays.close()
+                        self.pool_arrays = None
+                    self.pool_resources.release()
+                    self.pool_resources = None
+                    raise
+            else:
+                self.pool = self.create_pool(workers)
+            self.pool_key = pool_key
+        return self.pool
+
+
+    def create_pool(self, workers: int, threads: bool = False) -> Pool:
+        """Function that creates a new pool of workers, which belongs to the caller: unlike the one of get_pool, it is not
+        replaced by the following calls of batch_run or classify_stream, nor stopped by close, so the caller has to
+        close it. Each worker process loads the ontology, the model and the modules of the classifier once, when it
+        starts; threads use the resources of this process (see _run_in_thread).
+
+        Args:
+            workers (int): Number of workers.
+            threads (bool, optional): If True, the workers are threads rather than processes. Defaults to False.
+        Returns:
+            Pool: the pool of workers.
+        """
+        self.__check_workers(workers)
+        if threads:
+            return ThreadPool(workers)
+        return Pool(workers, initializer=_initialise_worker, initargs=(self.get_parameters(),))
+
+
+    def close(self, wait: bool = True) -> None:
+        """Function that stops the workers used in batch mode and by the asynchronous functions (if any).
+
+        Args:
+            wait (bool, optional): If True, the workers complete their tasks before stopping; otherwise, they are
+                    stopped straight away (e.g., when the classification is interrupted). Defaults to True.
+        """
+        if self.pool is not None:
+            if wait:
+                self.pool.close()
+            else:
+                self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+            self.pool_key = None
+        if self.pool_arrays is not None:
+            self.pool_arrays.close()
+            self.pool_arrays = None
+        if self.pool_resources is not None:
+            self.pool_resources.release()
+            self.pool_resources = None
+        if self.async_executor is not None:
+            self.async_executor.shutdown(wait=wait, cancel_futures=not wait)
+            self.async_executor = None
+            self.async_executor_key = None
+
+
+    def __enter__(self) -> "CSOClassifier":
+        return self
+
+
+    def __exit__(self, *exception: Any) -> None:
+        self.close()
+
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """The pool of workers is not shared with the workers themselves """
+        state = self.__dict__.copy()
+        state["pool"] = None
+        state["pool_key"] = None
+        state["pool_resources"] = None
+        state["pool_arrays"] = None
+        state["async_executor"] = None
+        state["async_executor_key"] = None
+        state["async_semaphore"] = None
+        state["thread_state"] = None
+        state["tagger"] = None
+        state["tagger_lock"] = None
+        return state
+
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.thread_state = threading.local()
+        self.tagger_lock = threading.Lock()
+
+
     def _batch_run_single_worker(self, papers: Dict[str, Any]) -> Dict[str, Any]:
         """Run the CSO Classifier in *BATCH MODE*.
 
@@ -183,55 +708,177 @@ class CSOClassifier:
             class_res (Dict[str, Any]): containing the result of each classification
         """
 
-        cso = CSO(silent = self.silent)
-        model = MODEL(use_full_model=self.use_full_model, silent = self.silent)
-        paper = Paper(modules = self.modules)
+        return self._classify_batch(self._create_batch_modules(*self._load_resources()), papers)
+
 
+    def _create_batch_modules(self, cso: CSO, model: MODEL, tagger: Any = None) -> Dict[str, Any]:
+        """Function that creates the objects used to classify papers in batch mode, which are reused across papers:
+        the paper (with its language model), the syntactic and semantic modules, and the post-processing module.
+
+        Args:
+            cso (CSO): The ontology.
+            model (MODEL): The model.
+            tagger (Any, optional): The spaCy pipeline of the paper. Defaults to None, i.e., a new one is loaded.
+        Returns:
+            Dict[str, Any]: the objects, by name ('paper', 'syntactic', 'semantic', 'postprocess').
+        """
+        return {"paper": Paper(modules = self.modules, tagger = tagger),
+                "syntactic": synt(cso),
+                "semantic": sema(model, cso, self.fast_classification),
+                "postprocess": post(model,
+                                    cso,
+                                    enhancement=self.enhancement,
+                                    delete_outliers=self.delete_outliers,
+                                    get_weights=self.get_weights,
+                                    filter_by=self.filter_by)}
 
-        # Passing parameters to the two classes (synt and sema)
-        synt_module = synt(cso)
-        sema_module = sema(model, cso, self.fast_classification)
-        postprocess = post(model, 
-                           cso, 
-                           enhancement=self.enhancement, 
-                           delete_outliers=self.delete_outliers, 
-                           get_weights=self.get_weights, 
-                           filter_by=self.filter_by)
 
+    def _classify_batch(self, batch_modules: Dict[str, Any], papers: Dict[str, Any]) -> Dict[str, Any]:
+        """Function that classifies a set of papers with the objects created by _create_batch_modules.
 
+        Args:
+            batch_modules (Dict[str, Any]): The objects used to classify the papers.
+            papers (Dict[str, Any]): contains the metadata of the papers, by id.
+        Returns:
+            class_res (Dict[str, Any]): containing the result of each classification
+        """
         # initializing variable that will contain output
         class_res = dict()
 
-        for paper_id, paper_value in papers.items():
+        # the texts of the papers are tagged in batches
+        for paper_id, paper in zip(papers, batch_modules["paper"].iterate_papers(papers.values())):
             if not self.silent:
                 print("Processing:", paper_id)
-
-            paper.set_paper(paper_value)
-            result = Result(self.explanation, self.get_weights, self.filter_output)
-
-            # Passing paper and actioning the classifier
-            if self.modules in ('syntactic','both'):
-                synt_module.set_paper(paper)
-                result.set_syntactic(synt_module.classify_syntactic())
-                if self.get_weights:
-                    result.set_syntactic_topics_weights(synt_module.get_syntactic_topics_weights())
-                if self.explanation:
-                    result.dump_temporary_explanation(synt_module.get_explanation())
-            if self.modules in ('semantic','both'):
-                sema_module.set_paper(paper)
-                result.set_semantic(sema_module.classify_semantic())
-                if self.get_weights:
-                    result.set_semantic_topics_weights(sema_module.get_semantic_topics_weights())
-                if self.explanation:
-                    result.dump_temporary_explanation(sema_module.get_explanation())
-
-            postprocess.set_result(result)
-            result = postprocess.process()
-
-            class_res[paper_id] = result.get_dict()
+            class_res[paper_id] = self._classify_paper(batch_modules, paper)
         return class_res
 
 
+    def _classify_paper(self, modules: Dict[str, Any], paper: Paper) -> Dict[str, Any]:
+        """Function that classifies a paper whose text has already been processed. The modules are used through their
+        functions that do not change their state (classify_chunks and process_result), so they can be shared by
+        several threads.
+
+        Args:
+            modules (Dict[str, Any]): The syntactic, semantic and post-processing modules (see _create_batch_modules).
+            paper (Paper): The paper.
+        Returns:
+            class_res (Dict[str, Any]): containing the result of the classification
+        """
+        result = Result(self.explanation, self.get_weights, self.filter_output)
+
+        if self.modules in ('syntactic','both'):
+            output = modules["syntactic"].classify_chunks(paper.get_syntactic_chunks())
+            result.set_syntactic(output["topics"])
+            if self.get_weights:
+                result.set_syntactic_topics_weights(output["weights"])
+            if self.explanation:
+                result.dump_temporary_explanation(output["explanation"])
+        if self.modules in ('semantic','both'):
+            output = modules["semantic"].classify_chunks(paper.get_semantic_chunks())
+            result.set_semantic(output["topics"])
+            if self.get_weights:
+                result.set_semantic_topics_weights(output["weights"])
+            if self.explanation:
+                result.dump_temporary_explanation(output["explanation"])
+
+        return modules["postprocess"].process_result(result).get_dict()
+
+
+    def get_parameters(self) -> Dict[str, Any]:
+        """Function that returns the parameters of the classifier, i.e., the ones to pass to CSOClassifier to create an
+        identical classifier (e.g., in a worker process).
+
+        Returns:
+            Dict[str, Any]: the parameters, by name.
+        """
+        parameters = {"modules": self.modules,
+                      "enhancement": self.enhancement,
+                      "explanation": self.explanation,
+                      "delete_outliers": self.delete_outliers,
+                      "fast_classification": self.fast_classification,
+                      "get_weights": self.get_weights,
+                      "silent": self.silent}
+        if self.filter_output:
+            parameters["filter_by"] = self.filter_by
+        return parameters
+
+
+    def get_required_components(self) -> Dict[str, List[str]]:
+        """Function that returns the components of the ontology and of the model needed by the current configuration.
+        Only these are loaded when the classifier starts; any other component of the ontology is loaded on first access.
+
+        Returns:
+            Dict[str, List[str]]: the components of the ontology (see ontology.COMPONENTS) and of the model
+                ('cached_model', 'full_model', 'topic_embeddings') to load.
+        """
+        ontology = {'topics'}
+        model = set()
+        if self.modules in ('syntactic', 'both'):
+            ontology.update(['topic_stems', 'primary_labels'])
+        if self.modules in ('semantic', 'both'):
+            ontology.update(['topics_wu', 'primary_labels_wu', 'topic_stems'])
+            model.add('cached_model')
+            if self.use_full_model:
+                model.add('full_model')
+        if self.enhancement in ('first', 'all'):
+            ontology.add('broaders')
+        if self.enhancement == 'all' or self.filter_output:
+            ontology.add('ancestors')
+        if self.delete_outliers:
+            ontology.update(['distances', 'all_broaders'])
+            model.add('topic_embeddings')
+
+        return {"ontology": sorted(ontology), "model": sorted(model)}
+
+
+    def _load_resources(self, shared_arrays: Optional[Dict[str, Any]] = None) -> Tuple[CSO, MODEL]:
+        """Function that loads the ontology and the model, with the components needed by the current configuration.
+
+        Args:
+            shared_arrays (Optional[Dict[str, Any]], optional): The arrays of the model published by another process
+                    (see Model.attach_shared_arrays). Defaults to None, i.e., the model is loaded from disk.
+        Returns:
+            Tuple[CSO, MODEL]: the ontology and the model.
+        """
+        components = self.get_required_components()
+        cso = CSO(silent = self.silent, components = components["ontology"])
+        model = MODEL(load_model = 'cached_model' in components["model"] and shared_arrays is None, use_full_model = self.use_full_model, silent = self.silent)
+        if shared_arrays is not None:
+            model.attach_shared_arrays(shared_arrays)
+        if 'topic_embeddings' in components["model"]:
+            model.load_topic_embeddings(cso)
+        return cso, model
+
+
+    def reload(self, wait: bool = False) -> None:
+        """Function that loads the current version of the ontology and the model (e.g., after update) without stopping
+        the classifier. The new resources are loaded in a background thread and then used by the following requests;
+        the requests already running finish with the previous resources, which are then released.
+
+        Args:
+            wait (bool, optional): If True, it returns only when the new resources are in use. Defaults to False.
+        """
+        self.resources.reload(wait = wait)
+
+
+    @staticmethod
+    def __check_workers(workers: int) -> None:
+        """Validates the number of workers of batch and streaming modes.
+
+        Args:
+            workers (int): The number of workers.
+
+        Raises:
+            TypeError: If the number of workers is not an integer.
+            ValueError: If the number of workers is lower than 1.
+        """
+        if not isinstance(workers, int):
+            raise TypeError("Number of workers must be integer. Got %s instead." % type(workers).__name__)
+
+        if workers < 1:
+            raise ValueError("Number of workers must be equal or greater than 1")
+
+
     def __check_parameters(self, parameters: Dict[str, Any]) -> None:
         """Validates the input parameters.
 
@@ -306,22 +953,35 @@ class CSOClassifier:
         cso.setup()
 
         MODEL.setup()
+        MODEL(load_model = False).load_topic_embeddings(CSO())
         print("Setup completed.")
 
 
     @staticmethod
-    def update(force: bool = False) -> None:
+    def update(force: bool = False, verify: bool = False) -> None:
         """ Update the ontology and the word2vec model
         
         Args:
             force (bool, optional): If True, forces the update even if the version matches. Defaults to False.
+            verify (bool, optional): If True, checks that the artifacts updated from the previous version are equal
+                to the ones built from scratch. Defaults to False.
         """
         download_croissant_specification(notification=True, force=force)
 
+        config = Config()
+        previous_topics = list(CSO(silent = True).topics) if os.path.exists(config.get_cso_compiled_path()) else None
+        previous_model = get_file_digest(config.get_model_pickle_path())
+
         cso = CSO(load_ontology = False)
-        cso.update(force = force)
+        cso.update(force = force, verify = verify)
 
         MODEL.update()
+        start = time.perf_counter()
+        if previous_topics is not None and previous_model is not None and get_file_digest(config.get_model_pickle_path()) == previous_model:
+            MODEL(load_model = False).update_topic_embeddings(CSO(), previous_topics, verify = verify)
+        else:
+            MODEL(load_model = False).create_topic_embeddings(CSO())
+        print("Topic embeddings rebuilt in {:.2f}s.".format(time.perf_counter() - start))
         print("Update completed.")
 
 
@@ -351,4 +1011,79 @@ class CSOClassifier:
             print("The latest available package is version {} and you are using version {}. There is an error in your configuration file.".format(latest_version,config.get_classifier_version()))
 
         cso = CSO(load_ontology = False)
-        cso.version()
\ No newline at end of file
+        cso.version()
+
+
+# =============================================================================
+#     BATCH MODE WORKERS
+# =============================================================================
+
+
+_worker = dict()    # classifier and objects loaded by the current worker process
+
+
+def _initialise_worker(parameters: Dict[str, Any]) -> None:
+    """Function that loads, once per worker process, the ontology, the model and the modules used in batch mode.
+    The worker receives only the parameters of the classifier, from which it creates its own.
+
+    Args:
+        parameters (Dict[str, Any]): The parameters of the classifier running the batch (see CSOClassifier.get_parameters).
+    """
+    classifier = CSOClassifier(**parameters)
+    _worker["classifier"] = classifier
+    _worker["modules"] = classifier._create_batch_modules(*classifier._load_resources())
+
+
+def _initialise_shared_worker(parameters: Dict[str, Any], batch_modules: Dict[str, Any]) -> None:
+    """Function that sets up a worker process forked from the classifier, using the modules (and so the ontology and
+    the model) already loaded by the parent process.
+
+    Args:
+        parameters (Dict[str, Any]): The parameters of the classifier running the batch (see CSOClassifier.get_parameters).
+        batch_modules (Dict[str, Any]): The objects used to classify the papers, created by the parent process.
+    """
+    _worker["classifier"] = CSOClassifier(**parameters)
+    _worker["modules"] = batch_modules
+
+
+def _initialise_shared_memory_worker(parameters: Dict[str, Any], descriptor: Dict[str, Any]) -> None:
+    """Function that sets up a worker process (started with spawn or forkserver) using the arrays of the model published
+    in shared memory by the parent process, and loading from disk only the rest of the resources.
+
+    Args:
+        parameters (Dict[str, Any]): The parameters of the classifier running the batch (see CSOClassifier.get_parameters).
+        descriptor (Dict[str, Any]): The shared arrays (see SharedArrays.get_descriptor).
+    """
+    classifier = CSOClassifier(**parameters)
+    memory, arrays = SharedArrays.attach(descriptor)
+    _worker["classifier"] = classifier
+    _worker["shared_memory"] = memory     # kept, as the arrays are views over it
+    _worker["modules"] = classifier._create_batch_modules(*classifier._load_resources(arrays))
+
+
+def _run_worker(papers: Dict[str, Any]) -> Dict[str, Any]:
+    """Function that classifies a set of papers in a worker process initialised by _initialise_worker,
+    _initialise_shared_worker or _initialise_shared_memory_worker.
+    The results are encoded (see columnar.encode_results), so that sending them back to the parent process is cheap.
+
+    Args:
+        papers (Dict[str, Any]): contains the metadata of the papers, by id.
+    Returns:
+        Dict[str, Any]: the encoded result of each classification ('encoded', see _get_results), the id of the worker
+            process ('worker'), its unique memory in bytes ('memory', see misc.get_unique_memory) and the processor time
+            spent on the task ('time').
+    """
+    start = time.process_time()
+    class_res = _worker["classifier"]._classify_batch(_worker["modules"], papers)
+    return {"encoded": encode_results(class_res), "worker": os.getpid(), "memory": get_unique_memory(), "time": time.process_time() - start}
+
+
+def _get_results(output: Dict[str, Any]) -> Dict[str, Any]:
+    """Function that returns the results of a task completed by _run_worker (decoding them) or by _run_in_thread.
+
+    Args:
+        output (Dict[str, Any]): The output of the task.
+    Returns:
+        Dict[str, Any]: the result of each classification, by paper id.
+    """
+    return decode_results(output["encoded"]) if "encoded" in output else output["results"]
@@ -0,0 +1,277 @@
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+from typing import Any, Dict, IO, Iterator, List, Optional, Set, Tuple
+
+import click
+
+from .classifier import CSOClassifier
+
+
+# =============================================================================
+#     READING PAPERS
+# =============================================================================
+
+
+def get_input_format(path: str, input_format: str) -> str:
+    """ Function that returns the format of an input file: the one requested or, if 'auto', the one of its extension.
+
+    Args:
+        path (str): The input file ('-' for the standard input).
+        input_format (str): Either 'auto', 'jsonl' or 'csv'.
+
+    Returns:
+        str: either 'jsonl' or 'csv'.
+    """
+    if input_format != 'auto':
+        return input_format
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def read_papers(paths: List[str], input_format: str = 'auto', id_field: str = 'id') -> Iterator[Tuple[str, Any]]:
+    """ Function that reads, lazily, the papers from a list of JSONL files (one JSON value per line, e.g., an object or
+    the text of the paper) or CSV files (with a header). Each paper is identified by the value of id_field or, if it is
+    not an object with this field, by its position in the input.
+
+    Args:
+        paths (List[str]): The input files ('-' for the standard input).
+        input_format (str, optional): Either 'auto' (from the extension of each file), 'jsonl' or 'csv'. Defaults to 'auto'.
+        id_field (str, optional): The field containing the id of the paper. Defaults to 'id'.
+
+    Yields:
+        Iterator[Tuple[str, Any]]: pairs of paper id and paper (the other fields, e.g., title, abstract and keywords, or the text).
+    """
+    csv.field_size_limit(2**31 - 1)
+    position = 0
+    for path in paths:
+        file = click.get_text_stream('stdin') if path == '-' else open(path, 'r', encoding='utf-8', newline='')
+        try:
+            if get_input_format(path, input_format) == 'csv':
+                records = csv.DictReader(file)
+            else:
+                records = (json.loads(line) for line in file if line.strip())
+
+            for record in records:
+                paper_id = str(record.pop(id_field)) if isinstance(record, dict) and id_field in record else str(position)
+                position += 1
+                yield paper_id, record
+        finally:
+            if path != '-':
+                file.close()
+
+
+# =============================================================================
+#     WRITING RESULTS AND CHECKPOINTS
+# =============================================================================
+
+
+def read_checkpoint(path: str) -> Tuple[Set[str], int, int]:
+    """ Function that reads a checkpoint written by ResultWriter. Each line of the checkpoint lists the ids of a block of
+    results and the size of the output file after writing them; an incomplete last line (interrupted write) is ignored.
+
+    Args:
+        path (str): The checkpoint file.
+
+    Returns:
+        Tuple[Set[str], int, int]: the ids of the papers already classified, the size of the output file containing them,
+        and the size of the complete part of the checkpoint.
+    """
+    completed = set()
+    offset = 0
+    size = 0
+    with open(path, 'rb') as file:
+        for line in file:
+            try:
+                block = json.loads(line) if line.endswith(b"\n") else None
+            except ValueError:
+                block = None
+            if block is None:
+                break
+            completed.update(block["ids"])
+            offset = block["offset"]
+            size += len(line)
+    return completed, offset, size
+
+
+class ResultWriter:
+    """ Writes the results to a JSONL file in a dedicated thread, in blocks of lines. After writing each block to disk,
+    it appends its ids to the checkpoint, if any.
+    """
+
+    def __init__(self, output: IO[str], checkpoint: Optional[IO[str]] = None, id_field: str = 'id', buffer_size: int = 1000) -> None:
+        """ Initialising the writer
+
+        Args:
+            output (IO[str]): The output file.
+            checkpoint (Optional[IO[str]], optional): The checkpoint file. Defaults to None.
+            id_field (str, optional): The field of the output containing the id of the paper. Defaults to 'id'.
+            buffer_size (int, optional): Maximum number of results written at once. Defaults to 1000.
+        """
+        self.output = output
+        self.checkpoint = checkpoint
+        self.id_field = id_field
+        self.buffer_size = buffer_size
+        self.written = 0
+        self.error = None
+        self.queue = queue.Queue(maxsize = 4 * buffer_size)
+        self.thread = threading.Thread(target=self.__write_blocks, name="cso-classifier-writer", daemon=True)
+        self.thread.start()
+
+
+    def write(self, paper_id: str, result: Dict[str, Any]) -> None:
+        """ Function that queues a result to be written.
+
+        Args:
+            paper_id (str): The id of the paper.
+            result (Dict[str, Any]): The result of its classification.
+        """
+        if self.error is not None:
+            raise self.error
+        self.queue.put((paper_id, result))
+
+
+    def close(self) -> None:
+        """ Function that writes the results still queued and stops the writer.
+        """
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+    def __write_blocks(self) -> None:
+        """ Function that writes the queued results, in blocks, until the writer is closed.
+        """
+        try:
+            stopped = False
+            while not stopped:
+                block = [self.queue.get()]
+                while len(block) < self.buffer_size and block[-1] is not None:
+                    try:
+                        block.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if block[-1] is None:
+                    stopped = True
+                    block.pop()
+                if len(block) > 0:
+                    self.__write_block(block)
+        except Exception as error:
+            self.error = error
+            while True: # unblocking the producer
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+
+    def __write_block(self, block: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """ Function that writes a block of results and then records it in the checkpoint.
+
+        Args:
+            block (List[Tuple[str, Dict[str, Any]]]): pairs of paper id and result.
+        """
+        self.output.write("".join(json.dumps({self.id_field: paper_id, **result}) + "\n" for paper_id, result in block))
+        self.output.flush()
+        if self.checkpoint is not None:
+            os.fsync(self.output.fileno())
+            self.checkpoint.write(json.dumps({"offset": self.output.tell(), "ids": [paper_id for paper_id, _ in block]}) + "\n")
+            self.checkpoint.flush()
+        self.written += len(block)
+
+
+# =============================================================================
+#     COMMAND
+# =============================================================================
+
+
+@click.command()
+@click.argument('inputs', nargs=-1, type=click.Path(allow_dash=True))
+@click.option('-o', '--output', default='-', show_default=True, type=click.Path(allow_dash=True), help="JSONL file of the results ('-' for the standard output).")
+@click.option('--format', 'input_format', type=click.Choice(['auto', 'jsonl', 'csv']), default='auto', show_default=True, help="Format of the inputs ('auto' from their extension).")
+@click.option('--id-field', default='id', show_default=True, help="Field containing the id of the papers.")
+@click.option('--checkpoint', type=click.Path(), default=None, help="Checkpoint file. Defaults to the output file followed by '.checkpoint'.")
+@click.option('--restart', is_flag=True, help="Ignore an existing checkpoint and classify all the papers again.")
+@click.option('-w', '--workers', type=int, default=os.cpu_count() or 1, show_default=True, help="Number of workers.")
+@click.option('--max-in-flight', type=int, default=None, help="Maximum number of papers being classified at any time.")
+@click.option('--unordered', is_flag=True, help="Write the results as soon as they are ready, rather than in the input order.")
+@click.option('--share-resources', is_flag=True, help="Load the ontology and the model once and share them with the workers.")
+@click.option('--buffer-size', type=int, default=1000, show_default=True, help="Maximum number of results written at once.")
+@click.option('--modules', type=click.Choice(['syntactic', 'semantic', 'both']), default='both', show_default=True)
+@click.option('--enhancement', type=click.Choice(['first', 'all', 'no']), default='first', show_default=True)
+@click.option('--explanation', is_flag=True, help="Return the chunks of text that allowed to infer each topic.")
+@click.option('--keep-outliers', is_flag=True, help="Do not run the outlier detection.")
+@click.option('--full-model', is_flag=True, help="Use the word2vec model rather than the cached model.")
+@click.option('--weights', is_flag=True, help="Return the weights of the syntactic and semantic topics.")
+@click.option('--filter-by', multiple=True, help="Branch of CSO to filter the topics by (repeatable).")
+@click.option('-q', '--quiet', is_flag=True, help="Do not report the progress.")
+def main(inputs: Tuple[str, ...], output: str, input_format: str, id_field: str, checkpoint: Optional[str], restart: bool,
+         workers: int, max_in_flight: Optional[int], unordered: bool, share_resources: bool, buffer_size: int,
+         modules: str, enhancement: str, explanation: bool, keep_outliers: bool, full_model: bool, weights: bool,
+         filter_by: Tuple[str, ...], quiet: bool) -> None:
+    """ Classifies the papers in the INPUTS (JSONL or CSV files, or the standard input if none) with the CSO Classifier,
+    and writes the results as JSONL. When writing to a file, the classified papers are recorded in a checkpoint:
+    if interrupted, running the same command again resumes from where it stopped.
+    """
+    parameters = {"modules": modules, "enhancement": enhancement, "explanation": explanation,
+                  "delete_outliers": not keep_outliers, "fast_classification": not full_model,
+                  "get_weights": weights, "silent": True}
+    if len(filter_by) > 0:
+        parameters["filter_by"] = list(filter_by)
+
+    if output == '-':
+        if checkpoint is not None:
+            raise click.UsageError("Checkpoints require an output file.")
+        output_file, checkpoint_file, completed = click.get_text_stream('stdout'), None, set()
+    else:
+        checkpoint = checkpoint or output + '.checkpoint'
+        completed, offset, size = set(), 0, 0
+        if os.path.exists(checkpoint) and not restart:
+            completed, offset, size = read_checkpoint(checkpoint)
+        if len(completed) > 0 and os.path.exists(output):
+            with open(output, 'r+', encoding='utf-8') as file: # dropping the results not recorded in the checkpoint
+                file.truncate(offset)
+            with open(checkpoint, 'r+', encoding='utf-8') as file: # dropping an incomplete last line
+                file.truncate(size)
+            output_file = open(output, 'a', encoding='utf-8')
+            checkpoint_file = open(checkpoint, 'a', encoding='utf-8')
+            if not quiet:
+                click.echo("Resuming: {} papers already classified.".format(len(completed)), err=True)
+        else:
+            completed = set()
+            output_file = open(output, 'w', encoding='utf-8')
+            checkpoint_file = open(checkpoint, 'w', encoding='utf-8')
+
+    papers = ((paper_id, paper) for paper_id, paper in read_papers(list(inputs) or ['-'], input_format, id_field) if paper_id not in completed)
+    writer = ResultWriter(output_file, checkpoint_file, id_field, buffer_size)
+    classifier = CSOClassifier(**parameters)
+    interrupted = False
+    try:
+        results = classifier.classify_stream(papers, workers=workers, ordered=not unordered,
+                                             max_in_flight=max_in_flight, share_resources=share_resources)
+        for classified, (paper_id, result) in enumerate(results, 1):
+            writer.write(paper_id, result)
+            if not quiet and classified % buffer_size == 0:
+                click.echo("Classified {} papers.".format(len(completed) + classified), err=True)
+    except KeyboardInterrupt:
+        interrupted = True
+    finally:
+        classifier.close(wait = not interrupted)
+        writer.close()
+        if output != '-':
+            output_file.close()
+        if checkpoint_file is not None:
+            checkpoint_file.close()
+
+    if not quiet:
+        click.echo("{} {} papers ({} in total).".format("Interrupted after classifying" if interrupted else "Classified",
+                                                         writer.written, len(completed) + writer.written), err=True)
+    if interrupted:
+        sys.exit(130)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,633 @@
+import abc
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+MAGIC = b"CSOARRAY"     # first bytes of the files written by write_arrays
+ALIGNMENT = 64          # every array starts at a multiple of this offset (bytes)
+FINGERPRINT_SUFFIX = ".fingerprint"  # file saved next to an array, with the fingerprint of the data it was created from
+
+
+# =============================================================================
+#     ARRAY CONTAINER
+# =============================================================================
+
+
+def write_arrays(path: str, arrays: Dict[str, np.ndarray], metadata: Dict[str, Any]) -> None:
+    """ Function that writes a set of NumPy arrays in a single file, which can be memory-mapped with read_arrays.
+    The file contains a JSON header (with the metadata and the dtype, shape and offset of each array) followed by the
+    raw arrays. The file is written next to the destination (see get_temporary_path) and then moved in place, so it is
+    never read half-written.
+
+    Args:
+        path (str): The destination file.
+        arrays (Dict[str, np.ndarray]): The arrays to write, by name.
+        metadata (Dict[str, Any]): Additional information to store in the header (JSON serialisable).
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    header = {"metadata": metadata, "arrays": dict()}
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGNMENT) * ALIGNMENT
+
+    temporary_path = get_temporary_path(path)
+    try:
+        with open(temporary_path, "wb") as file:
+            file.write(MAGIC)
+            file.write(np.uint64(len(header_bytes)).tobytes())
+            file.write(header_bytes)
+            for name, array in arrays.items():
+                file.seek(data_start + header["arrays"][name]["offset"])
+                file.write(array.tobytes())
+            file.truncate(data_start + offset)
+        os.replace(temporary_path, path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def read_arrays(path: str) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """ Function that reads (memory-mapping them) the arrays written by write_arrays.
+
+    Args:
+        path (str): The file to read.
+
+    Returns:
+        Tuple[Dict[str, np.ndarray], Dict[str, Any]]: the read-only arrays, by name, and the metadata.
+    """
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError("The file {} does not contain compiled arrays.".format(path))
+        header_length = int(np.frombuffer(file.read(8), dtype=np.uint64)[0])
+        header = json.loads(file.read(header_length).decode("utf-8"))
+    data_start = -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+
+    arrays = dict()
+    for name, description in header["arrays"].items():
+        shape = tuple(description["shape"])
+        if int(np.prod(shape)) == 0:
+            arrays[name] = np.empty(shape, dtype=description["dtype"])
+        else:
+            arrays[name] = np.memmap(path, dtype=description["dtype"], mode="r", offset=data_start + description["offset"], shape=shape)
+
+    return arrays, header["metadata"]
+
+
+def get_temporary_path(path: str) -> str:
+    """ Function that creates a new, empty file next to the given one, with a unique name (and the same extension).
+    An artifact is written there and then moved in place with os.replace, so that processes creating the same
+    artifact at the same time do not write the same file.
+
+    Args:
+        path (str): The destination file.
+
+    Returns:
+        str: the path of the temporary file.
+    """
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(path) + ".",
+                                     suffix=".tmp" + os.path.splitext(path)[1], delete=False) as file:
+        return file.name
+
+
+def replace_with_fingerprint(temporary_path: str, path: str, fingerprint: str) -> None:
+    """ Function that moves an array saved in a temporary file (see get_temporary_path) in place, and saves next to it
+    the fingerprint of the data it was created from. The previous fingerprint is removed first, so that the new array
+    is never read with the fingerprint of the previous one.
+
+    Args:
+        temporary_path (str): The file holding the array (saved with NumPy).
+        path (str): The destination file.
+        fingerprint (str): The fingerprint of the data the array was created from.
+    """
+    fingerprint_path = path + FINGERPRINT_SUFFIX
+    try:
+        os.remove(fingerprint_path)
+    except FileNotFoundError:
+        pass
+    os.replace(temporary_path, path)
+
+    temporary_fingerprint_path = get_temporary_path(fingerprint_path)
+    with open(temporary_fingerprint_path, "w") as file:
+        file.write(fingerprint)
+    os.replace(temporary_fingerprint_path, fingerprint_path)
+
+
+def read_fingerprint(path: str) -> Optional[str]:
+    """ Function that returns the fingerprint saved next to an array by replace_with_fingerprint.
+
+    Args:
+        path (str): The file holding the array.
+
+    Returns:
+        Optional[str]: the fingerprint, or None if there is none.
+    """
+    try:
+        with open(path + FINGERPRINT_SUFFIX, "r") as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def load_with_fingerprint(path: str, fingerprint: str) -> Optional[np.ndarray]:
+    """ Function that reads (memory-mapping it) an array saved with replace_with_fingerprint, if it was created from
+    the data with the given fingerprint. The fingerprint is checked before and after opening the array, so that an
+    array replaced in the meantime by another process is not accepted.
+
+    Args:
+        path (str): The file holding the array.
+        fingerprint (str): The fingerprint of the data the array must have been created from.
+
+    Returns:
+        Optional[np.ndarray]: the read-only array, or None if it is missing or it was created from other data.
+    """
+    if read_fingerprint(path) != fingerprint:
+        return None
+    try:
+        array = np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    return array if read_fingerprint(path) == fingerprint else None
+
+
+# =============================================================================
+#     STRING TABLE AND VIEWS
+# =============================================================================
+
+
+class StringTable:
+    """ A table of unique strings, each identified by its position (string id). The ids of the strings are looked up
+    in a sorted index (see encode_index), which is read from the compiled file, like the strings, rather than built in
+    memory as a dict by each process. The outcome of the last lookups is kept in a bounded (least recently used) cache.
+    """
+
+    SEPARATOR = "\n"
+    cache_size = 10000 # maximum number of strings (with their ids) to keep in cache
+
+    def __init__(self, data: np.ndarray, index: Optional[Dict[str, np.ndarray]] = None) -> None:
+        """ Initialising the string table
+
+        Args:
+            data (np.ndarray): The strings, encoded in utf-8 and joined by SEPARATOR (uint8 array).
+            index (Optional[Dict[str, np.ndarray]], optional): The index of the strings (see encode_index).
+                    Defaults to None, i.e., it is created from the strings when first needed.
+        """
+        self.strings = data.tobytes().decode("utf-8").split(self.SEPARATOR) if len(data) > 0 else list()
+        self.index = index
+        self.cache = OrderedDict()  # string -> id (-1 if the string is not in the table)
+
+
+    @classmethod
+    def encode(cls, strings: List[str]) -> np.ndarray:
+        """ Function that encodes a list of unique strings, to be stored and then read with StringTable.
+
+        Args:
+            strings (List[str]): The strings to encode.
+
+        Returns:
+            np.ndarray: the encoded strings (uint8 array).
+        """
+        if any(cls.SEPARATOR in string for string in strings):
+            raise ValueError("Strings cannot contain the separator of the string table.")
+        return np.frombuffer(cls.SEPARATOR.join(strings).encode("utf-8"), dtype=np.uint8)
+
+
+    @staticmethod
+    def encode_index(strings: List[str]) -> Dict[str, np.ndarray]:
+        """ Function that encodes the index of a list of unique strings, to be stored next to them and then read
+        with StringTable: the strings as fixed-width utf-8 byte strings, sorted ('sorted'), and their ids ('ids').
+
+        Args:
+            strings (List[str]): The strings to index, in the order of their ids.
+
+        Returns:
+            Dict[str, np.ndarray]: the arrays of the index, by name.
+        """
+        keys = [string.encode("utf-8") for string in strings]
+        if any(b"\0" in key for key in keys):
+            raise ValueError("Strings cannot contain null characters.")
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        return {"sorted": np.array([keys[string_id] for string_id in order], dtype="S{}".format(max([len(key) for key in keys] + [1]))),
+                "ids": np.array(order, dtype=np.int32)}
+
+
+    def get_id(self, string: str) -> int:
+        """ Function that returns the id of a string.
+
+        Args:
+            string (str): The string.
+
+        Returns:
+            int: the id of the string, or -1 if it is not in the table.
+        """
+        if not isinstance(string, str):
+            return -1
+        try:
+            self.cache.move_to_end(string)
+            return self.cache[string]
+        except KeyError:
+            pass
+
+        sorted_strings = self.__get_index()["sorted"]
+        key = string.encode("utf-8")
+        string_id = -1
+        if 0 < len(sorted_strings) and len(key) <= sorted_strings.dtype.itemsize and b"\0" not in key:
+            position = int(np.searchsorted(sorted_strings, key))
+            if position < len(sorted_strings) and sorted_strings[position] == key:
+                string_id = self.index["ids"].item(position)
+        self.cache[string] = string_id
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return string_id
+
+
+    def get_ids(self, strings: List[str]) -> np.ndarray:
+        """ Function that returns the ids of a list of strings, searching all of them in the index at once.
+
+        Args:
+            strings (List[str]): The strings.
+
+        Returns:
+            np.ndarray: the ids of the strings, -1 for the ones that are not in the table.
+        """
+        sorted_strings = self.__get_index()["sorted"]
+        string_ids = np.full(len(strings), -1, dtype=np.int64)
+        if len(strings) == 0 or len(sorted_strings) == 0:
+            return string_ids
+
+        keys = [string.encode("utf-8") for string in strings]
+        valid = np.array([b"\0" not in key for key in keys]) # NumPy drops the null characters at the end of a key
+        keys = np.array(keys, dtype="S{}".format(max([len(key) for key in keys] + [1])))
+        positions = np.minimum(np.searchsorted(sorted_strings, keys), len(sorted_strings) - 1)
+        found = (sorted_strings[positions] == keys) & valid
+        string_ids[found] = self.index["ids"][positions[found]]
+        return string_ids
+
+
+    def __get_index(self) -> Dict[str, np.ndarray]:
+        """ Returns the index of the strings, creating it the first time if it was not given """
+        if self.index is None:
+            self.index = self.encode_index(self.strings)
+        return self.index
+
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+
+class KeyedView(Mapping, abc.ABC):
+    """ Abstract base class of the read-only dict-like views over the compiled ontology.
+    The keys of the view are the strings whose ids are listed in 'keys', in the same order; the subclasses define
+    the values (see _value).
+    """
+
+    def __init__(self, strings: StringTable, keys: np.ndarray) -> None:
+        self.strings = strings
+        self.keys_ids = keys
+        self.rows = np.full(len(strings), -1, dtype=np.int32)   # string id -> position in keys
+        self.rows[keys] = np.arange(len(keys))
+
+
+    def _row(self, key: str) -> int:
+        """ Returns the position of the key (-1 if it is not a key of the view) """
+        string_id = self.strings.get_id(key)
+        return -1 if string_id < 0 else self.rows.item(string_id)
+
+
+    @abc.abstractmethod
+    def _value(self, row: int) -> Any:
+        """ Returns the value at the given position """
+
+
+    def __getitem__(self, key: str) -> Any:
+        row = self._row(key)
+        if row < 0:
+            raise KeyError(key)
+        return self._value(row)
+
+
+    def get(self, key: str, default: Any = None) -> Any:
+        row = self._row(key)
+        return default if row < 0 else self._value(row)
+
+
+    def __contains__(self, key: object) -> bool:
+        return self._row(key) >= 0
+
+
+    def __iter__(self) -> Iterator[str]:
+        strings = self.strings.strings
+        return (strings[string_id] for string_id in self.keys_ids.tolist())
+
+
+    def __len__(self) -> int:
+        return len(self.keys_ids)
+
+
+class FlagView(KeyedView):
+    """ View over a set of strings, as a dict mapping each of them to True (e.g., the topics) """
+
+    def _value(self, row: int) -> bool:
+        return True
+
+
+class StringView(KeyedView):
+    """ View over a dict mapping strings to strings (e.g., the primary labels) """
+
+    def __init__(self, strings: StringTable, keys: np.ndarray, values: np.ndarray) -> None:
+        super().__init__(strings, keys)
+        self.values_ids = values
+
+
+    def _value(self, row: int) -> str:
+        return self.strings.strings[self.values_ids.item(row)]
+
+
+class ListView(KeyedView):
+    """ View over a dict mapping strings to lists of strings (e.g., the broaders), stored in CSR format:
+    the values of the i-th key are indices[indptr[i]:indptr[i+1]]. The decoded lists are kept in a bounded
+    (least recently used) cache, as the same keys (e.g., the stems of common words) are looked up over and over.
+    As with a dict, the same list is returned at each lookup, and it must not be modified.
+    """
+
+    cache_size = 10000 # maximum number of decoded lists to keep in cache
+
+    def __init__(self, strings: StringTable, keys: np.ndarray, indptr: np.ndarray, indices: np.ndarray) -> None:
+        super().__init__(strings, keys)
+        self.indptr = indptr
+        self.indices = indices
+        self.cache = OrderedDict()  # row -> decoded list
+
+
+    def _value(self, row: int) -> List[str]:
+        try:
+            self.cache.move_to_end(row)
+            return self.cache[row]
+        except KeyError:
+            pass
+
+        strings = self.strings.strings
+        value = [strings[string_id] for string_id in self.indices[self.indptr.item(row):self.indptr.item(row + 1)].tolist()]
+        self.cache[row] = value
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return value
+
+
+def encode_ids(strings: StringTable, items: List[str]) -> np.ndarray:
+    """ Function that encodes strings of the table as their ids. """
+    string_ids = strings.get_ids(items)
+    if (string_ids < 0).any():
+        raise KeyError(items[int(np.argmax(string_ids < 0))])
+    return string_ids.astype(np.int32)
+
+
+def encode_flags(strings: StringTable, items: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """ Function that encodes the keys of a dict, to be read with FlagView. """
+    return {"keys": encode_ids(strings, list(items))}
+
+
+def encode_strings(strings: StringTable, items: Dict[str, str]) -> Dict[str, np.ndarray]:
+    """ Function that encodes a dict mapping strings to strings, to be read with StringView. """
+    return {"keys": encode_ids(strings, list(items)),
+            "values": encode_ids(strings, list(items.values()))}
+
+
+def encode_lists(strings: StringTable, items: Dict[str, List[str]]) -> Dict[str, np.ndarray]:
+    """ Function that encodes a dict mapping strings to lists of strings, to be read with ListView. """
+    return {"keys": encode_ids(strings, list(items)),
+            "indptr": np.concatenate(([0], np.cumsum([len(values) for values in items.values()]))).astype(np.int64),
+            "indices": encode_ids(strings, [value for values in items.values() for value in values])}
+
+
+# =============================================================================
+#     CLASSIFICATION RESULTS
+# =============================================================================
+
+
+def encode_results(results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """ Function that encodes the results of a set of papers (e.g., of a task of a worker process) in a compact form,
+    to be sent to another process and read with decode_results. Every string (topic or chunk of text) is stored once,
+    in a string table, and the results refer to it by id: each field of the results is a list of strings (e.g.,
+    'union'), a dict of numbers ('syntactic_weights') or a dict of lists of strings ('explanation'), stored in CSR format
+    over the papers. Results that do not fit this layout are returned as they are.
+
+    Args:
+        results (Dict[str, Dict[str, Any]]): The result of each paper, by id.
+
+    Returns:
+        Dict[str, Any]: the encoded results.
+    """
+    strings = dict()    # string -> id
+    fields = dict()     # field -> its columns
+    for result in results.values():
+        if fields and result.keys() != fields.keys():
+            return {"results": results}
+        for field, value in result.items():
+            column = fields.setdefault(field, {"kind": type(value).__name__, "values": None, "indptr": [0], "keys": [],
+                                               "numbers": [], "value_indptr": [0], "value_keys": []})
+            if column["kind"] not in ("list", "dict") or not isinstance(value, (list, dict)) or column["kind"] != type(value).__name__:
+                return {"results": results}
+            column["keys"].extend(strings.setdefault(key, len(strings)) for key in value)
+            column["indptr"].append(len(column["keys"]))
+            if column["kind"] == "list":
+                continue
+            for item in value.values():
+                values = "lists" if isinstance(item, list) else "numbers" if type(item) is float else None
+                if values is None or column["values"] not in (None, values):
+                    return {"results": results}
+                column["values"] = values
+                if values == "numbers":
+                    column["numbers"].append(item)
+                else:
+                    column["value_keys"].extend(strings.setdefault(string, len(strings)) for string in item)
+                    column["value_indptr"].append(len(column["value_keys"]))
+
+    if "" in strings:   # an empty table and a table with only the empty string are encoded alike
+        return {"results": results}
+    try:
+        string_table = StringTable.encode(list(strings))
+    except ValueError:
+        return {"results": results}
+
+    encoded = {"ids": list(results), "strings": string_table, "fields": dict()}
+    for field, column in fields.items():
+        arrays = {"kind": column["kind"], "values": column["values"],
+                  "indptr": np.array(column["indptr"], dtype=np.int32), "keys": np.array(column["keys"], dtype=np.int32)}
+        if column["values"] == "numbers":
+            arrays["numbers"] = np.array(column["numbers"], dtype=np.float64)
+        elif column["values"] == "lists":
+            arrays["value_indptr"] = np.array(column["value_indptr"], dtype=np.int32)
+            arrays["value_keys"] = np.array(column["value_keys"], dtype=np.int32)
+        encoded["fields"][field] = arrays
+    return encoded
+
+
+def decode_results(encoded: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """ Function that decodes the results encoded by encode_results.
+
+    Args:
+        encoded (Dict[str, Any]): The encoded results.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: the result of each paper, by id.
+    """
+    if "results" in encoded:
+        return encoded["results"]
+
+    strings = StringTable(encoded["strings"]).strings
+    results = {paper_id: dict() for paper_id in encoded["ids"]}
+    for field, column in encoded["fields"].items():
+        indptr = column["indptr"].tolist()
+        keys = [strings[string_id] for string_id in column["keys"].tolist()]
+        if column["values"] == "numbers":
+            values = column["numbers"].tolist()
+        elif column["values"] == "lists":
+            value_indptr = column["value_indptr"].tolist()
+            value_keys = [strings[string_id] for string_id in column["value_keys"].tolist()]
+            values = [value_keys[value_indptr[i]:value_indptr[i + 1]] for i in range(len(keys))]
+        for position, result in enumerate(results.values()):
+            first, last = indptr[position], indptr[position + 1]
+            if column["kind"] == "list":
+                result[field] = keys[first:last]
+            elif column["values"] is None:
+                result[field] = dict()
+            else:
+                result[field] = dict(zip(keys[first:last], values[first:last]))
+    return results
+
+
+# =============================================================================
+#     CACHED MODEL
+# =============================================================================
+
+
+CACHED_MODEL_FIELDS = ("topic", "sim_t", "wet", "sim_w")  # fields of each item of the cached model
+
+
+def encode_cached_model(model: Dict[str, List[Dict[str, Any]]]) -> Optional[Dict[str, np.ndarray]]:
+    """ Function that encodes the cached model (word -> list of matched topics) as arrays, to be read with
+    CachedModelView. Words and labels are stored as fixed-width utf-8 byte strings, so that they can be searched
+    and read without building any dictionary: the words are sorted, and the items of the i-th word are the
+    rows indptr[i]:indptr[i+1] of the other arrays.
+
+    Args:
+        model (Dict[str, List[Dict[str, Any]]]): The cached model.
+
+    Returns:
+        Optional[Dict[str, np.ndarray]]: the arrays, by name, or None if the model has a different structure.
+    """
+    words = sorted(word.encode("utf-8") for word in model)
+    labels = dict()     # topic or word of the embedding -> id
+    indptr, topics, wets, sim_t, sim_w = [0], [], [], [], []
+    for word in words:
+        for item in model[word.decode("utf-8")]:
+            if not isinstance(item, dict) or sorted(item) != sorted(CACHED_MODEL_FIELDS) or \
+               not all(isinstance(item[field], (int, float)) for field in ("sim_t", "sim_w")):
+                return None
+            topics.append(labels.setdefault(item["topic"].encode("utf-8"), len(labels)))
+            wets.append(labels.setdefault(item["wet"].encode("utf-8"), len(labels)))
+            sim_t.append(item["sim_t"])
+            sim_w.append(item["sim_w"])
+        indptr.append(len(topics))
+
+    if any(b"\0" in string for string in words + list(labels)):
+        return None
+    return {"words": np.array(words, dtype="S{}".format(max([len(word) for word in words] + [1]))),
+            "indptr": np.array(indptr, dtype=np.int64),
+            "labels": np.array(list(labels), dtype="S{}".format(max([len(label) for label in labels] + [1]))),
+            "topics": np.array(topics, dtype=np.int32),
+            "wets": np.array(wets, dtype=np.int32),
+            "sim_t": np.array(sim_t, dtype=np.float64),
+            "sim_w": np.array(sim_w, dtype=np.float64)}
+
+
+class CachedModelView(Mapping):
+    """ Read-only dict-like view over the cached model encoded by encode_cached_model. The lists of items are
+    created when accessed, and only the arrays are kept in memory (e.g., shared with other processes). As the same
+    words are looked up over and over (and checked before being looked up, see Semantic), the outcome of the last
+    lookups is kept in a bounded (least recently used) cache, of each process. As with a dict, the same list is
+    returned at each lookup, and it must not be modified.
+    """
+
+    cache_size = 10000 # maximum number of words (with their decoded lists) to keep in cache
+
+    def __init__(self, arrays: Dict[str, np.ndarray]) -> None:
+        self.words = arrays["words"]
+        self.indptr = arrays["indptr"]
+        self.labels = arrays["labels"]
+        self.topics = arrays["topics"]
+        self.wets = arrays["wets"]
+        self.sim_t = arrays["sim_t"]
+        self.sim_w = arrays["sim_w"]
+        self.cache = OrderedDict()  # word -> decoded list (None if the word is not in the model)
+
+
+    def _row(self, word: str) -> int:
+        """ Returns the position of the word (-1 if it is not in the model) """
+        if not isinstance(word, str) or len(self.words) == 0:
+            return -1
+        key = word.encode("utf-8")
+        if len(key) > self.words.dtype.itemsize:
+            return -1
+        row = int(np.searchsorted(self.words, key))
+        return row if row < len(self.words) and self.words[row] == key else -1
+
+
+    def _value(self, row: int) -> List[Dict[str, Any]]:
+        first, last = self.indptr.item(row), self.indptr.item(row + 1)
+        labels = self.labels
+        return [{"topic": labels[topic].decode("utf-8"), "sim_t": sim_t, "wet": labels[wet].decode("utf-8"), "sim_w": sim_w}
+                for topic, sim_t, wet, sim_w in zip(self.topics[first:last].tolist(), self.sim_t[first:last].tolist(),
+                                                    self.wets[first:last].tolist(), self.sim_w[first:last].tolist())]
+
+
+    def _lookup(self, word: str) -> Optional[List[Dict[str, Any]]]:
+        """ Returns the decoded list of the word (None if it is not in the model), from the cache if possible """
+        if not isinstance(word, str):
+            return None
+        try:
+            self.cache.move_to_end(word)
+            return self.cache[word]
+        except KeyError:
+            pass
+
+        row = self._row(word)
+        value = self._value(row) if row >= 0 else None
+        self.cache[word] = value
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return value
+
+
+    def __getitem__(self, word: str) -> List[Dict[str, Any]]:
+        value = self._lookup(word)
+        if value is None:
+            raise KeyError(word)
+        return value
+
+
+    def get(self, word: str, default: Any = None) -> Any:
+        value = self._lookup(word)
+        return default if value is None else value
+
+
+    def __contains__(self, word: object) -> bool:
+        return self._lookup(word) is not None
+
+
+    def __iter__(self) -> Iterator[str]:
+        return (word.decode("utf-8") for word in self.words.tolist())
+
+
+    def __len__(self) -> int:
+        return len(self.words)
@@ -53,13 +53,13 @@ class Config:
         """
         return os.path.join(self.dir, self.config['ontology']['cso_path'])
 
-    def get_cso_pickle_path(self) -> str:
-        """ Returns the path of the local pickle version of CSO.
+    def get_cso_compiled_path(self) -> str:
+        """ Returns the path of the local compiled version of CSO.
 
         Returns:
-            str: The file path to the local CSO pickle file.
+            str: The file path to the local compiled CSO file.
         """
-        return os.path.join(self.dir, self.config['ontology']['cso_pickle_path'])
+        return os.path.join(self.dir, self.config['ontology']['cso_compiled_path'])
 
     def get_cso_graph_path(self) -> str:
         """ Returns the path of the local pickle version of CSO (GRAPH).
@@ -69,6 +69,14 @@ class Config:
         """
         return os.path.join(self.dir, self.config['ontology']['cso_graph_path'])
 
+    def get_cso_distances_path(self) -> str:
+        """ Returns the path of the local distance oracle of CSO.
+
+        Returns:
+            str: The file path to the local CSO distance oracle.
+        """
+        return os.path.join(self.dir, self.config['ontology']['cso_distances_path'])
+
     def get_cso_remote_url(self) -> str:
         """ Returns the remote url where the latest version of CSO is located.
 
@@ -137,6 +145,14 @@ class Config:
         """
         return self.config['model']['cached_model_remote_url']
 
+    def get_topic_embeddings_path(self) -> str:
+        """ Returns the local path of the topic embeddings.
+
+        Returns:
+            str: The file path to the local topic embeddings file.
+        """
+        return os.path.join(self.dir, self.config['model']['topic_embeddings_path'])
+
 # =============================================================================
 #     CROISSANT
 # =============================================================================
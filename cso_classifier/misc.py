@@ -1,9 +1,14 @@
 import sys
-from typing import Dict, Iterator
+import hashlib
+import json
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
 from itertools import islice
+import math
 import os
 from hurry.filesize import size
 import requests
+from rapidfuzz.distance import LCSseq
 
 def download_file(url: str, filename: str) -> bool:
     """Downloads a file from a given URL with a progress bar.
@@ -57,6 +62,84 @@ def download_file(url: str, filename: str) -> bool:
         return False
     
 
+def get_file_digest(filename: str) -> Optional[str]:
+    """Computes the SHA-256 digest of a file, reading it in blocks.
+
+    Args:
+        filename (str): The file to read.
+
+    Returns:
+        Optional[str]: The hexadecimal digest, or None if the file does not exist.
+    """
+    if not os.path.exists(filename):
+        return None
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_fingerprint(items: Iterable[Any]) -> str:
+    """Computes the fingerprint (SHA-256 digest) of a sequence of items, e.g., the topics of the ontology in the order
+    of their ids. It identifies the version of the data an artifact (e.g., the topic embeddings) was created from.
+
+    Args:
+        items (Iterable[Any]): The items, which must be JSON serialisable.
+
+    Returns:
+        str: The hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    for item in items:
+        digest.update(json.dumps(item, ensure_ascii=False).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def get_unique_memory(pid: Optional[int] = None) -> Optional[int]:
+    """Computes the unique set size of a process, i.e., the memory that is not shared with any other process
+    and that would be freed if the process exited (private clean and dirty pages). It is available only on Linux.
+
+    Args:
+        pid (Optional[int], optional): The id of the process. Defaults to the current process.
+
+    Returns:
+        Optional[int]: The unique memory in bytes, or None if it cannot be measured.
+    """
+    try:
+        with open("/proc/{}/smaps_rollup".format(pid if pid is not None else "self")) as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return None
+    unique = 0
+    for line in lines:
+        if line.startswith(("Private_Clean:", "Private_Dirty:")):
+            unique += int(line.split()[1]) * 1024
+    return unique
+
+
+def get_resident_memory(pid: Optional[int] = None) -> Optional[int]:
+    """Computes the resident set size of a process, i.e., the memory it currently holds in RAM, including the pages
+    shared with other processes. It is available only on Linux.
+
+    Args:
+        pid (Optional[int], optional): The id of the process. Defaults to the current process.
+
+    Returns:
+        Optional[int]: The resident memory in bytes, or None if it cannot be measured.
+    """
+    try:
+        with open("/proc/{}/status".format(pid if pid is not None else "self")) as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return None
+    for line in lines:
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) * 1024
+    return None
+
+
 def chunks(data: Dict, size: int) -> Iterator[Dict]:
     """Splits a dictionary into smaller dictionaries of a specified size.
 
@@ -76,6 +159,52 @@ def chunks(data: Dict, size: int) -> Iterator[Dict]:
         yield {k:data[k] for k in islice(iterator, size)}
 
 
+def get_similar_strings(strings: List[str], candidates: Iterable[str], max_distance: float = 0.5) -> Set[str]:
+    """Returns the candidates that are similar to at least one of the given strings.
+
+    Two strings are similar if their metric LCS distance, 1 - LCS / max(len), is lower than `max_distance`
+    (the same decision taken with strsimpy's MetricLCS). As the longest common subsequence cannot be longer
+    than the shortest string, pairs with very different lengths are ruled out without being compared.
+    The remaining pairs are compared with rapidfuzz, which stops early once the LCS cannot reach the
+    required length.
+
+    Args:
+        strings (List[str]): The reference strings.
+        candidates (Iterable[str]): The strings to check.
+        max_distance (float, optional): The (exclusive) maximum distance between similar strings. Defaults to 0.5.
+
+    Returns:
+        Set[str]: The candidates that are similar to at least one of the strings.
+    """
+    similar_strings = set()
+    if max_distance <= 0:
+        return similar_strings
+
+    strings = sorted(strings, key=len)
+    lengths = [len(string) for string in strings]
+    for candidate in candidates:
+        length = len(candidate)
+        # Lengths compatible with a distance lower than max_distance (the range is widened by one on both sides,
+        # as the exact check is done below).
+        first = bisect_left(lengths, math.floor(length * (1 - max_distance)))
+        last = bisect_right(lengths, math.ceil(length / (1 - max_distance)) + 1) if max_distance < 1 else len(strings)
+        for string in strings[first:last]:
+            max_length = max(length, len(string))
+            if candidate == string or max_length == 0:
+                similar_strings.add(candidate)
+                break
+            if 1.0 - min(length, len(string)) / max_length >= max_distance:
+                continue
+            # The cutoff is one below the shortest admissible LCS: some versions of rapidfuzz return 0 when the
+            # LCS is exactly equal to the cutoff.
+            lcs = LCSseq.similarity(candidate, string, score_cutoff=max(0, math.floor((1 - max_distance) * max_length) - 1))
+            if 1.0 - lcs / max_length < max_distance:
+                similar_strings.add(candidate)
+                break
+
+    return similar_strings
+
+
 def download_language_model(notification: bool = True) -> None:
     """Downloads and ensures necessary NLP language resources are installed.
 
@@ -1,11 +1,16 @@
 import pickle
 import os
 import json
-from typing import List, Dict, Tuple, Union
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple, Union
+import numpy as np
 from gensim.models import KeyedVectors
 
+from .columnar import CachedModelView, encode_cached_model, get_temporary_path, load_with_fingerprint, replace_with_fingerprint
 from .config import Config
-from .misc import print_header, download_file
+from .misc import print_header, download_file, get_fingerprint
+from .ontology import Ontology
 
 
 class Model:
@@ -22,12 +27,19 @@ class Model:
         self.silent = silent
         self.model = dict()
         self.full_model = None
+        self.topic_embeddings = None
         self.config = Config()
 
         self.embedding_size = 0
         self.word_similarity = 0.7# similarity of words in the model
         self.top_amount_of_words = 10 # maximum number of words to select
 
+        self.topic_ids = dict()             # topic -> compact id, assigned the first time a word is indexed
+        self.topic_ids_lock = threading.Lock()  # the ids are assigned by one thread at a time
+        self.word_topic_ids = dict()        # word -> (sorted topic ids, their first and last positions in the list of the word, their counts)
+        self.merged_words = OrderedDict()   # bounded cache: tuple of tokens -> merged list of topics
+        self.merged_words_cache_size = 100000 # maximum number of merges to keep in cache
+
         self.use_full_model = use_full_model
 
         if load_model:
@@ -97,6 +109,100 @@ class Model:
         return self.model.get(word, {})
 
 
+    def get_merged_words_from_model(self, grams: Union[Tuple[str, ...], List[str]]) -> List[Dict]:
+        """Retrieves the CSO topics shared by all the tokens of an n-gram, according to the cached model.
+
+        A topic is shared if it occurs, over the lists of the tokens found in the cached model, at least as many
+        times as the tokens of the n-gram. The lists are merged as sorted arrays of topic ids, and the outcome is
+        kept in a bounded (least recently used) cache, as the same combinations of tokens recur across papers.
+        Topics are returned in order of first appearance, with the details (similarities and matched word) of
+        their last appearance.
+
+        Args:
+            grams (Union[Tuple[str, ...], List[str]]): The tokens of the n-gram.
+
+        Returns:
+            List[Dict]: A list of dictionaries containing topic information, or an empty list if no topic is shared.
+        """
+        grams = tuple(grams)
+        try:
+            self.merged_words.move_to_end(grams)
+            return self.merged_words[grams]
+        except KeyError:
+            pass
+
+        list_of_matched_topics = list()
+        indexed_words = [(gram, self.__get_word_topic_ids(gram)) for gram in grams]
+        if all(indexed_word is not None and indexed_word[3] is None for _, indexed_word in indexed_words):
+            # every token is in the model, with no repeated topic: the shared topics are the ones in all the lists
+            shared_ids = indexed_words[0][1][0]
+            for _, (word_ids, _, _, _) in indexed_words[1:]:
+                shared_ids = np.intersect1d(shared_ids, word_ids, assume_unique=True)
+
+            if len(shared_ids) > 0:
+                first_ids, first_positions, _, _ = indexed_words[0][1]
+                last_ids, last_positions, _, _ = indexed_words[-1][1]
+                order = np.argsort(first_positions[np.searchsorted(first_ids, shared_ids)], kind="stable")
+                items_of_last_word = self.get_words_from_model(grams[-1])
+                list_of_matched_topics = [items_of_last_word[position] for position in last_positions[np.searchsorted(last_ids, shared_ids[order])]]
+        else:
+            indexed_words = [(gram, indexed_word) for gram, indexed_word in indexed_words if indexed_word is not None]
+            if len(indexed_words) > 0:
+                topic_ids = np.concatenate([indexed_word[0] for _, indexed_word in indexed_words])
+                first_positions = np.concatenate([indexed_word[1] for _, indexed_word in indexed_words])
+                last_positions = np.concatenate([indexed_word[2] for _, indexed_word in indexed_words])
+                counts = np.concatenate([indexed_word[3] if indexed_word[3] is not None else np.ones(len(indexed_word[0]), dtype=np.int64)
+                                         for _, indexed_word in indexed_words])
+                words = np.repeat(np.arange(len(indexed_words)), [len(indexed_word[0]) for _, indexed_word in indexed_words])
+                _, first, inverse = np.unique(topic_ids, return_index=True, return_inverse=True)
+                last = len(topic_ids) - 1 - np.unique(topic_ids[::-1], return_index=True)[1]
+                shared = np.bincount(inverse.ravel(), weights=counts) >= len(grams)
+                first, last = first[shared], last[shared]
+
+                order = np.lexsort((first_positions[first], words[first]))
+                items_of_words = dict()
+                for element in last[order]:
+                    word = words[element]
+                    if word not in items_of_words:
+                        items_of_words[word] = self.get_words_from_model(indexed_words[word][0])
+                    list_of_matched_topics.append(items_of_words[word][last_positions[element]])
+
+        self.merged_words[grams] = list_of_matched_topics
+        if len(self.merged_words) > self.merged_words_cache_size:
+            self.merged_words.popitem(last=False)
+        return list_of_matched_topics
+
+
+    def __get_word_topic_ids(self, word: str) -> Union[Tuple[np.ndarray, np.ndarray, np.ndarray, Optional[np.ndarray]], None]:
+        """Returns the topics associated with a word of the cached model as a sorted array of topic ids.
+
+        Args:
+            word (str): The word to look up.
+
+        Returns:
+            Union[Tuple[np.ndarray, np.ndarray, np.ndarray, Optional[np.ndarray]], None]: the sorted topic ids and, for
+            each of them, its first and last position in the list of the word and its number of occurrences (None if
+            no topic is repeated). None if the word is not in the cached model.
+        """
+        try:
+            return self.word_topic_ids[word]
+        except KeyError:
+            pass
+
+        if word not in self.model:
+            return None
+
+        with self.topic_ids_lock:
+            topic_ids = np.fromiter((self.topic_ids.setdefault(topic_item["topic"], len(self.topic_ids)) for topic_item in self.model[word]), dtype=np.int32)
+        sorted_topic_ids, first_positions, counts = np.unique(topic_ids, return_index=True, return_counts=True)
+        if len(sorted_topic_ids) == len(topic_ids):
+            last_positions, counts = first_positions, None
+        else:
+            last_positions = len(topic_ids) - 1 - np.unique(topic_ids[::-1], return_index=True)[1]
+        self.word_topic_ids[word] = (sorted_topic_ids, first_positions, last_positions, counts)
+        return self.word_topic_ids[word]
+
+
 
 # =============================================================================
 #     FULL MODEL
@@ -225,6 +331,202 @@ class Model:
         return int(self.embedding_size)
 
 
+# =============================================================================
+#     TOPIC EMBEDDINGS
+# =============================================================================
+
+    def load_topic_embeddings(self, cso: Ontology) -> None:
+        """Loads (memory-mapping it) the matrix containing one normalised embedding for each CSO topic.
+
+        If the matrix is not available locally, or it was created for other topics (or for the same topics in a
+        different order), it is created from the full Word2Vec model. The matrix is saved with the fingerprint of
+        the topics of the ontology (see misc.get_fingerprint), which must match.
+
+        Args:
+            cso (Ontology): The ontology whose topics are represented by the rows of the matrix.
+        """
+        path = self.config.get_topic_embeddings_path()
+        self.topic_embeddings = load_with_fingerprint(path, get_fingerprint(cso.topics))
+        if self.topic_embeddings is None or len(self.topic_embeddings) != len(cso.topics):
+            self.create_topic_embeddings(cso)
+            self.topic_embeddings = np.load(path, mmap_mode="r")
+        if not self.silent:
+            print("Topic embeddings loaded.")
+
+
+    def create_topic_embeddings(self, cso: Ontology) -> None:
+        """Creates the matrix containing one normalised embedding for each CSO topic and saves it locally.
+
+        The embedding of a topic is the vector of its label (with underscores) if this is in the vocabulary
+        of the full Word2Vec model. Otherwise, it is the sum of the vectors of its tokens. Rows follow the
+        topic ids of the ontology (see Ontology.get_topic_ids). Topics without any vector get a zero row.
+
+        Args:
+            cso (Ontology): The ontology whose topics are represented by the rows of the matrix.
+        """
+        if not self.silent:
+            print("Creating the topic embeddings from the word2vec model.")
+        topics = list(cso.topics)
+        self.__save_topic_embeddings(self.__compute_topic_embeddings(topics), topics)
+
+
+    def update_topic_embeddings(self, cso: Ontology, previous_topics: List[str], verify: bool = False) -> None:
+        """Updates the matrix of the topic embeddings after an update of the ontology (with the same Word2Vec model).
+
+        The rows of the topics that were already in the previous version of the ontology are reused, so the full
+        Word2Vec model is loaded only to compute the embeddings of the new topics.
+
+        Args:
+            cso (Ontology): The updated ontology.
+            previous_topics (List[str]): The topics of the previous version, following the rows of the current matrix.
+            verify (bool, optional): If True, it checks that the updated matrix is equal to the one created from scratch.
+        """
+        path = self.config.get_topic_embeddings_path()
+        previous_embeddings = load_with_fingerprint(path, get_fingerprint(previous_topics))
+        if previous_embeddings is None or len(previous_embeddings) != len(previous_topics):
+            self.create_topic_embeddings(cso)
+            return
+
+        topics = list(cso.topics)
+        previous_ids = {topic: topic_id for topic_id, topic in enumerate(previous_topics)}
+        known = [topic_id for topic_id, topic in enumerate(topics) if topic in previous_ids]
+        new = [topic_id for topic_id, topic in enumerate(topics) if topic not in previous_ids]
+        if not self.silent:
+            print("Updating the topic embeddings: {} new topics, {} reused.".format(len(new), len(known)))
+
+        topic_embeddings = np.zeros((len(topics), previous_embeddings.shape[1]), dtype=np.float32)
+        topic_embeddings[known] = previous_embeddings[[previous_ids[topics[topic_id]] for topic_id in known]]
+        if len(new) > 0:
+            topic_embeddings[new] = self.__compute_topic_embeddings([topics[topic_id] for topic_id in new])
+        del previous_embeddings
+        self.__save_topic_embeddings(topic_embeddings, topics)
+
+        if verify:
+            if np.array_equal(topic_embeddings, self.__compute_topic_embeddings(topics)):
+                print("The updated topic embeddings are equal to the ones created from scratch.")
+            else:
+                print("The updated topic embeddings differ from the ones created from scratch.")
+
+
+    def __compute_topic_embeddings(self, topics: List[str]) -> np.ndarray:
+        """Computes the normalised embeddings of the given topics (see create_topic_embeddings) with the full Word2Vec model.
+
+        Args:
+            topics (List[str]): The topics.
+
+        Returns:
+            np.ndarray: One row (float32) for each topic.
+        """
+        loaded_full_model = self.full_model is not None
+        if not loaded_full_model:
+            self.__load_word2vec_model()
+
+        topic_embeddings = np.zeros((len(topics), self.full_model.vector_size), dtype=np.float32)
+        for topic_id, topic in enumerate(topics):
+            topic_wu = topic.replace(" ", "_")
+            terms = [topic_wu] if topic_wu in self.full_model.key_to_index else topic_wu.split("_")
+            for term in terms:
+                if term in self.full_model.key_to_index:
+                    topic_embeddings[topic_id] += self.full_model[term]
+
+        norms = np.linalg.norm(topic_embeddings, axis=1, keepdims=True)
+        topic_embeddings = np.divide(topic_embeddings, norms, out=np.zeros_like(topic_embeddings), where=norms > 0)
+
+        if not loaded_full_model and not self.use_full_model:
+            self.full_model = None
+        return topic_embeddings
+
+
+    def __save_topic_embeddings(self, topic_embeddings: np.ndarray, topics: List[str]) -> None:
+        """Saves the matrix of the topic embeddings locally, with the fingerprint of its topics (replacing the previous
+        one only once it is written).
+
+        Args:
+            topic_embeddings (np.ndarray): The matrix to save.
+            topics (List[str]): The topics represented by the rows of the matrix.
+        """
+        path = self.config.get_topic_embeddings_path()
+        temporary_path = get_temporary_path(path)
+        try:
+            np.save(temporary_path, topic_embeddings)
+            replace_with_fingerprint(temporary_path, path, get_fingerprint(topics))
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+        if not self.silent:
+            print("Saving the topic embeddings in", path)
+
+
+    def get_topic_embeddings(self, topic_ids: np.ndarray) -> np.ndarray:
+        """Retrieves the normalised embeddings of the given topics.
+
+        Args:
+            topic_ids (np.ndarray): The ids of the topics (as returned by Ontology.get_topic_ids).
+
+        Returns:
+            np.ndarray: One row for each topic. Topics with id -1 (not in the ontology) get a zero row.
+
+        Raises:
+            ValueError: If the topic embeddings are not loaded.
+        """
+        if self.topic_embeddings is None:
+            raise ValueError('The topic embeddings are not loaded. Call load_topic_embeddings first')
+        topic_embeddings = np.zeros((len(topic_ids), self.topic_embeddings.shape[1]))
+        known = topic_ids >= 0
+        topic_embeddings[known] = self.topic_embeddings[topic_ids[known]]
+        return topic_embeddings
+
+
+# =============================================================================
+#     SHARED ARRAYS
+# =============================================================================
+
+    def get_shared_arrays(self) -> Dict[str, np.ndarray]:
+        """Returns the arrays to publish in shared memory (see sharedarrays.SharedArrays), so that other processes
+        can use this model without loading their own copy: the cached model, encoded as arrays (if it has the
+        expected structure), and the vectors of the full model, with their norms (if it is loaded). The topic
+        embeddings are not included, as they are memory-mapped from disk, and so already shared.
+
+        Returns:
+            Dict[str, np.ndarray]: the arrays, by name.
+        """
+        arrays = dict()
+        cached_model = encode_cached_model(self.model) if isinstance(self.model, dict) else None
+        if cached_model is not None:
+            arrays.update({"cached_model.{}".format(name): array for name, array in cached_model.items()})
+        if self.full_model is not None:
+            self.full_model.fill_norms()
+            keys = [key.encode("utf-8") for key in self.full_model.index_to_key]
+            arrays["full_model.keys"] = np.array(keys, dtype="S{}".format(max([len(key) for key in keys] + [1])))
+            arrays["full_model.vectors"] = self.full_model.vectors
+            arrays["full_model.norms"] = self.full_model.norms
+        return arrays
+
+
+    def attach_shared_arrays(self, arrays: Dict[str, np.ndarray]) -> None:
+        """Loads the models from the arrays published by another process (see get_shared_arrays), without copying
+        them. The models that were not published are loaded from disk, as usual.
+
+        Args:
+            arrays (Dict[str, np.ndarray]): The arrays, by name (see sharedarrays.SharedArrays.attach).
+        """
+        if "cached_model.words" in arrays:
+            self.model = CachedModelView({name[len("cached_model."):]: array for name, array in arrays.items() if name.startswith("cached_model.")})
+        else:
+            self.__load_cached_model()
+
+        if "full_model.vectors" in arrays:
+            vectors = arrays["full_model.vectors"]
+            full_model = KeyedVectors(vector_size=vectors.shape[1], count=0, dtype=vectors.dtype)
+            full_model.index_to_key = [key.decode("utf-8") for key in arrays["full_model.keys"].tolist()]
+            full_model.key_to_index = {key: index for index, key in enumerate(full_model.index_to_key)}
+            full_model.vectors = vectors
+            full_model.norms = arrays["full_model.norms"]
+            self.full_model = full_model
+            self.embedding_size = int(vectors.shape[1])
+        elif self.use_full_model:
+            self.__load_word2vec_model()
+
 # =============================================================================
 #     SETUP - UPDATE HELPERS
 # =============================================================================
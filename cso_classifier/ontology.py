@@ -1,25 +1,37 @@
-import pickle
 import os
 import csv as co
 import urllib.request
 import json
-from collections import deque
+import time
+from collections import defaultdict, deque
 from typing import Any, Dict, List, Optional, Set, Tuple, Union
+import numpy as np
 from igraph import Graph
 
 from .config import Config
-from .misc import print_header, download_file
+from .misc import print_header, download_file, get_fingerprint
+from .columnar import StringTable, FlagView, StringView, ListView, encode_flags, encode_strings, encode_lists, read_arrays, write_arrays, \
+    get_temporary_path, load_with_fingerprint, replace_with_fingerprint, FINGERPRINT_SUFFIX
+
+
+UNREACHABLE_DISTANCE = 255 # value stored in the distance oracle for topics that are not connected (or too far apart)
+COMPILED_FORMAT = 3 # version of the layout of the compiled ontology, which is rebuilt if it does not match
+COMPILED_VIEWS = {'topics': FlagView, 'topics_wu': StringView, 'broaders': ListView, 'narrowers': ListView, 'same_as': ListView,
+                  'primary_labels': StringView, 'primary_labels_wu': StringView, 'topic_stems': ListView, 'all_broaders': ListView}
+COMPONENTS = ('strings',) + tuple(COMPILED_VIEWS) + ('ancestors', 'distances', 'graph') # components that can be loaded on demand
 
 
 class Ontology:
     """ A simple abstraction layer for using the Computer Science Ontology """
 
-    def __init__(self, load_ontology: bool = True, silent: bool = False) -> None:
+    def __init__(self, load_ontology: bool = True, silent: bool = False, components: Optional[List[str]] = None) -> None:
         """ Initialising the ontology class
 
         Args:
             load_ontology (bool, optional): If True, loads the ontology. Defaults to True.
             silent (bool, optional): If True, suppresses print statements. Defaults to False.
+            components (Optional[List[str]], optional): The components of the ontology (see COMPONENTS) to load
+                straight away. The others are loaded on first access. Defaults to None (all on first access).
         """
         self.silent = silent
         self.topics = dict()
@@ -31,7 +43,15 @@ class Ontology:
         self.primary_labels_wu = dict()
         self.topic_stems = dict()
         self.all_broaders = dict()
+        self.strings = None             # string table of the compiled ontology
+        self.compiled = None            # arrays of the compiled ontology (memory-mapped)
+        self.fingerprint = None         # fingerprint of the compiled ontology (see get_fingerprint)
         self.graph = None
+        self.topic_ids = None
+        self.ancestors_indptr = None    # ancestor closure (CSR format): the ancestors of topic i are
+        self.ancestors_indices = None   # ancestors_indices[ancestors_indptr[i]:ancestors_indptr[i+1]]
+        self.descendants = dict()       # cache of the descendants of each branch (topic -> frozenset)
+        self.distances = None
 
         self.config = Config()
 
@@ -46,7 +66,52 @@ class Ontology:
                               'all_broaders')
 
         if load_ontology:
-            self.load_ontology_pickle()
+            self.load_compiled_ontology()
+            self.load_components(components if components is not None else [])
+
+
+    def __getattr__(self, name: str) -> Any:
+        """ Function that loads the components of the compiled ontology on first access: the string table and
+        the dict-like views over the relationships. It is only called for attributes that have not been set yet.
+
+        Args:
+            name (str): The name of the component.
+
+        Returns:
+            Any: the component.
+        """
+        compiled = self.__dict__.get('compiled')
+        if compiled is None or name not in COMPILED_VIEWS and name != 'strings':
+            raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, name))
+
+        if name == 'strings':
+            component = StringTable(compiled["strings"], {"sorted": compiled["strings.sorted"], "ids": compiled["strings.ids"]})
+        else:
+            component = COMPILED_VIEWS[name](self.strings, *[array for array_name, array in compiled.items() if array_name.startswith(name + ".")])
+        setattr(self, name, component)
+        return component
+
+
+    def load_components(self, components: List[str]) -> None:
+        """ Function that loads the given components of the ontology, if they have not been loaded yet.
+        Components that are not loaded here are loaded when first needed.
+
+        Args:
+            components (List[str]): The components to load (see COMPONENTS).
+        """
+        for component in components:
+            if component not in COMPONENTS:
+                raise ValueError("Unknown component of the ontology: {}. Choose from: {}".format(component, ", ".join(COMPONENTS)))
+            if component == 'ancestors':
+                if self.ancestors_indptr is None:
+                    self.__create_ancestor_closure()
+            elif component == 'distances':
+                if self.distances is None:
+                    self.read_distance_oracle()
+            elif component == 'graph':
+                self.get_ontology_graph()
+            else:
+                getattr(self, component)
 
 
 # =============================================================================
@@ -74,20 +139,82 @@ class Ontology:
                 setattr(self, attr, cso[attr])
             except KeyError:
                 ValueError("Key {} not found in the ontology".format(attr))
+        self.strings = None
+        self.compiled = None
+        self.fingerprint = None
+        self.topic_ids = None
+        self.ancestors_indptr = None
+        self.ancestors_indices = None
+        self.descendants = dict()
 
 
-    def load_ontology_pickle(self) -> None:
+    def load_compiled_ontology(self) -> None:
         """ Function that loads CSO.
-        This file has been serialised using Pickle allowing to be loaded quickly.
+        The compiled ontology is memory-mapped: its relationships are exposed as read-only dict-like views
+        over topic-id arrays, without building the dictionaries in memory. Each view (and the graph and the
+        distance oracle) is created when first accessed.
         """
         self.check_ontology()
-        ontology = pickle.load(open(self.config.get_cso_pickle_path(), "rb" ))
-        self.from_cso_to_single_items(ontology)
-        self.read_ontology_graph_version()
+        arrays, metadata = read_arrays(self.config.get_cso_compiled_path())
+        if metadata.get("format") != COMPILED_FORMAT:
+            if not self.silent:
+                print("The compiled ontology is outdated.")
+            self.__load_cso_from_csv()
+            arrays, metadata = read_arrays(self.config.get_cso_compiled_path())
+
+        for attr in ('strings',) + self.ontology_attr:
+            self.__dict__.pop(attr, None) # loaded on first access, see __getattr__
+        self.compiled = arrays
+        self.fingerprint = metadata["fingerprint"]
+        self.graph = None
+        self.distances = None
+        self.topic_ids = None
+        self.ancestors_indptr = None
+        self.ancestors_indices = None
+        self.descendants = dict()
+
         if not self.silent:
             print("Computer Science Ontology loaded.")
 
 
+    def __write_compiled_ontology(self) -> None:
+        """ Function that writes the compiled version of the ontology: a string table holding every label once
+        (starting with the topics, so that the id of a topic is also its string id), and the relationships as
+        arrays of string ids (in CSR format, for the ones mapping to lists).
+        """
+        strings = dict.fromkeys(self.topics)
+        for attr in ('topics_wu', 'broaders', 'narrowers', 'same_as', 'primary_labels', 'primary_labels_wu', 'topic_stems'):
+            for key, values in getattr(self, attr).items():
+                strings[key] = None
+                strings.update(dict.fromkeys([values] if isinstance(values, str) else values))
+
+        arrays = {"strings": StringTable.encode(list(strings))}
+        arrays.update({"strings.{}".format(name): array for name, array in StringTable.encode_index(list(strings)).items()})
+        strings = StringTable(arrays["strings"], {"sorted": arrays["strings.sorted"], "ids": arrays["strings.ids"]})
+        for attr, encode in (('topics', encode_flags), ('topics_wu', encode_strings), ('broaders', encode_lists), ('narrowers', encode_lists),
+                             ('same_as', encode_lists), ('primary_labels', encode_strings), ('primary_labels_wu', encode_strings),
+                             ('topic_stems', encode_lists)):
+            arrays.update({"{}.{}".format(attr, name): array for name, array in encode(strings, getattr(self, attr)).items()})
+        all_broaders = {topic: self.all_broaders.get(topic, []) for topic in self.topics}
+        arrays.update({"all_broaders.{}".format(name): array for name, array in encode_lists(strings, all_broaders).items()})
+
+        write_arrays(self.config.get_cso_compiled_path(), arrays, {"format": COMPILED_FORMAT, "topics": len(self.topics), "fingerprint": self.get_fingerprint()})
+        print("Saving the compiled ontology ({:.1f} MB) in".format(os.path.getsize(self.config.get_cso_compiled_path()) / 2**20), self.config.get_cso_compiled_path())
+
+
+    def get_fingerprint(self) -> str:
+        """ Function that returns the fingerprint of the ontology (see misc.get_fingerprint): a digest of its topics, in
+        the order of their ids, and of their broaders. The distance oracle is saved with it, and it is created again
+        if the ontology changes. It is stored in the compiled ontology, and otherwise computed from the relationships.
+
+        Returns:
+            str: the fingerprint of the ontology.
+        """
+        if self.compiled is not None:
+            return self.fingerprint
+        return get_fingerprint([topic, sorted(self.broaders.get(topic, []))] for topic in self.topics)
+
+
     def get_primary_label(self, topic: str) -> str:
         """ Function that returns the primary (preferred) label for a topic.
         If this topic belongs to a cluster.
@@ -161,15 +288,7 @@ class Ontology:
         if climb_ont == 'first':
             all_broaders = self.get_broader_of_topics(found_topics, all_broaders)
         elif climb_ont == 'all':
-            while True:
-                # """
-                # recursively adding new broaders based on the current list of topics.
-                #Broaders var increases each iteration. It stops when it does not change anymore.
-                # """
-                all_broaders_back = all_broaders.copy()
-                all_broaders = self.get_broader_of_topics(found_topics, all_broaders)
-                if all_broaders_back == all_broaders:  # no more broaders have been found
-                    break
+            all_broaders = self.get_all_broaders_of_topics(found_topics)
         elif climb_ont == 'no':
             return dict() #it is empty at this stage
         else:
@@ -223,6 +342,80 @@ class Ontology:
         return all_broaders
 
 
+    def get_all_broaders_of_topics(self, found_topics: List[str]) -> Dict[str, Set[str]]:
+        """ Function that returns all the broader topics (up to the root) for a given set of topics.
+            For each broader topic, it returns the topics it is broader of: both the topics initially found
+            and the broader topics in between. These are obtained in a single pass over the ancestor closure.
+
+        Args:
+            found_topics (List[str]): It contains the topics found with string similarity.
+
+        Returns:
+            Dict[str, Set[str]]: contains all the broaders of the found topics (closest first), with the topics they are broader of.
+        """
+        # listing the broaders level by level, as the explanation of the enhanced topics is completed in this order
+        broaders = dict()
+        level = list(found_topics)
+        while len(level) > 0:
+            next_level = list()
+            for topic in level:
+                for broader in self.broaders.get(topic, []):
+                    if broader not in broaders:
+                        broaders[broader] = set()
+                        next_level.append(broader)
+            level = next_level
+
+        # each of the found topics and their broaders is narrower of all its ancestors
+        topic_ids = self.get_topic_ids(list(found_topics) + list(broaders.keys()))
+        narrower_ids, broader_ids = self.__get_ancestor_ids(np.unique(topic_ids[topic_ids >= 0]))
+        order = np.argsort(broader_ids, kind="stable")
+        narrower_ids = narrower_ids[order]
+        broader_ids, first_narrowers = np.unique(broader_ids[order], return_index=True)
+
+        topics = list(self.topics)
+        for broader_id, narrowers in zip(broader_ids.tolist(), np.split(narrower_ids, first_narrowers[1:])):
+            broaders[topics[broader_id]] = {topics[narrower_id] for narrower_id in narrowers.tolist()}
+
+        return broaders
+
+
+    def __get_ancestor_ids(self, topic_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """ Function that returns the ancestors of the given topics, from the ancestor closure.
+
+        Args:
+            topic_ids (np.ndarray): The ids of the topics.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: pairs of topic ids (topic, ancestor), as two aligned arrays.
+        """
+        if self.ancestors_indptr is None:
+            self.__create_ancestor_closure()
+
+        starts = self.ancestors_indptr[topic_ids]
+        lengths = self.ancestors_indptr[topic_ids + 1] - starts
+        positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - starts, lengths)
+        ancestor_ids = self.ancestors_indices[positions]
+        labelled = ancestor_ids < len(self.topics) # broaders without a label are not topics
+
+        return np.repeat(topic_ids, lengths)[labelled], ancestor_ids[labelled].astype(np.int64)
+
+
+    def __create_ancestor_closure(self) -> None:
+        """ Function that creates the ancestor closure of the ontology (in CSR format), keyed by topic id,
+        from the lists of all broaders of each topic.
+        """
+        if self.compiled is not None:
+            # topics come first in the string table, and all_broaders is keyed by topic: it is the ancestor closure
+            self.ancestors_indptr = self.compiled["all_broaders.indptr"]
+            self.ancestors_indices = self.compiled["all_broaders.indices"]
+            return
+
+        topic_ids = {topic: topic_id for topic_id, topic in enumerate(self.topics)}
+        ancestors = [sorted(topic_ids[broader] for broader in self.all_broaders.get(topic, []) if broader in topic_ids) for topic in self.topics]
+        self.ancestors_indptr = np.concatenate(([0], np.cumsum([len(row) for row in ancestors]))).astype(np.int64)
+        self.ancestors_indices = np.fromiter((ancestor for row in ancestors for ancestor in row), dtype=np.int64, count=self.ancestors_indptr[-1])
+
+
     def get_all_broaders_of_topic(self, topic: str) -> List[str]:
         """ Function that returns all the broader topics up to the root.
 
@@ -302,19 +495,60 @@ class Ontology:
         if topic not in self.topics:
             raise ValueError(f"Error: The topic '{topic}' is not available in this version of the Ontology.")
         
-        set_of_descendants = set()
-        queue = deque() 
-        queue.append(topic)
-        
-        while len(queue) > 0:
-            dequeued = queue.popleft()
-            set_of_descendants.add(dequeued)
-            if dequeued in self.narrowers:
-                narrower_concepts = self.narrowers[dequeued]
-                for narrower_concept in narrower_concepts:
-                    queue.append(narrower_concept)
-        
-        return set_of_descendants
+        if topic not in self.descendants:
+            # the descendants of the topic are the topics having it in their ancestor closure
+            if self.ancestors_indptr is None:
+                self.__create_ancestor_closure()
+            topic_id = int(self.get_topic_ids([topic])[0])
+            positions = np.flatnonzero(self.ancestors_indices == topic_id)
+            descendant_ids = np.searchsorted(self.ancestors_indptr, positions, side='right') - 1
+            topics = list(self.topics)
+            self.descendants[topic] = frozenset([topic] + [topics[descendant_id] for descendant_id in descendant_ids.tolist()])
+
+        return set(self.descendants[topic])
+
+
+    def get_branch_ids(self, branches: Union[List[str], Set[str], str]) -> np.ndarray:
+        """ Function that returns the ids of the topics at the top of the given branches of the ontology,
+        to be used with are_descendants_of_branches.
+
+        Args:
+            branches (Union[List[str], Set[str], str]): The topics at the top of the branches.
+
+        Returns:
+            np.ndarray: the ids of the given topics.
+        """
+        if type(branches) == str:
+            branches = [branches]
+        elif type(branches) != list and type(branches) != set:
+            raise TypeError("Error: The type of 'topics' must be either list or set.")
+
+        for branch in branches:
+            if type(branch) != str:
+                raise TypeError("Error: The type of 'topic' must be str.")
+            if branch not in self.topics:
+                raise ValueError(f"Error: The topic '{branch}' is not available in this version of the Ontology.")
+
+        return np.unique(self.get_topic_ids(list(branches)))
+
+
+    def are_descendants_of_branches(self, topics: List[str], branch_ids: np.ndarray) -> List[bool]:
+        """ Function that checks whether the given topics belong to (at least) one of the given branches,
+        i.e. whether they are the topic at the top of the branch or one of its descendants. It looks at the
+        ancestor closure of the topics, so there is no need to traverse the ontology.
+
+        Args:
+            topics (List[str]): The topics to check.
+            branch_ids (np.ndarray): The ids of the topics at the top of the branches (from get_branch_ids).
+
+        Returns:
+            List[bool]: whether each of the given topics belongs to one of the branches.
+        """
+        topic_ids = self.get_topic_ids(topics)
+        known_topic_ids = np.unique(topic_ids[topic_ids >= 0])
+        narrower_ids, ancestor_ids = self.__get_ancestor_ids(known_topic_ids)
+        in_branches = np.union1d(known_topic_ids[np.isin(known_topic_ids, branch_ids)], narrower_ids[np.isin(ancestor_ids, branch_ids)])
+        return ((topic_ids >= 0) & np.isin(topic_ids, in_branches)).tolist()
 
 
     def find_closest_matches(self, word: str) -> List[str]:
@@ -361,7 +595,7 @@ class Ontology:
             int: The distance (number of edges). Returns 99 if unreachable or error.
         """
         try:
-            this_dist = self.graph.shortest_paths_dijkstra(first_topic, second_topic)
+            this_dist = self.get_ontology_graph().shortest_paths_dijkstra(first_topic, second_topic)
             this_dist = this_dist[0][0]
         except ValueError:
             this_dist = 99
@@ -369,6 +603,73 @@ class Ontology:
         return this_dist
 
 
+    def get_graph_distances_in_topics(self, topics: List[str]) -> np.ndarray:
+        """ Function that returns the matrix of distances between all pairs of the given topics.
+        Distances are read from the precomputed distance oracle, in constant time per pair.
+
+        Args:
+            topics (List[str]): The topics to analyse.
+
+        Returns:
+            np.ndarray: The square matrix of distances (number of edges). The distance is 99 if the topics
+            are unreachable or if any of them is not in the ontology.
+        """
+        if self.distances is None:
+            self.read_distance_oracle()
+
+        topic_ids = self.get_topic_ids(topics)
+        known = np.flatnonzero(topic_ids >= 0)
+        topic_ids = topic_ids[known]
+
+        # the oracle stores the upper triangle (without diagonal) of the matrix, row by row
+        num_topics = len(self.topics)
+        lower = np.minimum.outer(topic_ids, topic_ids)
+        upper = np.maximum.outer(topic_ids, topic_ids)
+        same_topic = lower == upper
+        positions = lower * num_topics - lower * (lower + 1) // 2 + upper - lower - 1
+        distances = self.distances[np.where(same_topic, 0, positions)].astype(int)
+        distances[same_topic] = 0
+        distances[distances == UNREACHABLE_DISTANCE] = 99
+
+        matrix = np.full((len(topics), len(topics)), 99, dtype=int)
+        matrix[np.ix_(known, known)] = distances
+
+        return matrix
+
+
+    def get_topic_ids(self, topics: List[str]) -> np.ndarray:
+        """ Function that returns the ids of the given topics, i.e., their position within the ontology.
+        These ids index the precomputed artifacts, such as the distance oracle.
+
+        Args:
+            topics (List[str]): The topics to analyse.
+
+        Returns:
+            np.ndarray: The ids of the topics, -1 for topics that are not in the ontology.
+        """
+        if self.compiled is not None:
+            topic_ids = self.strings.get_ids(list(topics))
+        else:
+            if self.topic_ids is None:
+                self.topic_ids = {topic: topic_id for topic_id, topic in enumerate(self.topics)}
+            topic_ids = np.array([self.topic_ids.get(topic, -1) for topic in topics], dtype=np.int64)
+        topic_ids[topic_ids >= len(self.topics)] = -1 # other labels in the string table of the compiled ontology
+        return topic_ids
+
+
+    def read_distance_oracle(self) -> None:
+        """ Function that reads (memory-mapping it) the distance oracle of the CSO Ontology.
+        If it is not available, or it was created from another version of the ontology (see get_fingerprint), it will be created.
+        """
+        num_topics = len(self.topics)
+        self.distances = load_with_fingerprint(self.config.get_cso_distances_path(), self.get_fingerprint())
+        if self.distances is not None and self.distances.shape == (num_topics * (num_topics - 1) // 2,):
+            return
+
+        self.__create_distance_oracle()
+        self.distances = np.load(self.config.get_cso_distances_path(), mmap_mode="r")
+
+
     def read_ontology_graph_version(self) -> None:
         """ Function that reads the graph representation of the CSO Ontology
         """
@@ -386,10 +687,10 @@ class Ontology:
 
     def check_ontology(self) -> None:
         """ Function that checks if the ontology is available.
-        If not, it will check if a csv version exists and then it will create the pickle file.
+        If not, it will check if a csv version exists and then it will create the compiled ontology.
         """
-        if not os.path.exists(self.config.get_cso_pickle_path()):
-            print("Ontology pickle file is missing.")
+        if not os.path.exists(self.config.get_cso_compiled_path()):
+            print("Compiled ontology file is missing.")
 
             if not os.path.exists(self.config.get_cso_path()):
                 print("The source file of the Computer Science Ontology is missing. Attempting to download it now...")
@@ -413,45 +714,81 @@ class Ontology:
         """
 
         print("Extracting and converting ontology.")
-        with open(self.config.get_cso_path(), 'r') as onto_file:
-
-            ontology = co.reader(onto_file, delimiter=';')
-
-            for triple in ontology:
-                if triple[1] == 'klink:broaderGeneric':
-                    # loading broader topics
-                    if triple[2] in self.broaders:
-                        self.broaders[triple[2]].append(triple[0])
-                    else:
-                        self.broaders[triple[2]] = [triple[0]]
-
-                    # loading narrower topics
-                    if triple[0] in self.narrowers:
-                        self.narrowers[triple[0]].append(triple[2])
-                    else:
-                        self.narrowers[triple[0]] = [triple[2]]
-                elif triple[1] == 'klink:relatedEquivalent':
-                    if triple[2] in self.same_as:
-                        self.same_as[triple[2]].append(triple[0])
-                    else:
-                        self.same_as[triple[2]] = [triple[0]]
-                elif triple[1] == 'rdfs:label':
-                    self.topics[triple[0]] = True
-                    self.topics_wu[triple[0].replace(" ", "_")] = triple[0]
-                elif triple[1] == 'klink:primaryLabel':
-                    self.primary_labels[triple[0]] = triple[2]
-                    self.primary_labels_wu[triple[0].replace(" ", "_")] = triple[2].replace(" ", "_")
-
-
-            self.__generate_topic_stems()
-            self.__get_all_branches()
-
-
-            with open(self.config.get_cso_pickle_path(), 'wb') as cso_file:
-                print("Creating ontology pickle file from a copy of the CSO Ontology found in",self.config.get_cso_path())
-                pickle.dump(self.from_single_items_to_cso(), cso_file)
+        timings = dict()
+        start = time.perf_counter()
+        self.__load_triples(self.__read_triples(self.config.get_cso_path()))
+        timings["parsing"] = time.perf_counter() - start
 
-            self.__create_graph_from_cso()
+        start = time.perf_counter()
+        self.__generate_topic_stems()
+        self.__get_all_branches()
+        timings["ancestor closure"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        print("Creating the compiled ontology from a copy of the CSO Ontology found in",self.config.get_cso_path())
+        self.__write_compiled_ontology()
+        timings["compiled ontology"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.__create_graph_from_cso()
+        timings["graph"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.__create_distance_oracle()
+        timings["distance oracle"] = time.perf_counter() - start
+
+        print("Ontology artifacts rebuilt in {:.2f}s ({}).".format(sum(timings.values()), ", ".join("{}: {:.2f}s".format(step, timing) for step, timing in timings.items())))
+
+
+    @staticmethod
+    def __read_triples(path: str) -> List[Tuple[str, str, str]]:
+        """ Function that reads all the triples (subject, predicate, object) of a csv version of CSO.
+
+        Args:
+            path (str): The csv file.
+
+        Returns:
+            List[Tuple[str, str, str]]: the triples, in the order of the file.
+        """
+        with open(path, 'r') as onto_file:
+            return [(triple[0], triple[1], triple[2]) for triple in co.reader(onto_file, delimiter=';') if len(triple) >= 3]
+
+
+    def __load_triples(self, triples: List[Tuple[str, str, str]]) -> None:
+        """ Function that fills the dictionaries of the ontology (all but topic_stems and all_broaders) from its triples.
+
+        Args:
+            triples (List[Tuple[str, str, str]]): The triples of the ontology.
+        """
+        broader_generic = [(triple[0], triple[2]) for triple in triples if triple[1] == 'klink:broaderGeneric']
+        related_equivalent = [(triple[2], triple[0]) for triple in triples if triple[1] == 'klink:relatedEquivalent']
+        labels = [triple[0] for triple in triples if triple[1] == 'rdfs:label']
+        primary_labels = [(triple[0], triple[2]) for triple in triples if triple[1] == 'klink:primaryLabel']
+
+        self.from_cso_to_single_items({attr: dict() for attr in self.ontology_attr})
+        self.broaders = self.__group_by_key((narrower, broader) for broader, narrower in broader_generic)
+        self.narrowers = self.__group_by_key(broader_generic)
+        self.same_as = self.__group_by_key(related_equivalent)
+        self.topics = dict.fromkeys(labels, True)
+        self.topics_wu = {topic.replace(" ", "_"): topic for topic in labels}
+        self.primary_labels = dict(primary_labels)
+        self.primary_labels_wu = {topic.replace(" ", "_"): primary_label.replace(" ", "_") for topic, primary_label in primary_labels}
+
+
+    @staticmethod
+    def __group_by_key(pairs) -> Dict[str, List[str]]:
+        """ Function that groups the values of a list of (key, value) pairs by key, keeping their order.
+
+        Args:
+            pairs (Iterable[Tuple[str, str]]): The pairs to group.
+
+        Returns:
+            Dict[str, List[str]]: the values of each key.
+        """
+        groups = defaultdict(list)
+        for key, value in pairs:
+            groups[key].append(value)
+        return dict(groups)
 
 
     def __generate_topic_stems(self) -> None:
@@ -463,21 +800,63 @@ class Ontology:
             self.topic_stems[topic[:4]].append(topic)
 
 
-    def __get_all_branches(self) -> None:
-        """ Function that identifies all broaders of a given topic.
+    def __get_all_branches(self, previous: Optional["Ontology"] = None, changed_topics: Optional[Set[str]] = None) -> None:
+        """ Function that identifies all broaders of each topic (ancestor closure).
+        Topics are visited in topological order, from the roots of the ontology down, so that the broaders of
+        a topic are obtained from the ones of its direct broaders, which have already been computed.
+        When updating from a previous version of the ontology, only the topics whose broaders changed, the new
+        topics, and their descendants are visited: the others keep the broaders of the previous version.
+
+        Args:
+            previous (Optional[Ontology], optional): The previous version of the ontology. Defaults to None.
+            changed_topics (Optional[Set[str]], optional): The topics whose broaders changed since the previous version.
         """
-        for topic, _ in self.topics.items():
-            this_topic_broaders = list()
-            queue = deque()
-            queue.append(topic)
+        affected = set(self.topics) | set(self.narrowers) | set(self.broaders)
+        if previous is not None:
+            queue = deque(topic for topic in affected if topic in changed_topics or topic not in previous.topics)
+            affected = set()
             while len(queue) > 0:
                 dequeued = queue.popleft()
-                if dequeued in self.broaders:
-                    broaders = self.broaders[dequeued]
-                    for broader in broaders:
-                        queue.append(broader)
-                        this_topic_broaders.append(broader)
-            self.all_broaders[topic] = list(set(this_topic_broaders))
+                if dequeued not in affected:
+                    affected.add(dequeued)
+                    queue.extend(self.narrowers.get(dequeued, []))
+
+        ancestors = {topic: set() for topic in affected}
+        pending_broaders = dict()
+        for topic in affected:
+            pending_broaders[topic] = 0
+            for broader in self.broaders.get(topic, []):
+                if broader in affected:
+                    pending_broaders[topic] += 1
+                else:
+                    ancestors[topic].add(broader)
+                    ancestors[topic].update(previous.all_broaders[broader])
+
+        queue = deque(topic for topic in affected if pending_broaders[topic] == 0)
+        while len(queue) > 0:
+            broader = queue.popleft()
+            for narrower in self.narrowers.get(broader, []):
+                ancestors[narrower].add(broader)
+                ancestors[narrower].update(ancestors[broader])
+                pending_broaders[narrower] -= 1
+                if pending_broaders[narrower] == 0:
+                    queue.append(narrower)
+
+        for topic in self.topics:
+            if topic not in affected:
+                self.all_broaders[topic] = previous.all_broaders[topic]
+                continue
+            if pending_broaders[topic] > 0:
+                # the topic is part of a cycle: following its broaders until they have all been visited
+                visited = set()
+                queue = deque(self.broaders[topic])
+                while len(queue) > 0:
+                    dequeued = queue.popleft()
+                    if dequeued not in visited:
+                        visited.add(dequeued)
+                        queue.extend(self.broaders.get(dequeued, []))
+                ancestors[topic] = visited
+            self.all_broaders[topic] = list(ancestors[topic])
 
 
     def __create_graph_from_cso(self) -> None:
@@ -487,28 +866,244 @@ class Ontology:
         self.graph = Graph()
         self.graph.add_vertices(list(self.topics.keys()))
 
-        for topic, broaders in self.broaders.items():
-            list_of_edges = list()
-            for broader in broaders:
-                list_of_edges.append((topic,broader))
-            self.graph.add_edges(list_of_edges)
+        list_of_edges = [(topic, broader) for topic, broaders in self.broaders.items() for broader in broaders]
+        self.graph.add_edges(list_of_edges) # all at once, as igraph rebuilds its indices at each call
 
         self.graph.simplify()
         print("Saving the graph representation of the ontology (in a pickle object) in",self.config.get_cso_graph_path())
         self.graph.write_pickle(self.config.get_cso_graph_path())
 
 
-    def __download_ontology(self) -> bool:
+    def __create_distance_oracle(self, path: Optional[str] = None) -> None:
+        """ Function that generates the distance oracle of the ontology. It will be used by the postprocessing module.
+        The oracle contains the number of edges between every pair of topics (in the undirected hierarchy), stored
+        as the upper triangle of the distance matrix in a flat uint8 array. Distances are computed with a
+        bit-parallel breadth-first search, which explores the graph from 64 topics at a time.
+
+        Args:
+            path (Optional[str], optional): Where to save the oracle. Defaults to the path in the configuration.
+        """
+        print("Creating the distance oracle of the ontology.")
+        path = path if path is not None else self.config.get_cso_distances_path()
+        num_topics = len(self.topics)
+        adjacency = self.__get_undirected_adjacency()
+
+        temporary_path = get_temporary_path(path)
+        try:
+            oracle = np.lib.format.open_memmap(temporary_path, mode="w+", dtype=np.uint8, shape=(num_topics * (num_topics - 1) // 2,))
+            for first_source in range(0, num_topics, 64):
+                sources = np.arange(first_source, min(first_source + 64, num_topics))
+                distances = self.__get_bfs_distances(adjacency, sources)
+                for position, source in enumerate(sources):
+                    start = source * num_topics - source * (source + 1) // 2
+                    oracle[start:start + num_topics - source - 1] = distances[source + 1:, position]
+
+            oracle.flush()
+            del oracle
+            replace_with_fingerprint(temporary_path, path, self.get_fingerprint())
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+        print("Saving the distance oracle of the ontology ({:.1f} MB) in".format(os.path.getsize(path) / 2**20), path)
+
+
+    def __update_distance_oracle(self, previous: "Ontology") -> None:
+        """ Function that updates the distance oracle of the previous version of the ontology.
+        The distances from a topic (source) are still valid if they still are the distances of a breadth-first search:
+        (i) every new edge joins topics whose distance from the source differs at most by one, and (ii) every topic that
+        lost an edge still has a neighbour one step closer to the source. These conditions are only checked on the
+        changed edges. New topics get a distance from their neighbours. The distances from the other sources (and from
+        the new topics) are computed again; the ones between topics that are still valid are copied. If most sources
+        changed, the oracle is created from scratch.
+
+        Args:
+            previous (Ontology): The previous version of the ontology (with its distance oracle).
+        """
+        print("Updating the distance oracle of the ontology.")
+        if previous.distances is None:
+            previous.read_distance_oracle()
+        num_topics = len(self.topics)
+        num_previous_topics = len(previous.topics)
+        previous_ids = previous.get_topic_ids(list(self.topics)) # id in the previous version, -1 for new topics
+        adjacency = self.__get_undirected_adjacency()
+        indptr, neighbours = adjacency[0], adjacency[1]
+
+        # edges are compared in the previous ids (new topics are numbered after the previous ones)
+        extended_ids = previous_ids.copy()
+        new_topics = np.flatnonzero(previous_ids < 0)
+        extended_ids[new_topics] = num_previous_topics + np.arange(len(new_topics))
+        edges = np.stack((extended_ids[np.repeat(np.arange(num_topics), np.diff(indptr))], extended_ids[neighbours]), axis=1)
+        previous_indptr, previous_neighbours = previous.__get_undirected_adjacency()[:2]
+        previous_edges = np.stack((np.repeat(np.arange(num_previous_topics), np.diff(previous_indptr)), previous_neighbours), axis=1)
+        size = num_previous_topics + len(new_topics)
+        edge_keys, previous_edge_keys = edges[:, 0] * size + edges[:, 1], previous_edges[:, 0] * size + previous_edges[:, 1]
+        added_edges = edges[~np.isin(edge_keys, previous_edge_keys)]
+        removed_edges = previous_edges[~np.isin(previous_edge_keys, edge_keys)]
+        print("Edges added: {}, removed: {}, new topics: {}.".format(len(added_edges) // 2, len(removed_edges) // 2, len(new_topics)))
+
+        # distances (from every previous source) of the previous topics and of the new topics
+        def get_distances(topic_ids: np.ndarray) -> np.ndarray:
+            rows = np.full((len(topic_ids), num_previous_topics), UNREACHABLE_DISTANCE, dtype=np.int16)
+            for position, topic_id in enumerate(topic_ids.tolist()):
+                if topic_id < num_previous_topics:
+                    rows[position] = self.__get_oracle_row(previous.distances, num_previous_topics, topic_id)
+                else:
+                    rows[position] = new_topic_distances[topic_id - num_previous_topics]
+            return rows
+
+        new_topic_distances = np.full((len(new_topics), num_previous_topics), UNREACHABLE_DISTANCE, dtype=np.int16)
+        new_topic_edges = added_edges[added_edges[:, 0] >= num_previous_topics]
+        for _ in range(len(new_topics)):
+            neighbour_distances = get_distances(new_topic_edges[:, 1]) + 1
+            updated = new_topic_distances.copy()
+            np.minimum.at(updated, new_topic_edges[:, 0] - num_previous_topics, np.minimum(neighbour_distances, UNREACHABLE_DISTANCE))
+            if np.array_equal(updated, new_topic_distances):
+                break
+            new_topic_distances = updated
+
+        changed_sources = np.zeros(num_previous_topics, dtype=bool)
+        added_pairs = added_edges[added_edges[:, 0] < added_edges[:, 1]]
+        for first_edge in range(0, len(added_pairs), 256):
+            block = added_pairs[first_edge:first_edge + 256]
+            first_distances, second_distances = get_distances(block[:, 0]), get_distances(block[:, 1])
+            changed_sources |= (np.abs(first_distances - second_distances) > 1).any(axis=0)
+        new_ids = self.get_topic_ids(list(previous.topics))
+        for topic_id in np.unique(removed_edges[:, 0]).tolist():
+            new_id = int(new_ids[topic_id])
+            if new_id < 0:
+                continue # the topic has been removed
+            topic_distances = get_distances(np.array([topic_id]))[0]
+            neighbour_distances = get_distances(extended_ids[neighbours[indptr[new_id]:indptr[new_id + 1]]])
+            closer_neighbour = (neighbour_distances == topic_distances - 1).any(axis=0)
+            changed_sources |= ~(closer_neighbour | (topic_distances == 0) | (topic_distances == UNREACHABLE_DISTANCE))
+
+        sources = np.flatnonzero((previous_ids < 0) | changed_sources[np.maximum(previous_ids, 0)])
+        print("Distances to update: from {} topics out of {}.".format(len(sources), num_topics))
+        if len(sources) > num_topics // 2:
+            self.__create_distance_oracle() # copying the valid distances would not pay off
+            return
+
+        path = self.config.get_cso_distances_path()
+        temporary_path = get_temporary_path(path)
+        try:
+            oracle = np.lib.format.open_memmap(temporary_path, mode="w+", dtype=np.uint8, shape=(num_topics * (num_topics - 1) // 2,))
+            if np.array_equal(previous_ids, np.arange(num_previous_topics)):
+                oracle[:] = previous.distances
+            else:
+                for topic_id, previous_id in enumerate(previous_ids.tolist()):
+                    start = topic_id * num_topics - topic_id * (topic_id + 1) // 2
+                    if previous_id >= 0:
+                        following_ids = np.maximum(previous_ids[topic_id + 1:], 0)
+                        oracle[start:start + num_topics - topic_id - 1] = self.__get_oracle_row(previous.distances, num_previous_topics, previous_id)[following_ids]
+
+            for first_source in range(0, len(sources), 64):
+                block = sources[first_source:first_source + 64]
+                distances = self.__get_bfs_distances(adjacency, block)
+                for position, source in enumerate(block.tolist()):
+                    start = source * num_topics - source * (source + 1) // 2
+                    oracle[start:start + num_topics - source - 1] = distances[source + 1:, position]
+                    preceding = np.arange(source)
+                    oracle[preceding * num_topics - preceding * (preceding + 1) // 2 + source - preceding - 1] = distances[:source, position]
+
+            oracle.flush()
+            del oracle
+            replace_with_fingerprint(temporary_path, path, self.get_fingerprint())
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+        print("Saving the distance oracle of the ontology ({:.1f} MB) in".format(os.path.getsize(path) / 2**20), path)
+
+
+    @staticmethod
+    def __get_oracle_row(distances: np.ndarray, num_topics: int, topic_id: int) -> np.ndarray:
+        """ Function that returns the distances of a topic from all the topics, reading them from a distance oracle.
+
+        Args:
+            distances (np.ndarray): The distance oracle (upper triangle of the distance matrix).
+            num_topics (int): The number of topics of the oracle.
+            topic_id (int): The id of the topic.
+
+        Returns:
+            np.ndarray: the distances of the topic from each topic.
+        """
+        row = np.zeros(num_topics, dtype=np.uint8)
+        preceding = np.arange(topic_id)
+        row[:topic_id] = distances[preceding * num_topics - preceding * (preceding + 1) // 2 + topic_id - preceding - 1]
+        start = topic_id * num_topics - topic_id * (topic_id + 1) // 2
+        row[topic_id + 1:] = distances[start:start + num_topics - topic_id - 1]
+        return row
+
+
+    def __get_undirected_adjacency(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """ Function that returns the undirected adjacency lists of the topics (in CSR format), following the topic ids.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]: the positions of the neighbours of each topic (indptr),
+                the neighbours, whether each topic has neighbours, and the position of the first neighbour of these topics.
+        """
+        topic_ids = {topic: topic_id for topic_id, topic in enumerate(self.topics)}
+        num_topics = len(topic_ids)
+        edges = {(topic_ids[topic], topic_ids[broader]) for topic, broaders in self.broaders.items() for broader in broaders
+                 if topic in topic_ids and broader in topic_ids and topic != broader}
+        edges = np.array(list(edges), dtype=np.int64).reshape(-1, 2)
+        edges = np.unique(np.concatenate((edges, edges[:, ::-1])), axis=0)
+        neighbours = edges[:, 1]
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(edges[:, 0], minlength=num_topics))))
+        has_neighbours = np.diff(indptr) > 0
+        return indptr, neighbours, has_neighbours, indptr[:-1][has_neighbours]
+
+
+    @staticmethod
+    def __get_bfs_distances(adjacency: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray], sources: np.ndarray) -> np.ndarray:
+        """ Function that computes the distances from (up to 64) sources to all topics, with a bit-parallel
+        breadth-first search: bit i of a topic tells whether the topic has been reached from the i-th source.
+
+        Args:
+            adjacency (Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]): The adjacency lists (see __get_undirected_adjacency).
+            sources (np.ndarray): The ids of the sources.
+
+        Returns:
+            np.ndarray: the distances (uint8) with one row per topic and one column per source.
+        """
+        indptr, neighbours, has_neighbours, first_neighbours = adjacency
+        num_topics = len(indptr) - 1
+        distances = np.full((num_topics, len(sources)), UNREACHABLE_DISTANCE, dtype=np.uint8)
+        distances[sources, np.arange(len(sources))] = 0
+
+        frontier = np.zeros(num_topics, dtype="<u8")
+        frontier[sources] = np.left_shift(np.uint64(1), np.arange(len(sources), dtype=np.uint64))
+        visited = frontier.copy()
+        level = 0
+        while level < UNREACHABLE_DISTANCE - 1:
+            level += 1
+            reached = np.zeros(num_topics, dtype="<u8")
+            reached[has_neighbours] = np.bitwise_or.reduceat(frontier[neighbours], first_neighbours)
+            frontier = reached & ~visited
+            reached_topics = np.flatnonzero(frontier)
+            if len(reached_topics) == 0:
+                break
+            visited |= frontier
+            reached_from = np.unpackbits(frontier[reached_topics].view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")[:, :len(sources)]
+            distances[reached_topics] = np.where(reached_from, level, distances[reached_topics])
+
+        return distances
+
+
+    def __download_ontology(self, keep_compiled: bool = False) -> bool:
         """ Function that allows to download the latest version of the ontology.
-            If older versions of the ontology (both csv and pickle) are available they will be deleted.
+            If older versions of the ontology (both csv and compiled) are available they will be deleted.
+
+        Args:
+            keep_compiled (bool, optional): If True, the compiled ontology is not deleted, as it will be updated. Defaults to False.
 
         Returns:
             bool: True if download was successful, False otherwise.
         """
-        try:
-            os.remove(self.config.get_cso_pickle_path())
-        except FileNotFoundError:
-            pass
+        if not keep_compiled:
+            try:
+                os.remove(self.config.get_cso_compiled_path())
+            except FileNotFoundError:
+                pass
 
         try:
             os.remove(self.config.get_cso_path())
@@ -522,27 +1117,124 @@ class Ontology:
         return task_completed
 
 
-    def update(self, force: bool = False) -> None:
+    def update(self, force: bool = False, verify: bool = False) -> None:
         """ This funciton updates the ontology.
+        If the previous version is available, its artifacts are updated with the differences between the two versions,
+        rather than being built again from scratch.
 
         Args:
             force (bool, optional): If false, it checks if a newer version is available.
                 If false, it will delete all files and download the most recent version.
+            verify (bool, optional): If True, it checks that the updated artifacts are equal to the ones built from scratch.
         """
         print_header("ONTOLOGY")
-        if force:
+        if force or self.retrieve_latest_version_available() > self.config.get_ontology_version():
             print("Updating the ontology file")
-            self.__download_ontology()
-            self.__load_cso_from_csv()
+            previous_path = self.config.get_cso_path() + ".previous"
+            incremental = os.path.exists(self.config.get_cso_path()) and os.path.exists(self.config.get_cso_compiled_path())
+            if incremental:
+                os.replace(self.config.get_cso_path(), previous_path)
+
+            if not self.__download_ontology(keep_compiled = incremental):
+                if incremental:
+                    os.replace(previous_path, self.config.get_cso_path())
+                return
+
+            if incremental:
+                self.__update_from_previous_version(previous_path, verify)
+                os.remove(previous_path)
+            else:
+                self.__load_cso_from_csv()
 
         else:
-            last_version = self.retrieve_latest_version_available()
-            if last_version > self.config.get_ontology_version():
-                print("Updating the ontology file")
-                self.__download_ontology()
-                self.__load_cso_from_csv()
+            print("The ontology is already up to date.")
+
+
+    def __update_from_previous_version(self, previous_path: str, verify: bool = False) -> None:
+        """ Function that updates the artifacts of the ontology (compiled ontology, graph and distance oracle)
+        from the ones of the previous version, by applying the differences between the triples of the two versions.
+
+        Args:
+            previous_path (str): The csv file of the previous version.
+            verify (bool, optional): If True, it checks that the updated artifacts are equal to the ones built from scratch.
+        """
+        if read_arrays(self.config.get_cso_compiled_path())[1].get("format") != COMPILED_FORMAT:
+            self.__load_cso_from_csv()
+            return
+
+        print("Extracting the differences with the previous version of the ontology.")
+        timings = dict()
+        start = time.perf_counter()
+        previous = Ontology(silent = True) # the artifacts on disk still belong to the previous version
+        triples = self.__read_triples(self.config.get_cso_path())
+        previous_triples = set(self.__read_triples(previous_path))
+        added = set(triples) - previous_triples
+        removed = previous_triples - set(triples)
+        print("Triples added: {}, removed: {}.".format(len(added), len(removed)))
+        self.__load_triples(triples)
+        timings["parsing"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        changed_topics = {triple[2] for triple in added | removed if triple[1] == 'klink:broaderGeneric'}
+        self.__generate_topic_stems()
+        self.__get_all_branches(previous, changed_topics)
+        timings["ancestor closure"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.__write_compiled_ontology()
+        timings["compiled ontology"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.__create_graph_from_cso()
+        timings["graph"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.__update_distance_oracle(previous)
+        timings["distance oracle"] = time.perf_counter() - start
+
+        print("Ontology artifacts updated in {:.2f}s ({}).".format(sum(timings.values()), ", ".join("{}: {:.2f}s".format(step, timing) for step, timing in timings.items())))
+
+        if verify:
+            self.__verify_artifacts()
+
+
+    def __verify_artifacts(self) -> bool:
+        """ Function that checks that the artifacts on disk (compiled ontology and distance oracle) are equal to the ones
+        built from scratch from the csv file of the ontology.
+
+        Returns:
+            bool: True if they are equal, False otherwise.
+        """
+        print("Verifying the artifacts of the ontology against a full rebuild.")
+        reference = Ontology(load_ontology = False, silent = True)
+        reference.__load_triples(reference.__read_triples(self.config.get_cso_path()))
+        reference.__generate_topic_stems()
+        reference.__get_all_branches()
+        reference_path = self.config.get_cso_distances_path() + ".reference.npy"
+        reference.__create_distance_oracle(reference_path)
+
+        updated = Ontology(silent = True)
+        mismatches = list()
+        for attr in self.ontology_attr:
+            expected, found = getattr(reference, attr), getattr(updated, attr)
+            if attr == 'all_broaders':
+                equal = list(expected) == list(found) and all(set(expected[topic]) == set(found[topic]) for topic in expected)
             else:
-                print("The ontology is already up to date.")
+                equal = list(expected.items()) == list(found.items())
+            if not equal:
+                mismatches.append(attr)
+
+        updated.read_distance_oracle()
+        if not np.array_equal(np.load(reference_path, mmap_mode="r"), updated.distances):
+            mismatches.append('distances')
+        os.remove(reference_path)
+        os.remove(reference_path + FINGERPRINT_SUFFIX)
+
+        if len(mismatches) > 0:
+            print("The updated artifacts differ from a full rebuild: {}.".format(", ".join(mismatches)))
+        else:
+            print("The updated artifacts are equal to a full rebuild.")
+        return len(mismatches) == 0
 
 
     def setup(self) -> None:
@@ -550,7 +1242,7 @@ class Ontology:
         """
         print_header("ONTOLOGY")
 
-        if not os.path.exists(self.config.get_cso_pickle_path()):
+        if not os.path.exists(self.config.get_cso_compiled_path()):
 
             if not os.path.exists(self.config.get_cso_path()):
 
@@ -563,7 +1255,7 @@ class Ontology:
 
             self.__load_cso_from_csv()
 
-            if os.path.exists(self.config.get_cso_pickle_path()):
+            if os.path.exists(self.config.get_cso_compiled_path()):
                 print("Ontology file created successfully.")
 
         else:
@@ -4,7 +4,8 @@ from nltk.tokenize import RegexpTokenizer
 from nltk.corpus import stopwords
 import re
 import itertools
-from typing import Dict, List, Optional, Tuple, Union, Iterator
+from typing import Dict, Iterable, List, Optional, Tuple, Union, Iterator
+from spacy.language import Language
 from spacy.tokens import Doc
 
 
@@ -13,12 +14,14 @@ GRAMMAR = "DBW_CONCEPT: {<JJ.*>*<HYPH>*<JJ.*>*<HYPH>*<NN.*>*<HYPH>*<NN.*>+}" #go
 class Paper:
     """ A simple abstraction layer for working on the paper object"""
 
-    def __init__(self, paper: Optional[Union[Dict[str, str], str]] = None, modules: Optional[str] = None):
+    def __init__(self, paper: Optional[Union[Dict[str, str], str]] = None, modules: Optional[str] = None, tagger: Optional[Language] = None):
         """ Initialising the Paper class.
 
         Args:
             paper (Optional[Union[Dict[str, str], str]], optional): The paper data. Defaults to None.
             modules (Optional[str], optional): The modules to run ("syntactic", "semantic", "both"). Defaults to None.
+            tagger (Optional[Language], optional): The spaCy pipeline to use, e.g., shared by several papers.
+                Defaults to None, loading a new one (see load_tagger).
         """
         self.title = None
         self.abstract = None
@@ -26,7 +29,7 @@ class Paper:
         self._text = None
         self.chunks = None
         self.text_attr = ('title', 'abstract', 'keywords')
-        self.tagger = spacy.load('en_core_web_sm', disable=['ner'])
+        self.tagger = tagger if tagger is not None else self.load_tagger()
 
         if modules is not None:
             self.modules = modules
@@ -36,13 +39,61 @@ class Paper:
 
 
 
-    def set_paper(self, paper: Union[Dict[str, str], str]) -> None:
+    @staticmethod
+    def load_tagger() -> Language:
+        """Function that loads the spaCy pipeline used to process the text of the papers.
+
+        Returns:
+            Language: the pipeline.
+        """
+        return spacy.load('en_core_web_sm', disable=['ner'])
+
+
+    def set_paper(self, paper: Union[Dict[str, str], str], doc: Optional[Doc] = None) -> None:
         """Function that initializes the paper variable in the class.
 
         Args:
             paper (Union[Dict[str, str], str]): The paper to analyse. It can be
                 a full string in which the content is already merged or a dictionary 
                 {"title": "","abstract": "","keywords": ""}.
+            doc (Optional[Doc], optional): The text of the paper already processed by the tagger (see iterate_papers).
+                Defaults to None, processing it here.
+        """
+        if self.__set_text(paper):
+            try:
+                self.__pre_process(doc)
+            except TypeError:
+                pass
+
+
+    def iterate_papers(self, papers: Iterable[Union[Dict[str, str], str]], batch_size: int = 64) -> Iterator["Paper"]:
+        """Function that sets, one after the other, each of the given papers (as set_paper does). Their texts are
+        processed by the tagger in batches (spaCy pipe), which is faster than processing them one at a time.
+
+        Args:
+            papers (Iterable[Union[Dict[str, str], str]]): The papers to analyse.
+            batch_size (int, optional): Number of texts processed together by the tagger. Defaults to 64.
+
+        Yields:
+            Iterator[Paper]: the paper object itself, after setting each of the papers.
+        """
+        papers = list(papers)
+        texts = list()
+        for paper in papers:
+            texts.append(self._text if self.__set_text(paper) else "")
+        for paper, doc in zip(papers, self.tagger.pipe(texts, batch_size=batch_size)):
+            self.set_paper(paper, doc)
+            yield self
+
+
+    def __set_text(self, paper: Union[Dict[str, str], str]) -> bool:
+        """Function that resets the paper and sets its text.
+
+        Args:
+            paper (Union[Dict[str, str], str]): The paper to analyse.
+
+        Returns:
+            bool: True if the paper has a recognised format, False otherwise.
         """
         self.title = None
         self.abstract = None
@@ -68,10 +119,9 @@ class Paper:
             else:
                 raise TypeError("Error: Unrecognised paper format")
 
-            self.__pre_process()
-
         except TypeError:
-            pass
+            return False
+        return True
 
 
     def get_text(self) -> Optional[str]:
@@ -200,11 +250,15 @@ class Paper:
         return [" ".join(row).lower() for row in matrix_of_tokens]
 
 
-    def __pre_process(self) -> None:
+    def __pre_process(self, doc: Optional[Doc] = None) -> None:
         """ Pre-processes the paper: identifies the parts of speech and then extracts chunks using a grammar
+
+        Args:
+            doc (Optional[Doc], optional): The text already processed by the tagger. Defaults to None.
         """
         ##################### Tagger with spaCy.io
-        doc = self.tagger(self._text)
+        if doc is None:
+            doc = self.tagger(self._text)
 
         # =============================================================================
         #         SYNTACTIC
@@ -3,15 +3,18 @@ import re
 from typing import Any, Dict, List, Optional, Set, Union
 
 import numpy as np
-from scipy.spatial import distance
-from strsimpy.metric_lcs import MetricLCS
 
+from .misc import get_similar_strings
 from .model import Model
 from .ontology import Ontology
 from .result import Result
 
 class PostProcess:
-    """ A simple abstraction layer for using the Post-Processing module of the CSO classifier """
+    """ A simple abstraction layer for using the Post-Processing module of the CSO classifier.
+
+    process_result does not change the state of the object, so a single object can be used by several threads at once.
+    The other functions keep the result being processed in the object, as in the previous versions.
+    """
 
     def __init__(self, model: Optional[Model] = None, cso: Optional[Ontology] = None, **parameters: Any):
         """Function that initialises an object of class PostProcess and all its members.
@@ -46,9 +49,9 @@ class PostProcess:
             self.result = None
             
         if self.filter_output and self.cso:
-            self.descendants_to_keep = self.cso.get_all_descendants_of_topics(self.filter_by)
+            self.branches_to_keep = self.cso.get_branch_ids(self.filter_by)
         else:
-            self.descendants_to_keep = set()
+            self.branches_to_keep = np.array([], dtype=np.int64)
 
     def set_result(self, result: Result) -> None:
         """Function that initializes the result variable in the class.
@@ -70,25 +73,16 @@ class PostProcess:
         return self.result
 
 
-    def __create_matrix_distance_from_ontology(self) -> np.ndarray:
+    def __create_matrix_distance_from_ontology(self, list_of_topics: List[str]) -> np.ndarray:
         """Function that computes the matrix distance according to the ontology.
 
+        Args:
+            list_of_topics (List[str]): The topics to compare.
+
         Returns:
             np.ndarray: A matrix representing distances between topics based on ontology graph.
         """
-        len_mat = len(self.list_of_topics)
-        matrix = np.zeros((len_mat, len_mat), int)
-
-        for i in range(0, len_mat):
-            for j in range(i, len_mat):
-                try:
-                    this_dist = self.cso.get_graph_distance_in_topics(self.list_of_topics[i], self.list_of_topics[j])
-                    matrix[i][j] = this_dist
-                    matrix[j][i] = this_dist
-                except IndexError:
-                    pass
-                except TypeError:
-                    print(self.list_of_topics[i], self.list_of_topics[j],this_dist)
+        matrix = self.cso.get_graph_distances_in_topics(list_of_topics)
         try:
             norm_matrix = matrix/matrix.max()
         except ValueError:
@@ -99,71 +93,24 @@ class PostProcess:
         return new_matrix
 
 
-    def __create_matrix_distance_from_embeddings(self) -> np.ndarray:
-        """Function that computes the matrix distance according to the model.
+    def __create_matrix_distance_from_embeddings(self, list_of_topics: List[str]) -> np.ndarray:
+        """Function that computes the matrix distance according to the model (precomputed topic embeddings).
+
+        Args:
+            list_of_topics (List[str]): The topics to compare.
 
         Returns:
             np.ndarray: A matrix representing distances between topics based on word embeddings.
         """
-        len_mat = len(self.list_of_topics)
-        matrix = np.zeros((len_mat, len_mat), float)
+        topic_embeddings = self.model.get_topic_embeddings(self.cso.get_topic_ids(list_of_topics))
+
+        # rows are normalised, so their dot product is the cosine similarity
+        matrix = topic_embeddings @ topic_embeddings.T
         np.fill_diagonal(matrix, 1)
 
-        _list_of_topics = [i.replace(" ","_") for i in self.list_of_topics] #replacing space with underscore in topic labels
-
-        embedding_size = self.model.get_embedding_size()
-
-        for i in range(0, len_mat):
-            for j in range(i+1, len_mat):
-                try:
-
-                    if self.model.check_word_in_full_model(_list_of_topics[i]):
-                        terms_fst_tp = [_list_of_topics[i]]
-                    else:
-                        terms_fst_tp = _list_of_topics[i].split("_")
-
-                    if self.model.check_word_in_full_model(_list_of_topics[j]):
-                        terms_snd_tp = [_list_of_topics[j]]
-                    else:
-                        terms_snd_tp = _list_of_topics[j].split("_")
-
-                    embeddings_fst_tp = np.zeros(embedding_size)
-                    embeddings_snd_tp = np.zeros(embedding_size)
-                    for token in terms_fst_tp:
-                        try:
-                            embeddings_fst_tp += self.model.get_embedding_from_full_model(token)
-                        except KeyError:
-                            pass
-
-                    for token in terms_snd_tp:
-                        try:
-                            embeddings_snd_tp += self.model.get_embedding_from_full_model(token)
-                        except KeyError:
-                            pass
-
-                    this_dist = self.__cosine_similarity(embeddings_fst_tp, embeddings_snd_tp)
-                    matrix[i][j] = this_dist
-                    matrix[j][i] = this_dist
-                except IndexError:
-                    pass
-                except ValueError:
-                    pass
         return matrix
 
 
-    def __cosine_similarity(self, data_set_i: np.ndarray, data_set_ii: np.ndarray) -> float:
-        """ Function that computes the cosine similarity as opposite of the cosine distance
-
-        Args:
-            data_set_i (np.ndarray): First vector.
-            data_set_ii (np.ndarray): Second vector.
-
-        Returns:
-            float: Cosine similarity.
-        """
-        return 1 - distance.cosine(data_set_i, data_set_ii) #becuase this computes the distance and not the similarity
-
-
     def __get_good_threshold(self, matrix: np.ndarray, multiplicative: float = 1.0) -> float:
         """Function that identifies a good threshold for selecting the top edges in the network.
 
@@ -188,14 +135,17 @@ class PostProcess:
         return threshold
 
 
-    def __get_joined_matrix(self) -> np.ndarray:
+    def __get_joined_matrix(self, list_of_topics: List[str]) -> np.ndarray:
         """ Function that extracts the joined matrix (model + ontology)
 
+        Args:
+            list_of_topics (List[str]): The topics to compare.
+
         Returns:
             np.ndarray: The combined matrix (maximum of embedding and ontology matrices).
         """
-        embed_matrix = self.__create_matrix_distance_from_embeddings()
-        ontol_matrix = self.__create_matrix_distance_from_ontology()
+        embed_matrix = self.__create_matrix_distance_from_embeddings(list_of_topics)
+        ontol_matrix = self.__create_matrix_distance_from_ontology(list_of_topics)
 
         return np.maximum(embed_matrix, ontol_matrix)
 
@@ -236,15 +186,9 @@ class PostProcess:
         Returns:
             Set[str]: Topics to rescue (promote) back into selection.
         """
-        topics_to_spare = set()
-        # At this stage we check if among the excluded topics there are some which have string similarity higher than the threshold.
-        metric_lcs = MetricLCS()
-        for topic in excluded_topics:
-            for good_topic in selected_topics:
-                t_distance = metric_lcs.distance(topic, good_topic)
-                if t_distance < 0.5:
-                    topics_to_spare.add(topic)
-                    break
+        # At this stage we check if among the excluded topics there are some which have string similarity higher than the threshold
+        # (metric LCS distance lower than 0.5).
+        topics_to_spare = get_similar_strings(selected_topics, excluded_topics, 0.5)
 
         return topics_to_spare
 
@@ -259,25 +203,38 @@ class PostProcess:
         Returns:
             Result: The updated result object with outliers removed.
         """
-        if self.delete_outliers and len(self.list_of_topics) > 1:
+        return self.__filter_outliers(self.result, self.list_of_topics)
+
+
+    def __filter_outliers(self, result: Result, list_of_topics: List[str]) -> Result:
+        """Function that removes the outliers from a result (see filtering_outliers).
+
+        Args:
+            result (Result): The result to update.
+            list_of_topics (List[str]): The topics found in the paper (union of syntactic and semantic).
+
+        Returns:
+            Result: The updated result object with outliers removed.
+        """
+        if self.delete_outliers and len(list_of_topics) > 1:
 
-            syntactic = self.result.get_syntactic()
+            syntactic = result.get_syntactic()
             syntactic_to_keep = [topic for topic in syntactic if len(re.findall(r'\w+', topic)) > 1]
 
 
 
-            joined_matrix = self.__get_joined_matrix()
+            joined_matrix = self.__get_joined_matrix(list_of_topics)
             threshold = self.__get_good_threshold(joined_matrix, self.network_threshold)
 
             #The following checks if a topic is connected with other topics with similarity higher than the threshold
             selected_topics = list()
-            for i in range(len(self.list_of_topics)):
+            for i in range(len(list_of_topics)):
                 t_len = len(np.where(joined_matrix[i] >= threshold)[0]) # Taking [0] as np.where returns a tuple (list,list) with positions. We don't need [1]
                 if t_len > 1:
-                    selected_topics.append(self.list_of_topics[i]) # the topic is then appended to the selected topics
+                    selected_topics.append(list_of_topics[i]) # the topic is then appended to the selected topics
 
             # We identify the excluded topics then.
-            excluded_topics = set(self.list_of_topics).difference(set(selected_topics))
+            excluded_topics = set(list_of_topics).difference(set(selected_topics))
 
             # Now among the excluded, which one we can still promote?
             topics_to_spare = set()
@@ -289,30 +246,42 @@ class PostProcess:
             selected_topics_set = set(selected_topics+syntactic_to_keep).union(topics_to_spare)
             selected_topics = list(selected_topics_set)
 
-            self.result.set_syntactic(list(set(self.result.get_syntactic()).intersection(selected_topics_set)))
-            self.result.set_semantic(list(set(self.result.get_semantic()).intersection(selected_topics_set)))
-            self.result.set_union(selected_topics)
-            self.result.set_enhanced(self.cso.climb_ontology(selected_topics, self.enhancement))
+            result.set_syntactic(list(set(result.get_syntactic()).intersection(selected_topics_set)))
+            result.set_semantic(list(set(result.get_semantic()).intersection(selected_topics_set)))
+            result.set_union(selected_topics)
+            result.set_enhanced(self.cso.climb_ontology(selected_topics, self.enhancement))
             if self.get_weights:
-                self.result.set_syntactic_topics_weights({topic:val for topic, val in self.result.get_syntactic_topics_weights().items() if topic in selected_topics_set})
-                self.result.set_semantic_topics_weights({topic:val for topic, val in self.result.get_semantic_topics_weights().items() if topic in selected_topics_set})
+                result.set_syntactic_topics_weights({topic:val for topic, val in result.get_syntactic_topics_weights().items() if topic in selected_topics_set})
+                result.set_semantic_topics_weights({topic:val for topic, val in result.get_semantic_topics_weights().items() if topic in selected_topics_set})
 
 
         else:
-            self.result.set_enhanced(self.cso.climb_ontology(self.result.get_union(), self.enhancement))
+            result.set_enhanced(self.cso.climb_ontology(result.get_union(), self.enhancement))
 
 
-        return self.result
+        return result
     
     def filtering_by_user_defined_topics(self) -> None:
         """ Identifies the topics that are descendants of user defined ancestors. 
         Saves this into a new key of the result.
         """
+        self.__filter_by_user_defined_topics(self.result)
+
+
+    def __filter_by_user_defined_topics(self, result: Result) -> None:
+        """ Saves into the result the topics that are descendants of user defined ancestors (see filtering_by_user_defined_topics).
+
+        Args:
+            result (Result): The result to update.
+        """
         
-        self.result.set_filtered_syntactic(list(filter(lambda topic: topic in self.descendants_to_keep, self.result.get_syntactic())))
-        self.result.set_filtered_semantic(list(filter(lambda topic: topic in self.descendants_to_keep, self.result.get_semantic())))
-        self.result.set_filtered_union(list(filter(lambda topic: topic in self.descendants_to_keep, self.result.get_union())))
-        self.result.set_filtered_enhanced(list(filter(lambda topic: topic in self.descendants_to_keep, self.result.get_enhanced())))
+        topics = list(set(result.get_syntactic()) | set(result.get_semantic()) | set(result.get_union()) | set(result.get_enhanced()))
+        topics_to_keep = {topic for topic, to_keep in zip(topics, self.cso.are_descendants_of_branches(topics, self.branches_to_keep)) if to_keep}
+
+        result.set_filtered_syntactic(list(filter(lambda topic: topic in topics_to_keep, result.get_syntactic())))
+        result.set_filtered_semantic(list(filter(lambda topic: topic in topics_to_keep, result.get_semantic())))
+        result.set_filtered_union(list(filter(lambda topic: topic in topics_to_keep, result.get_union())))
+        result.set_filtered_enhanced(list(filter(lambda topic: topic in topics_to_keep, result.get_enhanced())))
         
     
     
@@ -326,4 +295,21 @@ class PostProcess:
         if self.filter_output:
             self.filtering_by_user_defined_topics()
         
-        return self.result
\ No newline at end of file
+        return self.result
+
+
+    def process_result(self, result: Result) -> Result:
+        """ Runs the postprocessing module on the given result, as process, but without changing the state of the
+        object: only the result is updated (and returned).
+
+        Args:
+            result (Result): The result of the syntactic and semantic modules for a paper.
+
+        Returns:
+            Result: The processed result object.
+        """
+        result = self.__filter_outliers(result, result.get_union())
+        if self.filter_output:
+            self.__filter_by_user_defined_topics(result)
+        
+        return result
\ No newline at end of file
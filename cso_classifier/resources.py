@@ -0,0 +1,203 @@
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from .ontology import Ontology
+from .model import Model
+
+
+class Resources:
+    """ A snapshot of the resources (ontology and model) used by the classifier """
+
+    def __init__(self, cso: Ontology, model: Model, version: int) -> None:
+        """ Initialising the snapshot
+
+        Args:
+            cso (Ontology): The ontology.
+            model (Model): The model.
+            version (int): The version of the snapshot, increasing at each reload.
+        """
+        self.cso = cso
+        self.model = model
+        self.version = version
+        self.in_flight = 0      # number of requests using the snapshot
+        self.retired = False    # True once a newer snapshot has replaced this one
+        self.lock = threading.Lock()
+
+
+    def acquire(self) -> None:
+        """ Function that registers a request using the snapshot.
+        """
+        with self.lock:
+            self.in_flight += 1
+
+
+    def release(self) -> None:
+        """ Function that unregisters a request using the snapshot. The resources of a retired snapshot
+        are released with its last request.
+        """
+        with self.lock:
+            self.in_flight -= 1
+            free = self.retired and self.in_flight == 0
+        if free:
+            self.free()
+
+
+    def retire(self) -> None:
+        """ Function that marks the snapshot as replaced by a newer one. Its resources are released
+        straight away if no request is using it, otherwise once the last one has finished.
+        """
+        with self.lock:
+            self.retired = True
+            free = self.in_flight == 0
+        if free:
+            self.free()
+
+
+    def is_complete(self) -> bool:
+        """ Function that checks whether the snapshot has both the ontology and the model (a snapshot set by the
+        caller may have only one of them, see ResourceHandle.set).
+
+        Returns:
+            bool: True if both are available.
+        """
+        return self.cso is not None and self.model is not None
+
+
+    def free(self) -> None:
+        """ Function that drops the references to the ontology and the model (and to their memory-mapped files).
+        """
+        self.cso = None
+        self.model = None
+
+
+class ResourceHandle:
+    """ A versioned handle to the resources of the classifier. A new snapshot can be loaded in the background
+    and then replaces the current one atomically: requests started before the switch finish on the old snapshot.
+    """
+
+    def __init__(self, loader: Callable[[], Tuple[Ontology, Model]], silent: bool = False) -> None:
+        """ Initialising the handle
+
+        Args:
+            loader (Callable[[], Tuple[Ontology, Model]]): Function loading the ontology and the model.
+            silent (bool, optional): If True, suppresses print statements. Defaults to False.
+        """
+        self.loader = loader
+        self.silent = silent
+        self.current: Optional[Resources] = None
+        self.versions = 0
+        self.lock = threading.Lock()
+
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """ The snapshot and the lock are not shared with other processes, which load their own resources """
+        return {"loader": self.loader, "silent": self.silent}
+
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["loader"], state["silent"])
+
+
+    def get(self) -> Resources:
+        """ Function that returns the current snapshot, loading it the first time. If the ontology or the model
+        has been set (see set) without the other, the missing one is loaded.
+
+        Returns:
+            Resources: the current snapshot.
+        """
+        current = self.current
+        if current is None or not current.is_complete():
+            with self.lock:
+                if self.current is None or not self.current.is_complete():
+                    cso, model = self.loader()
+                    if self.current is not None:
+                        cso = self.current.cso if self.current.cso is not None else cso
+                        model = self.current.model if self.current.model is not None else model
+                    self.__replace(cso, model)
+            current = self.current
+        return current
+
+
+    @contextmanager
+    def acquire(self) -> Iterator[Resources]:
+        """ Context manager that provides the current snapshot for the duration of a request.
+
+        Yields:
+            Iterator[Resources]: the snapshot.
+        """
+        while True:
+            resources = self.get()
+            resources.acquire()
+            if not resources.retired:
+                break
+            resources.release() # replaced in the meantime: taking the new one
+        try:
+            yield resources
+        finally:
+            resources.release()
+
+
+    def reload(self, wait: bool = False) -> threading.Thread:
+        """ Function that loads a new snapshot of the resources in a background thread, and then makes it
+        the current one. Requests started in the meantime keep using the previous snapshot.
+
+        Args:
+            wait (bool, optional): If True, it waits until the new snapshot is in use. Defaults to False.
+
+        Returns:
+            threading.Thread: the thread loading the new snapshot.
+        """
+        thread = threading.Thread(target=self.__swap, name="cso-classifier-reload", daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return thread
+
+
+    def set(self, cso: Optional[Ontology] = None, model: Optional[Model] = None) -> None:
+        """ Function that replaces the ontology, the model, or both, of the current snapshot with the given ones, in
+        a new snapshot. As with reload, requests already running keep using the previous snapshot.
+
+        Args:
+            cso (Optional[Ontology], optional): The new ontology. Defaults to None, i.e., the current one.
+            model (Optional[Model], optional): The new model. Defaults to None, i.e., the current one.
+        """
+        with self.lock:
+            if self.current is not None:
+                cso = cso if cso is not None else self.current.cso
+                model = model if model is not None else self.current.model
+            self.__replace(cso, model)
+
+
+    def unload(self) -> None:
+        """ Function that drops the current snapshot: the resources are loaded again when next needed.
+        """
+        with self.lock:
+            previous, self.current = self.current, None
+        if previous is not None:
+            previous.retire()
+
+
+    def __replace(self, cso: Optional[Ontology], model: Optional[Model]) -> None:
+        """ Function that makes a new snapshot with the given resources the current one, and retires the previous one.
+        It must be called holding the lock.
+
+        Args:
+            cso (Optional[Ontology]): The ontology.
+            model (Optional[Model]): The model.
+        """
+        self.versions += 1
+        previous, self.current = self.current, Resources(cso, model, self.versions)
+        if previous is not None:
+            previous.retire()
+
+
+    def __swap(self) -> None:
+        """ Function that loads a new snapshot and replaces the current one with it.
+        """
+        cso, model = self.loader()
+        with self.lock:
+            self.__replace(cso, model)
+        if not self.silent:
+            print("Resources of the classifier reloaded (version {}).".format(self.versions))
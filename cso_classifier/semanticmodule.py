@@ -1,4 +1,5 @@
 import warnings
+from collections import Counter
 from typing import Any, Dict, List, Optional, Set, Tuple, Union
 from kneed import KneeLocator
 from rapidfuzz.distance import Levenshtein
@@ -9,7 +10,11 @@ from .ontology import Ontology
 from .paper import Paper
 
 class Semantic:
-    """ A simple abstraction layer for using the Semantic module of the CSO classifier """
+    """ A simple abstraction layer for using the Semantic module of the CSO classifier.
+
+    classify_chunks does not change the state of the object, so a single object can be used by several threads at once.
+    The other functions keep the paper being analysed and its outcome in the object, as in the previous versions.
+    """
 
     def __init__(self, model: Optional[Model] = None, cso: Optional[Ontology] = None, fast_classification: bool = True, paper: Optional[Paper] = None):
         """Function that initialises an object of class CSOClassifierSemantic and all its members.
@@ -74,15 +79,32 @@ class Semantic:
             List[str]: list of identified topics.
         """
 
+        output = self.classify_chunks(self.paper.get_semantic_chunks())
+        self.extracted_topics = output["weights"]
+        self.explanation = output["explanation"]
+
+        return output["topics"]
+
+
+    def classify_chunks(self, concepts: List[str]) -> Dict[str, Any]:
+        """Function that classifies the semantic chunks of a paper, as classify_semantic, but without changing the
+        state of the object: the outcome is returned rather than kept.
+
+        Args:
+            concepts (List[str]): The semantic chunks of the paper (see Paper.get_semantic_chunks).
+
+        Returns:
+            Dict[str, Any]: the list of topics ('topics'), their weights ('weights') and the explanation ('explanation').
+        """
+
         ##################### Core analysis
-        found_topics, explanation = self.__find_topics(self.paper.get_semantic_chunks())
+        found_topics, explanation = self.__find_topics(concepts)
 
         ##################### Ranking
-        self.extracted_topics = self.__rank_topics(found_topics, explanation)
+        final_topics, final_explanation = self.__rank_topics(found_topics, explanation)
 
-        final_topics = list(self.extracted_topics.keys())
+        return {"topics": list(final_topics.keys()), "weights": final_topics, "explanation": final_explanation}
 
-        return final_topics
 
     def get_semantic_topics_weights(self) -> Dict[str, float]:
         """Function that returns the full set of topics with the similarity measure
@@ -94,7 +116,9 @@ class Semantic:
 
 
     def __find_topics(self, concepts: List[str]) -> Tuple[Dict[str, Any], Dict[str, Set[str]]]:
-        """Function that identifies topics starting from the ngram forund in the paper
+        """Function that identifies topics starting from the ngram forund in the paper.
+        Each unique gram is resolved only once and its number of occurrences is then
+        accounted for in the statistics of the matched topics.
 
         Args:
             concepts (List[str]): Chunks of text to analyse.
@@ -107,71 +131,74 @@ class Semantic:
         found_topics = dict() # to store the matched topics
         explanation = dict()
 
-        # finding matches
+        # counting the unique grams (with their multiplicities), in order of first appearance
+        unique_grams = Counter()
         for concept in concepts:
-            evgrams = everygrams(concept.split(), 1, 3) # list of unigrams, bigrams, trigrams
-            for grams in evgrams:
-                gram = "_".join(grams)
-                gram_without_underscore = " ".join(grams)
-                #### Finding similar words contained in the model
-
-                list_of_matched_topics = []
+            unique_grams.update(everygrams(concept.split(), 1, 3)) # list of unigrams, bigrams, trigrams
 
-                if self.fast_classification:
-                    list_of_matched_topics = self.__get_similar_words_from_cached_model(gram, grams)
-                else:
-                    list_of_matched_topics = self.__get_similar_words_from_full_model(gram, grams)
+        # finding matches
+        for grams, occurrences in unique_grams.items():
+            gram = "_".join(grams)
+            gram_without_underscore = " ".join(grams)
+            #### Finding similar words contained in the model
 
+            list_of_matched_topics = []
 
-                for topic_item in list_of_matched_topics:
+            if self.fast_classification:
+                list_of_matched_topics = self.__get_similar_words_from_cached_model(gram, grams)
+            else:
+                list_of_matched_topics = self.__get_similar_words_from_full_model(gram, grams)
 
-                    topic   = topic_item["topic"]
-                    str_sim = topic_item["sim_t"]
-                    wet     = topic_item["wet"]
-                    sim     = topic_item["sim_w"]
 
+            for topic_item in list_of_matched_topics:
 
-                    if str_sim >= self.min_similarity and topic in self.cso.topics_wu:
+                topic   = topic_item["topic"]
+                str_sim = topic_item["sim_t"]
+                wet     = topic_item["wet"]
+                sim     = topic_item["sim_w"]
 
 
-                        if topic in found_topics:
-                            #tracking this match
-                            found_topics[topic]["times"] += 1
+                if str_sim >= self.min_similarity and topic in self.cso.topics_wu:
 
-                            found_topics[topic]["gram_similarity"].append(sim)
 
-                            #tracking the matched gram
-                            if gram in found_topics[topic]["grams"]:
-                                found_topics[topic]["grams"][gram] += 1
-                            else:
-                                found_topics[topic]["grams"][gram] = 1
+                    if topic in found_topics:
+                        #tracking this match (once per occurrence of the gram)
+                        found_topics[topic]["times"] += occurrences
 
-                            #tracking the most similar gram to the topic
-                            if str_sim > found_topics[topic]["embedding_similarity"]:
-                                found_topics[topic]["embedding_similarity"] = str_sim
-                                found_topics[topic]["embedding_matched"] = wet
+                        found_topics[topic]["gram_similarity"].extend([sim] * occurrences)
 
+                        #tracking the matched gram
+                        if gram in found_topics[topic]["grams"]:
+                            found_topics[topic]["grams"][gram] += occurrences
                         else:
-                            #creating new topic in the result set
-                            found_topics[topic] = {'grams': {gram:1},
-                                                    'embedding_matched': wet,
-                                                    'embedding_similarity': str_sim,
-                                                    'gram_similarity':[sim],
-                                                    'times': 1,
-                                                    'topic':topic}
+                            found_topics[topic]["grams"][gram] = occurrences
+
+                        #tracking the most similar gram to the topic
+                        if str_sim > found_topics[topic]["embedding_similarity"]:
+                            found_topics[topic]["embedding_similarity"] = str_sim
+                            found_topics[topic]["embedding_matched"] = wet
+
+                    else:
+                        #creating new topic in the result set
+                        found_topics[topic] = {'grams': {gram:occurrences},
+                                                'embedding_matched': wet,
+                                                'embedding_similarity': str_sim,
+                                                'gram_similarity':[sim] * occurrences,
+                                                'times': occurrences,
+                                                'topic':topic}
 
 
 
-                        if sim == 1:
-                            found_topics[topic]["syntactic"] = True
+                    if sim == 1:
+                        found_topics[topic]["syntactic"] = True
 
 
 
-                        primary_label_topic = self.cso.get_primary_label_wu(topic)
-                        if primary_label_topic not in explanation:
-                            explanation[primary_label_topic] = set()
+                    primary_label_topic = self.cso.get_primary_label_wu(topic)
+                    if primary_label_topic not in explanation:
+                        explanation[primary_label_topic] = set()
 
-                        explanation[primary_label_topic].add(gram_without_underscore)
+                    explanation[primary_label_topic].add(gram_without_underscore)
 
         return found_topics, explanation
 
@@ -193,7 +220,9 @@ class Semantic:
 
 
     def __match_ngram(self, grams: List[str], merge: bool = True) -> List[Dict[str, Any]]:
-        """
+        """ Getting the topics shared by all the tokens of a 2-gram or 3-gram which is not in the cached model.
+        The merge is computed (and cached) by the model.
+
         Args:
             grams (List[str]): list of tokens to be analysed and found in the model
             merge (bool): Allows to combine the topics of multiple tokens, when analysing 2-grams or 3-grams. Defaults to True.
@@ -204,24 +233,7 @@ class Semantic:
 
         list_of_matched_topics = list()
         if len(grams) > 1 and merge:
-
-            temp_list_of_matches = {}
-
-            list_of_merged_topics = {}
-
-            for gram in grams:
-                if self.model.check_word_in_model(gram):
-                    list_of_matched_topics_t = self.model.get_words_from_model(gram)
-                    for topic_item in list_of_matched_topics_t:
-                        temp_list_of_matches[topic_item["topic"]] = topic_item
-                        try:
-                            list_of_merged_topics[topic_item["topic"]] += 1
-                        except KeyError:
-                            list_of_merged_topics[topic_item["topic"]] = 1
-
-            for topic_x, value in list_of_merged_topics.items():
-                if value >= len(grams):
-                    list_of_matched_topics.append(temp_list_of_matches[topic_x])
+            list_of_matched_topics = self.model.get_merged_words_from_model(grams)
 
         return list_of_matched_topics
 
@@ -267,7 +279,7 @@ class Semantic:
         return identified_topics
 
 
-    def __rank_topics(self, found_topics: Dict[str, Any], explanation: Dict[str, Set[str]]) -> Dict[str, float]:
+    def __rank_topics(self, found_topics: Dict[str, Any], explanation: Dict[str, Set[str]]) -> Tuple[Dict[str, float], Dict[str, Set[str]]]:
         """ Function that ranks the list of found topics. It also cleans the explanation accordingly
 
         Args:
@@ -275,7 +287,7 @@ class Semantic:
             explanation (Dict[str, Set[str]]): contains information about the explanation of topics
 
         Returns:
-            Dict[str, float]: dictionary of final topics with their scores
+            Tuple[Dict[str, float], Dict[str, Set[str]]]: dictionary of final topics with their scores, and their explanation
         """
         max_value = 0
         scores = []
@@ -376,15 +388,15 @@ class Semantic:
 
         # selecting final topics
         final_topics = {}
-        self.reset_explanation()
+        final_explanation = {}
         
         for this_topic, this_score in sort_t:
             if this_score > kneey:
                 final_topics[self.cso.get_topic_wu(this_topic)] = this_score / max_value
-                self.explanation[self.cso.topics_wu[this_topic]] = explanation[this_topic]
+                final_explanation[self.cso.topics_wu[this_topic]] = explanation[this_topic]
             else:
                 break
 
         
 
-        return final_topics
\ No newline at end of file
+        return final_topics, final_explanation
\ No newline at end of file
@@ -0,0 +1,389 @@
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import click
+import numpy as np
+
+from .classifier import CSOClassifier, _get_results, _run_worker
+
+
+# =============================================================================
+#     MICRO-BATCHING
+# =============================================================================
+
+
+LANES = ("interactive", "bulk")     # priority classes of the requests, from the highest priority
+
+
+class MicroBatcher:
+    """ Groups the papers of the requests received one at a time into batches, classified by a pool of workers of its
+    own (see CSOClassifier.create_pool), which the batch mode of the classifier does not replace or stop. A batch is
+    sent to a worker as soon as one is free, with the papers waiting at that time: up to max_batch_size papers, waiting
+    at most max_wait seconds after the first for more to arrive. Under low load the batches are small and sent straight
+    away; under high load they grow, and each worker tags many texts at once.
+
+    Requests belong to a lane (see LANES), each with its own queue: when a worker is free, the batch is taken from the
+    interactive lane first. Moreover, some workers are reserved to the interactive lane, so that its requests do not
+    wait for the bulk ones to complete. Large requests are split into batches, so they do not hold a worker for long.
+    """
+
+    def __init__(self, classifier: CSOClassifier, workers: int = 1, max_batch_size: int = 32, max_wait: float = 0.005,
+                 reserved_workers: Optional[int] = None, threads: bool = False) -> None:
+        """ Initialising the batcher
+
+        Args:
+            classifier (CSOClassifier): The classifier.
+            workers (int, optional): Number of workers. Defaults to 1.
+            max_batch_size (int, optional): Maximum number of papers in a batch. Defaults to 32.
+            max_wait (float, optional): Maximum time (seconds) a batch waits for more papers. Defaults to 0.005.
+            reserved_workers (Optional[int], optional): Number of workers that only classify interactive requests.
+                Defaults to one, if there are at least two workers, otherwise none.
+            threads (bool, optional): If True, the workers are threads of this process, sharing its ontology and model.
+                Defaults to False.
+        """
+        if reserved_workers is None:
+            reserved_workers = 1 if workers > 1 else 0
+        if reserved_workers < 0 or (reserved_workers >= workers and workers > 0):
+            raise ValueError("The number of reserved workers must be between 0 and the number of workers minus 1")
+
+        self.classifier = classifier
+        self.workers = workers
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.reserved_workers = reserved_workers
+        self.pool = classifier.create_pool(workers, threads)
+        self.task_function = classifier._run_in_thread if threads else _run_worker
+
+        self.condition = threading.Condition()
+        self.running = True
+        self.started = time.perf_counter()
+        self.lanes = dict()
+        for lane in LANES:
+            self.lanes[lane] = {"parts": deque(),          # (papers, request) of the parts of requests waiting for a batch
+                                "queued_papers": 0,
+                                "in_flight": 0,             # batches being classified
+                                "statistics": {"requests": 0, "papers": 0, "batches": 0, "errors": 0},
+                                "latencies": deque(maxlen=10000)}   # seconds, of the last requests
+
+        self.thread = threading.Thread(target=self.__dispatch, name="cso-classifier-batcher", daemon=True)
+        self.thread.start()
+
+
+    def submit(self, papers: Dict[str, Any], lane: str = "interactive") -> Future:
+        """ Function that queues the papers of a request.
+
+        Args:
+            papers (Dict[str, Any]): contains the metadata of the papers, by id.
+            lane (str, optional): The lane of the request, either "interactive" or "bulk". Defaults to "interactive".
+
+        Returns:
+            Future: the future result of the request, with the result of each classification by paper id.
+        """
+        if lane not in self.lanes:
+            raise ValueError("Field lane must be one of {}".format(", ".join("'{}'".format(name) for name in LANES)))
+
+        future = Future()
+        paper_ids = list(papers)
+        if len(paper_ids) == 0:
+            future.set_result(dict())
+            return future
+
+        request = {"future": future, "paper_ids": paper_ids, "results": dict(), "arrival": time.perf_counter(),
+                   "remaining": -(-len(paper_ids) // self.max_batch_size)}
+        with self.condition:
+            if not self.running:
+                raise RuntimeError("The batcher has been closed.")
+            for first in range(0, len(paper_ids), self.max_batch_size):
+                self.lanes[lane]["parts"].append(({paper_id: papers[paper_id] for paper_id in paper_ids[first:first + self.max_batch_size]}, request))
+            self.lanes[lane]["queued_papers"] += len(paper_ids)
+            self.condition.notify_all()
+        return future
+
+
+    def classify(self, papers: Dict[str, Any], lane: str = "interactive", timeout: Optional[float] = None) -> Dict[str, Any]:
+        """ Function that classifies the papers of a request, waiting for their results.
+
+        Args:
+            papers (Dict[str, Any]): contains the metadata of the papers, by id.
+            lane (str, optional): The lane of the request, either "interactive" or "bulk". Defaults to "interactive".
+            timeout (Optional[float], optional): Maximum time to wait (seconds). Defaults to None, no limit.
+
+        Returns:
+            Dict[str, Any]: the result of each classification, by paper id.
+        """
+        return self.submit(papers, lane).result(timeout)
+
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """ Function that returns the statistics of the batcher: requests, papers and batches completed, mean batch
+        size and throughput (papers per second since the start), overall and for each lane ('lanes'). For each lane
+        it also returns the papers waiting (queue depth), the batches in flight, and the latency of the last requests
+        (milliseconds, percentiles).
+
+        Returns:
+            Dict[str, Any]: the statistics.
+        """
+        elapsed = time.perf_counter() - self.started
+        statistics = {"requests": 0, "papers": 0, "batches": 0, "errors": 0, "lanes": dict()}
+        with self.condition:
+            for lane, state in self.lanes.items():
+                lane_statistics = dict(state["statistics"])
+                lane_statistics["queued_papers"] = state["queued_papers"]
+                lane_statistics["in_flight_batches"] = state["in_flight"]
+                latencies = np.array(state["latencies"])
+                for percentile in (50, 95, 99):
+                    lane_statistics["latency_p{}".format(percentile)] = float(np.percentile(latencies, percentile)) * 1000 if len(latencies) > 0 else None
+                statistics["lanes"][lane] = lane_statistics
+                for key in ("requests", "papers", "batches", "errors"):
+                    statistics[key] += lane_statistics[key]
+
+        for lane_statistics in list(statistics["lanes"].values()) + [statistics]:
+            lane_statistics["mean_batch_size"] = lane_statistics["papers"] / lane_statistics["batches"] if lane_statistics["batches"] > 0 else 0.0
+            lane_statistics["throughput"] = lane_statistics["papers"] / elapsed
+        return statistics
+
+
+    def close(self) -> None:
+        """ Function that stops the batcher and its workers, after classifying the requests already received.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.thread.join()
+        self.pool.close()
+        self.pool.join()
+
+
+    def __get_next_lane(self) -> Optional[str]:
+        """ Function that returns the lane of the next batch: the one with the highest priority having papers waiting
+        and a worker available to it (None if there is none).
+
+        Returns:
+            Optional[str]: the lane.
+        """
+        in_flight = sum(state["in_flight"] for state in self.lanes.values())
+        if in_flight >= self.workers and self.running:
+            return None
+        for priority, lane in enumerate(LANES):
+            state = self.lanes[lane]
+            if len(state["parts"]) == 0:
+                continue
+            if priority > 0 and self.running and in_flight >= self.workers - self.reserved_workers:
+                return None # the remaining workers are reserved to the interactive lane
+            return lane
+        return None
+
+
+    def __dispatch(self) -> None:
+        """ Function that creates the batches and sends them to the workers, until the batcher is closed.
+        """
+        while True:
+            with self.condition:
+                lane = self.__get_next_lane()
+                if lane is None:
+                    if not self.running and all(len(state["parts"]) == 0 for state in self.lanes.values()):
+                        return
+                    self.condition.wait()
+                    continue
+
+                # waiting for more papers, until the batch is full or the first request has waited max_wait
+                # (in the meantime, requests of other lanes may arrive)
+                state = self.lanes[lane]
+                remaining_wait = state["parts"][0][1]["arrival"] + self.max_wait - time.perf_counter()
+                if self.running and state["queued_papers"] < self.max_batch_size and remaining_wait > 0:
+                    self.condition.wait(remaining_wait)
+                    continue
+
+                batch = [state["parts"].popleft()]
+                size = len(batch[0][0])
+                while len(state["parts"]) > 0 and size + len(state["parts"][0][0]) <= self.max_batch_size:
+                    batch.append(state["parts"].popleft())
+                    size += len(batch[-1][0])
+                state["queued_papers"] -= size
+                state["in_flight"] += 1
+
+            # papers are identified by the position of their part in the batch, as ids may repeat across requests
+            papers = {(position, paper_id): paper for position, (part, _) in enumerate(batch) for paper_id, paper in part.items()}
+            self.pool.apply_async(self.task_function, (papers,),
+                                  callback=lambda output, lane=lane, batch=batch: self.__complete(lane, batch, _get_results(output), None),
+                                  error_callback=lambda error, lane=lane, batch=batch: self.__complete(lane, batch, None, error))
+
+
+    def __complete(self, lane: str, batch: list, results: Optional[Dict[Tuple[int, str], Any]], error: Optional[BaseException]) -> None:
+        """ Function that returns the results of a batch to its requests.
+
+        Args:
+            lane (str): The lane of the batch.
+            batch (list): The parts of the requests in the batch.
+            results (Optional[Dict[Tuple[int, str], Any]]): The results, by position of the part and paper id.
+            error (Optional[BaseException]): The error raised while classifying the batch, if any.
+        """
+        completed = time.perf_counter()
+        completed_requests = list()
+        with self.condition:
+            for position, (part, request) in enumerate(batch):
+                if error is not None:
+                    request["error"] = error
+                else:
+                    request["results"].update((paper_id, results[(position, paper_id)]) for paper_id in part)
+                request["remaining"] -= 1
+                if request["remaining"] == 0:
+                    completed_requests.append(request)
+
+            state = self.lanes[lane]
+            state["in_flight"] -= 1
+            state["statistics"]["batches"] += 1
+            state["statistics"]["requests"] += len(completed_requests)
+            state["statistics"]["papers"] += sum(len(part) for part, _ in batch)
+            state["statistics"]["errors"] += sum(1 for request in completed_requests if "error" in request)
+            state["latencies"].extend(completed - request["arrival"] for request in completed_requests)
+            self.condition.notify_all()
+
+        for request in completed_requests:
+            if "error" in request:
+                request["future"].set_exception(request["error"])
+            else:
+                request["future"].set_result({paper_id: request["results"][paper_id] for paper_id in request["paper_ids"]})
+
+
+# =============================================================================
+#     HTTP SERVICE
+# =============================================================================
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """ Handles the requests to the classification service:
+        POST /classify with a paper ({"title": "", "abstract": "", "keywords": ""} or a string) returns {"result": ...};
+        POST /classify with {"papers": {"id1": {...}, ...}} returns {"results": {"id1": ..., ...}};
+        GET /stats returns the statistics of the batcher, and GET /health returns {"status": "ok"}.
+    Single papers go to the interactive lane and dictionaries of papers to the bulk lane, unless the lane is given
+    in the query (e.g., POST /classify?lane=bulk).
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        if self.path == "/stats":
+            self.__send(200, self.server.batcher.get_statistics())
+        elif self.path == "/health":
+            self.__send(200, {"status": "ok"})
+        else:
+            self.__send(404, {"error": "Not found"})
+
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        if url.path != "/classify":
+            self.__send(404, {"error": "Not found"})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+        except ValueError:
+            self.__send(400, {"error": "The body must be JSON."})
+            return
+
+        if isinstance(request, dict) and isinstance(request.get("papers"), dict):
+            papers, single = request["papers"], False
+        elif isinstance(request, (dict, str)):
+            papers, single = {"paper": request}, True
+        else:
+            self.__send(400, {"error": "The body must contain a paper or a dictionary of papers."})
+            return
+
+        lane = parse_qs(url.query).get("lane", ["interactive" if single else "bulk"])[0]
+        if lane not in LANES:
+            self.__send(400, {"error": "The lane must be one of {}.".format(", ".join(LANES))})
+            return
+
+        try:
+            results = self.server.batcher.classify(papers, lane)
+        except Exception as error:
+            self.__send(500, {"error": str(error)})
+            return
+        self.__send(200, {"result": results["paper"]} if single else {"results": results})
+
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if not self.server.silent:
+            super().log_message(format, *args)
+
+
+    def __send(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class ClassificationService(ThreadingHTTPServer):
+    """ HTTP server classifying the papers of its requests with a MicroBatcher """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], classifier: CSOClassifier, workers: int = 1, max_batch_size: int = 32,
+                 max_wait: float = 0.005, reserved_workers: Optional[int] = None, silent: bool = False, threads: bool = False) -> None:
+        """ Initialising the service
+
+        Args:
+            address (Tuple[str, int]): Host and port to listen on (port 0 picks a free one).
+            classifier (CSOClassifier): The classifier.
+            workers (int, optional): Number of workers. Defaults to 1.
+            max_batch_size (int, optional): Maximum number of papers in a batch. Defaults to 32.
+            max_wait (float, optional): Maximum time (seconds) a batch waits for more papers. Defaults to 0.005.
+            reserved_workers (Optional[int], optional): Number of workers reserved to the interactive lane. Defaults to
+                one, if there are at least two workers, otherwise none.
+            silent (bool, optional): If True, the requests are not logged. Defaults to False.
+            threads (bool, optional): If True, the workers are threads of this process. Defaults to False.
+        """
+        super().__init__(address, ServiceHandler)
+        self.silent = silent
+        self.batcher = MicroBatcher(classifier, workers, max_batch_size, max_wait, reserved_workers, threads)
+
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.batcher.close()
+
+
+@click.command()
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', type=int, default=8000, show_default=True)
+@click.option('-w', '--workers', type=int, default=1, show_default=True, help="Number of workers.")
+@click.option('--max-batch-size', type=int, default=32, show_default=True, help="Maximum number of papers in a batch.")
+@click.option('--max-wait', type=float, default=5.0, show_default=True, help="Maximum time (milliseconds) a batch waits for more papers.")
+@click.option('--reserved-workers', type=int, default=None, help="Number of workers reserved to interactive requests (default: 1 if there are at least 2 workers).")
+@click.option('--threads', is_flag=True, help="Use threads as workers, sharing one copy of the ontology and the model.")
+@click.option('--modules', type=click.Choice(['syntactic', 'semantic', 'both']), default='both', show_default=True)
+@click.option('--enhancement', type=click.Choice(['first', 'all', 'no']), default='first', show_default=True)
+@click.option('--explanation', is_flag=True, help="Return the chunks of text that allowed to infer each topic.")
+@click.option('--keep-outliers', is_flag=True, help="Do not run the outlier detection.")
+@click.option('--full-model', is_flag=True, help="Use the word2vec model rather than the cached model.")
+@click.option('--weights', is_flag=True, help="Return the weights of the syntactic and semantic topics.")
+@click.option('-q', '--quiet', is_flag=True, help="Do not log the requests.")
+def main(host: str, port: int, workers: int, max_batch_size: int, max_wait: float, reserved_workers: Optional[int], threads: bool, modules: str, enhancement: str,
+         explanation: bool, keep_outliers: bool, full_model: bool, weights: bool, quiet: bool) -> None:
+    """ Runs the CSO Classifier as an HTTP service (POST /classify, GET /stats, GET /health).
+    """
+    classifier = CSOClassifier(modules=modules, enhancement=enhancement, explanation=explanation, delete_outliers=not keep_outliers,
+                               fast_classification=not full_model, get_weights=weights, silent=True)
+    service = ClassificationService((host, port), classifier, workers, max_batch_size, max_wait / 1000, reserved_workers, quiet, threads)
+    click.echo("CSO Classifier service listening on http://{}:{}".format(*service.server_address[:2]), err=True)
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.server_close()
+        classifier.close()
+
+
+if __name__ == '__main__':
+    main()
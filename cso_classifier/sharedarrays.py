@@ -0,0 +1,90 @@
+from multiprocessing import shared_memory
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+from .columnar import ALIGNMENT
+
+
+class SharedArrays:
+    """ A set of NumPy arrays copied, by the process publishing them, in a named shared memory segment, which other
+    processes (e.g., workers started with spawn or forkserver) attach to without copying the arrays (see attach).
+    The segment is released by close, which must be called by the publishing process once the other processes are done.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]) -> None:
+        """ Initialising the shared arrays
+
+        Args:
+            arrays (Dict[str, np.ndarray]): The arrays to publish, by name.
+        """
+        self.layout = dict()    # name -> dtype, shape and offset (bytes) of the array in the segment
+        offset = 0
+        for name, array in arrays.items():
+            self.layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+        self.memory = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for name, array in arrays.items():
+            self.get_view(self.memory, self.layout[name], writeable=True)[...] = array
+
+
+    def get_descriptor(self) -> Dict[str, Any]:
+        """ Function that returns what other processes need to attach to the arrays: the name of the segment and the
+        layout of the arrays in it.
+
+        Returns:
+            Dict[str, Any]: the descriptor (small, and cheap to send to other processes).
+        """
+        return {"name": self.memory.name, "arrays": self.layout}
+
+
+    def get_size(self) -> int:
+        """ Function that returns the size of the segment.
+
+        Returns:
+            int: the size in bytes.
+        """
+        return self.memory.size
+
+
+    def close(self) -> None:
+        """ Function that releases the segment. The processes already attached to it can keep using their arrays
+        until they detach, while no other process can attach to it.
+        """
+        if self.memory is not None:
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+
+
+    @staticmethod
+    def attach(descriptor: Dict[str, Any]) -> Tuple[shared_memory.SharedMemory, Dict[str, np.ndarray]]:
+        """ Function that attaches to the arrays published by another process. The arrays are read-only views over the
+        segment, which must be kept (i.e., referenced) as long as they are in use.
+
+        Args:
+            descriptor (Dict[str, Any]): The descriptor returned by get_descriptor.
+
+        Returns:
+            Tuple[shared_memory.SharedMemory, Dict[str, np.ndarray]]: the segment and the arrays, by name.
+        """
+        memory = shared_memory.SharedMemory(name=descriptor["name"])
+        return memory, {name: SharedArrays.get_view(memory, layout) for name, layout in descriptor["arrays"].items()}
+
+
+    @staticmethod
+    def get_view(memory: shared_memory.SharedMemory, layout: Dict[str, Any], writeable: bool = False) -> np.ndarray:
+        """ Function that returns an array of a segment, without copying it.
+
+        Args:
+            memory (shared_memory.SharedMemory): The segment.
+            layout (Dict[str, Any]): The dtype, shape and offset of the array.
+            writeable (bool, optional): If False, the array is read-only. Defaults to False.
+
+        Returns:
+            np.ndarray: the array.
+        """
+        array = np.ndarray(layout["shape"], dtype=np.dtype(layout["dtype"]), buffer=memory.buf, offset=layout["offset"])
+        array.flags.writeable = writeable
+        return array
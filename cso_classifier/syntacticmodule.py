@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Optional, Set, Union, Generator
+from typing import Any, Dict, List, Optional, Set, Tuple, Union, Generator
 from nltk import ngrams
 from nltk.tokenize import word_tokenize
 from rapidfuzz.distance import Levenshtein
@@ -8,7 +8,11 @@ from .paper import Paper
 
 
 class Syntactic:
-    """ A simple abstraction layer for using the Syntactic module of the CSO classifier """
+    """ A simple abstraction layer for using the Syntactic module of the CSO classifier.
+
+    classify_chunks does not change the state of the object, so a single object can be used by several threads at once.
+    The other functions keep the paper being analysed and its outcome in the object, as in the previous versions.
+    """
 
     def __init__(self, cso: Optional[Ontology] = None, paper: Optional[Paper] = None):
         """Function that initialises an object of class CSOClassifierSyntactic and all its members.
@@ -76,20 +80,49 @@ class Syntactic:
 
         final_topics = list()
         # analysing similarity with terms in the ontology
-        self.extracted_topics = self.__statistic_similarity()
+        self.extracted_topics, self.explanation = self.__statistic_similarity(self.paper.get_syntactic_chunks())
         # stripping explanation
         final_topics = self.__strip_service_fields(self.extracted_topics)
         return final_topics
 
 
+    def classify_chunks(self, concepts: List[str]) -> Dict[str, Any]:
+        """Function that classifies the syntactic chunks of a paper, as classify_syntactic, but without changing the
+        state of the object: the outcome is returned rather than kept.
+
+        Args:
+            concepts (List[str]): The syntactic chunks of the paper (see Paper.get_syntactic_chunks).
+
+        Returns:
+            Dict[str, Any]: the list of topics ('topics'), their weights ('weights') and the explanation ('explanation').
+        """
+        extracted_topics, explanation = self.__statistic_similarity(concepts)
+        return {"topics": self.__strip_service_fields(extracted_topics),
+                "weights": self.get_topics_weights(extracted_topics),
+                "explanation": explanation}
+
+
     def get_syntactic_topics_weights(self) -> Dict[str, float]:
         """Function that returns the full set of topics with the similarity measure (weights)
 
+        Returns:
+            Dict[str, float]: containing the found topics with their similarity.
+        """
+        return self.get_topics_weights(self.extracted_topics)
+
+
+    @staticmethod
+    def get_topics_weights(extracted_topics: Dict[str, List[Dict[str, Union[str, float]]]]) -> Dict[str, float]:
+        """Function that computes the weight of each extracted topic, i.e., its highest similarity.
+
+        Args:
+            extracted_topics (Dict[str, List[Dict[str, Union[str, float]]]]): the found topics with their similarity.
+
         Returns:
             Dict[str, float]: containing the found topics with their similarity.
         """
         weights = dict()
-        for topic, sim_values in self.extracted_topics.items():
+        for topic, sim_values in extracted_topics.items():
             if len(sim_values) == 1:
                 weights[topic] = sim_values[0]["similarity"]
             else:
@@ -98,16 +131,20 @@ class Syntactic:
         return weights
 
 
-    def __statistic_similarity(self) -> Dict[str, List[Dict[str, Union[str, float]]]]:
+    def __statistic_similarity(self, concepts: List[str]) -> Tuple[Dict[str, List[Dict[str, Union[str, float]]]], Dict[str, Set[str]]]:
         """Function that finds the similarity between the previously extracted concepts and topics in the ontology
 
+        Args:
+            concepts (List[str]): The syntactic chunks of the paper.
+
         Returns:
-            Dict[str, List[Dict[str, Union[str, float]]]]: containing the found topics with their similarity and the n-gram analysed.
+            Tuple[Dict[str, List[Dict[str, Union[str, float]]]], Dict[str, Set[str]]]: containing the found topics with
+            their similarity and the n-gram analysed, and the explanation.
         """
 
         found_topics = dict()
+        explanation = dict()
 
-        concepts = self.paper.get_syntactic_chunks()
         for concept in concepts:
             matched_trigrams = set()
             matched_bigrams = set()
@@ -149,12 +186,12 @@ class Syntactic:
                             matched_trigrams.add(position)
 
                         # explanation bit
-                        if topic not in self.explanation:
-                            self.explanation[topic] = set()
+                        if topic not in explanation:
+                            explanation[topic] = set()
 
-                        self.explanation[topic].add(gram)
+                        explanation[topic].add(gram)
 
-        return found_topics
+        return found_topics, explanation
 
 
     def __get_ngrams(self, concept: str) -> Generator[Dict[str, Any], None, None]:
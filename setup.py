@@ -59,7 +59,6 @@ requirements_to_install = [
     'numpy>=1.19.5',
     'requests==2.25.1',
     'spacy==3.8.7',
-    'strsimpy==0.2.0',
     'update-checker==0.18.0'
 ]
 
@@ -87,6 +86,9 @@ setuptools.setup(
     ],
     package_data = {'cso_classifier' : ['assets/*','config.ini'] },
     install_requires=requirements_to_install,
+    extras_require={'test': ['pytest', 'strsimpy==0.2.1']},
+    entry_points={'console_scripts': ['cso-classifier=cso_classifier.cli:main',
+                                        'cso-classifier-service=cso_classifier.service:main']},
     license="Apache-2.0",
     python_requires='>=3.11.0',
 )
\ No newline at end of file
@@ -0,0 +1,69 @@
+import csv
+import multiprocessing
+import os
+from typing import Callable, Iterable, Tuple
+
+import pytest
+
+from cso_classifier.config import Config
+
+
+# the worker processes use the stubs set by a test on the classes only if they are forked from it
+requires_fork = pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="the workers are not forked")
+
+
+@pytest.fixture
+def use_directory(monkeypatch: pytest.MonkeyPatch) -> Callable[[str], str]:
+    """ Fixture returning a function that makes the Config resolve the paths of the resources (ontology, model
+    and their artifacts) within the given directory, instead of the package directory.
+    """
+    original_init = Config.__init__
+
+    def use(directory: str) -> str:
+        os.makedirs(os.path.join(directory, "assets"), exist_ok=True)
+
+        def init(self: Config) -> None:
+            original_init(self)
+            self.dir = directory
+
+        monkeypatch.setattr(Config, "__init__", init)
+        return directory
+
+    return use
+
+
+def write_triples(path: str, triples: Iterable[Tuple[str, str, str]]) -> None:
+    """ Functionality that writes triples in the csv format of the ontology read by Ontology."""
+    with open(path, "w", newline="") as file:
+        co = csv.writer(file, delimiter=";")
+        for triple in triples:
+            co.writerow(triple)
+
+
+def synthetic_triples(extra_topics: int = 0) -> list:
+    """ Functionality that returns the triples of a small ontology: a hierarchy with several roots, topics with more
+    than one broader, a topic that is unreachable from the others, and a cluster of equivalent topics.
+    With extra_topics, it also contains a separate hierarchy of that many topics (each topic n is narrower of n // 3).
+    """
+    broaders = [("computer science", "artificial intelligence"), ("computer science", "computer networks"),
+                ("computer science", "databases"), ("artificial intelligence", "machine learning"),
+                ("artificial intelligence", "knowledge representation"), ("machine learning", "deep learning"),
+                ("machine learning", "reinforcement learning"), ("deep learning", "convolutional neural networks"),
+                ("deep learning", "recurrent neural networks"), ("knowledge representation", "ontology"),
+                ("knowledge representation", "semantic web"), ("semantic web", "ontology"),
+                ("semantic web", "linked data"), ("databases", "linked data"), ("databases", "query processing"),
+                ("computer networks", "wireless networks"), ("computer networks", "social networks"),
+                ("social networks", "online social networks"), ("data mining", "text mining"),
+                ("data mining", "social networks"), ("text mining", "sentiment analysis")]
+    topics = sorted({topic for pair in broaders for topic in pair} | {"ontologies", "semantic web technologies", "quantum computing"})
+
+    triples = [(topic, "rdfs:label", topic) for topic in topics]
+    triples += [(broader, "klink:broaderGeneric", narrower) for broader, narrower in broaders]
+    triples += [("ontology", "klink:relatedEquivalent", "ontologies"), ("ontologies", "klink:relatedEquivalent", "ontology"),
+                ("semantic web", "klink:relatedEquivalent", "semantic web technologies")]
+    triples += [("ontologies", "klink:primaryLabel", "ontology"), ("ontology", "klink:primaryLabel", "ontology"),
+                ("semantic web technologies", "klink:primaryLabel", "semantic web")]
+    extra = ["mathematics {}".format(number) for number in range(extra_topics)]
+    triples += [(topic, "rdfs:label", topic) for topic in extra]
+    triples += [(extra[number // 3], "klink:broaderGeneric", extra[number]) for number in range(1, extra_topics)]
+    return triples
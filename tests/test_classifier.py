@@ -0,0 +1,381 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterator, List, Tuple
+
+import pytest
+
+import cso_classifier.classifier
+from cso_classifier.classifier import CSOClassifier, _initialise_shared_memory_worker
+from cso_classifier.config import Config
+
+from conftest import requires_fork, synthetic_triples, write_triples
+
+
+@pytest.fixture
+def classifier(tmp_path, monkeypatch: pytest.MonkeyPatch) -> CSOClassifier:
+    """ Fixture returning a classifier whose ontology and model are placeholders and whose 'topics' of a paper are the
+    words of its text. The paper "fail" cannot be classified, and the papers starting with "slow" take half a second.
+    Each load of the resources is recorded, with the id of the process, in the file classifier.loads, and the threads
+    of this process that created their modules in classifier.created.
+    The stubs are methods of the class, so the workers forked by the pools use them as well.
+    """
+    loads = str(tmp_path / "loads")
+    created = list()
+
+    def load_resources(self: CSOClassifier, shared_arrays: Any = None) -> Tuple[str, str]:
+        with open(loads, "a", encoding="utf-8") as file:
+            file.write("{}\n".format(os.getpid()))
+        return "ontology", "model"
+
+    def create_batch_modules(self: CSOClassifier, cso: Any, model: Any, tagger: Any = None) -> Dict[str, Any]:
+        created.append(threading.get_ident())
+        return {"cso": cso, "model": model, "thread": threading.get_ident()}
+
+    def classify_batch(self: CSOClassifier, batch_modules: Dict[str, Any], papers: Dict[str, Any]) -> Dict[str, Any]:
+        assert (batch_modules["cso"], batch_modules["model"]) == ("ontology", "model")
+        for paper in papers.values():
+            if paper == "fail":
+                raise ValueError("cannot classify")
+            if paper.startswith("slow"):
+                time.sleep(0.5)
+        return {paper_id: {"union": paper.split()} for paper_id, paper in papers.items()}
+
+    monkeypatch.setattr(CSOClassifier, "_load_resources", load_resources)
+    monkeypatch.setattr(CSOClassifier, "_create_batch_modules", create_batch_modules)
+    monkeypatch.setattr(CSOClassifier, "_classify_batch", classify_batch)
+    monkeypatch.setattr(CSOClassifier, "get_tagger", lambda self: None)
+    classifier = CSOClassifier(silent = True)
+    classifier.loads = loads
+    classifier.created = created
+    yield classifier
+    classifier.close(wait = False)
+
+
+def get_loads(classifier: CSOClassifier) -> List[int]:
+    """ Functionality that returns the ids of the processes that loaded the resources, once per load."""
+    if not os.path.exists(classifier.loads):
+        return []
+    with open(classifier.loads, "r", encoding="utf-8") as file:
+        return [int(line) for line in file]
+
+
+def get_papers(number_of_papers: int, consumed: List[str] = None, slow: Tuple[int, ...] = ()) -> Iterator[Tuple[str, str]]:
+    """ Functionality that yields papers "p0", "p1", ..., recording in consumed the ids of those read so far."""
+    for number in range(number_of_papers):
+        if consumed is not None:
+            consumed.append("p{}".format(number))
+        yield "p{}".format(number), "{}topic {}".format("slow " if number in slow else "", number)
+
+
+def expected_results(papers: Iterator[Tuple[str, str]]) -> List[Tuple[str, Dict[str, Any]]]:
+    return [(paper_id, {"union": paper.split()}) for paper_id, paper in papers]
+
+
+@requires_fork
+@pytest.mark.parametrize("threads", [False, True])
+def test_stream_yields_the_results_in_order(classifier: CSOClassifier, threads: bool) -> None:
+    # the slow papers make later tasks complete first
+    results = list(classifier.classify_stream(get_papers(30, slow = (0, 10)), workers = 3, threads = threads))
+    assert results == expected_results(get_papers(30, slow = (0, 10)))
+    loads = get_loads(classifier)
+    if threads:
+        # the resources are loaded once, by this process, and each thread creates its modules once
+        assert loads == [os.getpid()] and len(classifier.created) == len(set(classifier.created)) <= 3
+    else:
+        # the resources are loaded by each worker process, once
+        assert len(loads) == 3 and len(set(loads)) == 3 and os.getpid() not in loads
+
+
+@requires_fork
+@pytest.mark.parametrize("threads", [False, True])
+def test_stream_yields_the_results_as_completed(classifier: CSOClassifier, threads: bool) -> None:
+    # the first task (8 papers) is slow, and the other ones are completed by the other workers in the meantime
+    results = list(classifier.classify_stream(get_papers(30, slow = (0,)), workers = 3, ordered = False, threads = threads))
+    assert sorted(results) == sorted(expected_results(get_papers(30, slow = (0,))))
+    assert [paper_id for paper_id, _ in results[-8:]] == ["p{}".format(number) for number in range(8)]
+
+
+@requires_fork
+@pytest.mark.parametrize("ordered", [True, False])
+def test_stream_reads_the_papers_only_when_there_is_room(classifier: CSOClassifier, ordered: bool) -> None:
+    consumed = list()
+    results = list()
+    for paper_id, result in classifier.classify_stream(get_papers(40, consumed), workers = 2, ordered = ordered, max_in_flight = 5):
+        # the papers read are the ones yielded so far and at most 5 more, including this one
+        assert paper_id in consumed and len(consumed) <= len(results) + 5
+        results.append((paper_id, result))
+    assert len(consumed) == 40
+    if ordered:
+        assert results == expected_results(get_papers(40))
+    else:
+        assert sorted(results) == sorted(expected_results(get_papers(40)))
+
+
+@requires_fork
+@pytest.mark.parametrize("ordered", [True, False])
+def test_stream_raises_the_errors_of_the_workers(classifier: CSOClassifier, ordered: bool) -> None:
+    papers = [("p{}".format(number), "fail" if number == 20 else "topic {}".format(number)) for number in range(40)]
+    with pytest.raises(ValueError, match = "cannot classify"):
+        for _ in classifier.classify_stream(papers, workers = 2, ordered = ordered, max_in_flight = 8):
+            pass
+
+    # the workers keep classifying the following papers
+    assert list(classifier.classify_stream(get_papers(10), workers = 2)) == expected_results(get_papers(10))
+
+
+@requires_fork
+@pytest.mark.parametrize("ordered", [True, False])
+def test_stream_stopped_early(classifier: CSOClassifier, ordered: bool) -> None:
+    consumed = list()
+    stream = classifier.classify_stream(get_papers(100, consumed), workers = 2, ordered = ordered, max_in_flight = 4)
+    paper_id, result = next(stream)
+    assert result == {"union": ["topic", paper_id[1:]]}
+    stream.close()
+    assert len(consumed) == 4
+
+    # no more papers are read, and the results of the papers in flight do not leak into the following calls
+    assert list(classifier.classify_stream(get_papers(10), workers = 2)) == expected_results(get_papers(10))
+    assert len(consumed) == 4
+    classifier.close()
+    assert classifier.pool is None
+
+
+@requires_fork
+def test_batch_workers_are_kept_across_calls(classifier: CSOClassifier) -> None:
+    papers = dict(get_papers(20))
+    assert classifier.batch_run(papers, workers = 2) == dict(expected_results(get_papers(20)))
+    pool = classifier.pool
+    workers = set(classifier.workers_time)
+
+    # the following calls, in batch or streaming mode, use the same workers, which do not load the resources again
+    assert classifier.batch_run(papers, workers = 2) == dict(expected_results(get_papers(20)))
+    assert list(classifier.classify_stream(get_papers(5), workers = 2)) == expected_results(get_papers(5))
+    assert classifier.pool is pool and set(classifier.workers_time) <= workers
+    assert len(get_loads(classifier)) == 2
+
+    # a different number of workers replaces them
+    assert classifier.batch_run(papers, workers = 3) == dict(expected_results(get_papers(20)))
+    assert classifier.pool is not pool and len(get_loads(classifier)) == 5
+    with pytest.raises(ValueError):
+        pool.apply_async(len, ([],))
+
+    pool = classifier.pool
+    classifier.close()
+    assert classifier.pool is None
+    with pytest.raises(ValueError):
+        pool.apply_async(len, ([],))
+
+
+def test_batch_tasks_start_from_the_most_expensive_papers() -> None:
+    papers = {"p{}".format(number): "word " * ((number * 7) % 30) + "topic" for number in range(60)}
+    tasks = CSOClassifier.get_batch_tasks(papers, 8)
+
+    # every paper is in one task, and the papers are in order of decreasing cost across the tasks
+    assert sorted(paper_id for task in tasks for paper_id in task) == sorted(papers)
+    assert all(task[paper_id] == papers[paper_id] for task in tasks for paper_id in task)
+    costs = [CSOClassifier.get_paper_cost(paper) for task in tasks for paper in task.values()]
+    assert costs == sorted(costs, reverse = True)
+    assert 8 <= len(tasks) <= 9 and len(tasks[0]) < len(tasks[-2])
+    assert CSOClassifier.get_batch_tasks(dict(list(papers.items())[:3]), 8) == [{paper_id: papers[paper_id]} for paper_id in ["p2", "p1", "p0"]]
+
+
+@requires_fork
+def test_batch_results_follow_the_order_of_the_papers(classifier: CSOClassifier) -> None:
+    # the longest papers are sent first, and the slow ones complete last
+    papers = dict(get_papers(50, slow = (3, 4)))
+    papers.update({"p{}".format(number): "{} a much longer text".format(papers["p{}".format(number)]) for number in range(40, 50)})
+    results = classifier.batch_run(papers, workers = 3)
+    assert list(results.items()) == [(paper_id, {"union": paper.split()}) for paper_id, paper in papers.items()]
+
+
+@requires_fork
+def test_batch_run_with_threads(classifier: CSOClassifier) -> None:
+    papers = dict(get_papers(50, slow = (3,)))
+    expected = dict(expected_results(papers.items()))
+    assert classifier.batch_run(papers, workers = 3, threads = True) == expected
+    pool = classifier.pool
+    assert classifier.batch_run(papers, workers = 3, threads = True) == expected
+    assert classifier.pool is pool and 0 < len(classifier.workers_time) <= 3
+    assert get_loads(classifier) == [os.getpid()]
+    assert len(classifier.created) == len(set(classifier.created)) <= 3
+
+    # the same number of processes replaces the threads
+    assert classifier.batch_run(papers, workers = 3) == expected
+    assert classifier.pool is not pool and len(get_loads(classifier)) == 4
+
+
+@pytest.fixture
+def started(classifier: CSOClassifier) -> List[str]:
+    """ Fixture returning the ids of the papers whose classification started in the threads of the asynchronous
+    functions, in order, and recording in classifier.concurrency the highest number of them running at once.
+    """
+    started = list()
+    running = [0]
+    lock = threading.Lock()
+    classify_in_thread = classifier._classify_in_thread
+    classifier.concurrency = 0
+
+    def classify(papers: Dict[str, Any]) -> Dict[str, Any]:
+        with lock:
+            started.extend(papers)
+            running[0] += 1
+            classifier.concurrency = max(classifier.concurrency, running[0])
+        try:
+            time.sleep(0.02)
+            return classify_in_thread(papers)
+        finally:
+            with lock:
+                running[0] -= 1
+
+    classifier._classify_in_thread = classify
+    return started
+
+
+def test_async_requests_within_the_maximum_concurrency(classifier: CSOClassifier, started: List[str]) -> None:
+    classifier.configure_async(workers = 4, max_concurrency = 2)
+
+    async def classify() -> list:
+        return await asyncio.gather(classifier.abatch_run(dict(get_papers(10))),
+                                    *[classifier.arun("topic {}".format(number)) for number in range(10)])
+
+    results = asyncio.run(classify())
+    assert results[0] == dict(expected_results(get_papers(10)))
+    assert results[1:] == [{"union": ["topic", str(number)]} for number in range(10)]
+    assert len(started) == 20 and classifier.concurrency == 2
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_cancelling_async_stream_cancels_its_pending_papers(classifier: CSOClassifier, started: List[str], ordered: bool) -> None:
+    classifier.configure_async(workers = 1, max_concurrency = 3)
+    consumed = list()
+    results = list()
+
+    async def consume() -> None:
+        async for paper_id, result in classifier.aclassify_stream(get_papers(20, consumed, slow = tuple(range(20))), ordered = ordered):
+            results.append(paper_id)
+
+    async def cancel() -> None:
+        task = asyncio.ensure_future(consume())
+        while len(started) == 0:
+            await asyncio.sleep(0.001)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # nothing else is left running in the event loop
+        for _ in range(100):
+            if asyncio.all_tasks() == {asyncio.current_task()}:
+                break
+            await asyncio.sleep(0.001)
+        assert asyncio.all_tasks() == {asyncio.current_task()}
+
+    asyncio.run(cancel())
+    classifier.close()
+    # the papers read but not started are not classified
+    assert len(consumed) == 3 and started == ["p0"] and results == []
+
+
+@requires_fork
+def test_async_process_executor_is_replaced_after_reload(classifier: CSOClassifier) -> None:
+    classifier.configure_async(executor = "process", workers = 1)
+    assert asyncio.run(classifier.arun("a topic")) == {"union": ["a", "topic"]}
+    executor = classifier.get_async_executor()
+    assert classifier.get_async_executor() is executor and len(get_loads(classifier)) == 1
+
+    classifier.reload(wait = True)
+    assert asyncio.run(classifier.arun("another topic")) == {"union": ["another", "topic"]}
+    assert classifier.async_executor is not executor
+    # the new worker process loads the resources again (after this process, which reloaded them)
+    loads = get_loads(classifier)
+    assert len(loads) == 3 and loads[1] == os.getpid() and len(set(loads)) == 3
+    with pytest.raises(RuntimeError):
+        executor.submit(len, [])
+
+    # the threads, instead, are kept
+    classifier.configure_async(executor = "thread", workers = 1)
+    executor = classifier.get_async_executor()
+    classifier.reload(wait = True)
+    assert classifier.get_async_executor() is executor
+
+
+CACHED_MODEL = {"mach": [{"topic": "machine learning", "sim_t": 1.0, "wet": "machine_learning", "sim_w": 0.8}],
+                "onto": [{"topic": "ontology", "sim_t": 1.0, "wet": "ontologies", "sim_w": 1.0}],
+                "netw": [{"topic": "social networks", "sim_t": 0.9, "wet": "social_networks", "sim_w": 0.7},
+                         {"topic": "computer networks", "sim_t": 0.8, "wet": "networks", "sim_w": 0.75}]}
+
+
+def classify_with_model(self: CSOClassifier, batch_modules: Dict[str, Any], papers: Dict[str, Any]) -> Dict[str, Any]:
+    """ Functionality that stands in for _classify_batch: the 'topics' of a paper are the topics of its words in the
+    cached model, and the result records the class of the cached model of the worker and the size of its ontology.
+    """
+    model, cso = batch_modules["model"], batch_modules["cso"]
+    return {paper_id: {"union": [item["topic"] for word in paper.split() for item in model.get_words_from_model(word)],
+                       "worker": [type(model.model).__name__, str(len(cso.topics))]} for paper_id, paper in papers.items()}
+
+
+def initialise_shared_memory_worker(parameters: Dict[str, Any], descriptor: Dict[str, Any]) -> None:
+    """ Functionality that sets up a spawned worker with _initialise_shared_memory_worker, after making the Config
+    resolve the resources within the directory CSO_TEST_DIRECTORY and replacing the spaCy-based modules with
+    classify_with_model. The worker imports this module only to run this function, as it is not forked from the test.
+    """
+    directory = os.environ["CSO_TEST_DIRECTORY"]
+    original_init = Config.__init__
+
+    def init(self: Config) -> None:
+        original_init(self)
+        self.dir = directory
+
+    Config.__init__ = init
+    CSOClassifier._create_batch_modules = lambda self, cso, model, tagger = None: {"cso": cso, "model": model}
+    CSOClassifier._classify_batch = classify_with_model
+    _initialise_shared_memory_worker(parameters, descriptor)
+
+
+@pytest.fixture
+def spawn() -> None:
+    """ Fixture making the pools start their workers with spawn."""
+    start_method = multiprocessing.get_start_method()
+    multiprocessing.set_start_method("spawn", force = True)
+    yield
+    multiprocessing.set_start_method(start_method, force = True)
+
+
+def test_spawned_workers_read_the_model_from_shared_memory(tmp_path, use_directory, monkeypatch: pytest.MonkeyPatch, spawn: None) -> None:
+    directory = use_directory(str(tmp_path))
+    write_triples(os.path.join(directory, "assets", "cso.csv"), synthetic_triples())
+    with open(Config().get_cached_model(), "w", encoding="utf-8") as file:
+        json.dump(CACHED_MODEL, file)
+    monkeypatch.setenv("CSO_TEST_DIRECTORY", directory)
+    monkeypatch.setattr(cso_classifier.classifier, "_initialise_shared_memory_worker", initialise_shared_memory_worker)
+
+    classifier = CSOClassifier(modules = "semantic", enhancement = "no", delete_outliers = False, silent = True)
+    papers = {"a": "mach onto", "b": "netw", "c": "nothing", "d": "onto netw mach"}
+    results = classifier.batch_run(papers, workers = 2, share_resources = True)
+    worker = ["CachedModelView", str(len(classifier.cso.topics))]
+    assert results == {paper_id: {"union": [item["topic"] for word in paper.split() for item in CACHED_MODEL.get(word, [])],
+                                  "worker": worker} for paper_id, paper in papers.items()}
+    assert isinstance(classifier.model.model, dict) # this process keeps the model it loaded
+
+    # the segment is released with the workers
+    name = classifier.pool_arrays.get_descriptor()["name"]
+    shared_memory.SharedMemory(name = name).close()
+    classifier.close()
+    assert classifier.pool_arrays is None
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name = name)
+
+
+@requires_fork
+@pytest.mark.parametrize("ordered", [True, False])
+@pytest.mark.parametrize("max_in_flight", [1, 3, 8])
+def test_stream_classifies_every_paper_with_a_repeated_id(classifier: CSOClassifier, ordered: bool, max_in_flight: int) -> None:
+    papers = [("a", "first a"), ("b", "b"), ("a", "second a"), ("a", "third a"), ("c", "c"), ("b", "another b")]
+    results = list(classifier.classify_stream(iter(papers), workers = 2, ordered = ordered, max_in_flight = max_in_flight))
+    if ordered:
+        assert results == expected_results(papers)
+    else:
+        assert sorted(results, key = str) == sorted(expected_results(papers), key = str)
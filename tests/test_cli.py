@@ -0,0 +1,121 @@
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+import pytest
+from click.testing import CliRunner
+
+from cso_classifier import cli
+from cso_classifier.cli import read_checkpoint, read_papers
+
+
+class FakeClassifier:
+    """ Stands in for CSOClassifier: the 'topics' of a paper are the words of its text, and it records the papers it was given."""
+
+    classified = list()
+
+    def __init__(self, **parameters: Any) -> None:
+        self.parameters = parameters
+
+    def classify_stream(self, papers: Iterable[Tuple[str, Any]], **options: Any) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for paper_id, paper in papers:
+            FakeClassifier.classified.append(paper_id)
+            text = paper if isinstance(paper, str) else " ".join(str(value) for value in paper.values())
+            yield paper_id, {"union": sorted(set(text.split()))}
+
+    def close(self, wait: bool = True) -> None:
+        pass
+
+
+@pytest.fixture
+def run(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(cli, "CSOClassifier", FakeClassifier)
+
+    def invoke(*arguments: str) -> list:
+        FakeClassifier.classified = list()
+        result = CliRunner().invoke(cli.main, ["--quiet", *arguments], catch_exceptions=False)
+        assert result.exit_code == 0, result.output
+        return list(FakeClassifier.classified)
+
+    return invoke
+
+
+def read_output(path) -> list:
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
+
+
+def test_read_jsonl_objects_and_strings(tmp_path) -> None:
+    path = tmp_path / "papers.jsonl"
+    path.write_text("\n".join(json.dumps(record) for record in [
+        {"id": "first", "title": "a title", "abstract": "an abstract"},
+        {"title": "without id"},
+        "a paper whose text contains the word id",
+        "id",
+        ["a", "list", "id"],
+        {"id": 7, "keywords": "k"},
+    ]) + "\n\n", encoding="utf-8")
+
+    assert list(read_papers([str(path)])) == [
+        ("first", {"title": "a title", "abstract": "an abstract"}),
+        ("1", {"title": "without id"}),
+        ("2", "a paper whose text contains the word id"),
+        ("3", "id"),
+        ("4", ["a", "list", "id"]),
+        ("7", {"keywords": "k"}),
+    ]
+
+
+def test_read_csv(tmp_path) -> None:
+    path = tmp_path / "papers.csv"
+    path.write_text('paper,title,abstract\np1,"a title, with a comma","an abstract\nover two lines"\np2,another title,\n', encoding="utf-8")
+
+    assert list(read_papers([str(path)], id_field="paper")) == [
+        ("p1", {"title": "a title, with a comma", "abstract": "an abstract\nover two lines"}),
+        ("p2", {"title": "another title", "abstract": ""}),
+    ]
+    assert [paper_id for paper_id, _ in read_papers([str(path)])] == ["0", "1"]
+
+
+def test_classify_jsonl_and_csv(tmp_path, run) -> None:
+    jsonl = tmp_path / "papers.jsonl"
+    jsonl.write_text(json.dumps({"id": "a", "title": "graph theory"}) + "\n" + json.dumps("social networks id") + "\n", encoding="utf-8")
+    csv = tmp_path / "papers.csv"
+    csv.write_text("id,title\nb,data mining\n", encoding="utf-8")
+    output = tmp_path / "results.jsonl"
+
+    assert run(str(jsonl), str(csv), "-o", str(output)) == ["a", "1", "b"]
+    assert read_output(output) == [{"id": "a", "union": ["graph", "theory"]},
+                                   {"id": "1", "union": ["id", "networks", "social"]},
+                                   {"id": "b", "union": ["data", "mining"]}]
+
+
+def test_resume_from_checkpoint(tmp_path, run) -> None:
+    papers = tmp_path / "papers.jsonl"
+    papers.write_text("".join(json.dumps({"id": "p{}".format(number), "title": "topic {}".format(number)}) + "\n"
+                              for number in range(10)), encoding="utf-8")
+    output = tmp_path / "results.jsonl"
+    checkpoint = tmp_path / "results.jsonl.checkpoint"
+
+    assert len(run(str(papers), "-o", str(output), "--buffer-size", "1")) == 10
+    expected = output.read_text(encoding="utf-8")
+    completed, offset, size = read_checkpoint(str(checkpoint))
+    assert completed == {"p{}".format(number) for number in range(10)} and offset == len(expected.encode("utf-8"))
+    assert size == os.path.getsize(checkpoint)
+
+    # interrupted after recording 4 results: a 5th result was written but not recorded, and a checkpoint line is incomplete
+    lines = checkpoint.read_text(encoding="utf-8").splitlines(keepends=True)
+    checkpoint.write_text("".join(lines[:4]) + lines[4][:10], encoding="utf-8")
+    output.write_text("".join(expected.splitlines(keepends=True)[:5]) + '{"id": "p5", "uni', encoding="utf-8")
+
+    assert run(str(papers), "-o", str(output), "--buffer-size", "1") == ["p{}".format(number) for number in range(4, 10)]
+    assert output.read_text(encoding="utf-8") == expected
+    assert read_checkpoint(str(checkpoint))[0] == {"p{}".format(number) for number in range(10)}
+
+    # nothing left to classify
+    assert run(str(papers), "-o", str(output)) == []
+    assert output.read_text(encoding="utf-8") == expected
+
+    # restarting from scratch
+    assert len(run(str(papers), "-o", str(output), "--restart")) == 10
+    assert output.read_text(encoding="utf-8") == expected
@@ -0,0 +1,231 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from cso_classifier.columnar import (CachedModelView, FlagView, KeyedView, ListView, StringTable, StringView, decode_results, encode_cached_model,
+                                     encode_flags, encode_lists, encode_results, encode_strings, read_arrays, write_arrays)
+from cso_classifier.ontology import COMPILED_VIEWS, Ontology
+from cso_classifier.result import Result
+
+from conftest import synthetic_triples, write_triples
+
+
+def make_result(syntactic: list, semantic: list, enhanced: dict, explanation: bool = False, get_weights: bool = False,
+                filter_output: bool = False) -> dict:
+    """ Functionality that returns the output of the classifier for a paper, as created by CSOClassifier."""
+    result = Result(explanation, get_weights, filter_output)
+    result.dump_temporary_explanation({topic: {"chunk about " + topic, "another chunk"} for topic in syntactic + semantic})
+    result.set_syntactic(syntactic)
+    result.set_semantic(semantic)
+    result.set_enhanced({topic: {"matched": len(narrowers), "broader of": narrowers} for topic, narrowers in enhanced.items()})
+    if get_weights:
+        result.set_syntactic_topics_weights({topic: 1.0 / (position + 1) for position, topic in enumerate(syntactic)})
+        result.set_semantic_topics_weights({topic: 0.5 + position / 10 for position, topic in enumerate(semantic)})
+    if filter_output:
+        result.set_filtered_syntactic(syntactic[:1])
+        result.set_filtered_semantic(semantic[:1])
+        result.set_filtered_union(result.get_union()[:1])
+        result.set_filtered_enhanced(result.get_enhanced()[:1])
+    return result.get_dict()
+
+
+PAPERS = [(["social networks", "data mining"], ["social networks", "graph theory"], {"computer science": ["data mining"]}),
+          ([], ["privacy"], {}),
+          ([], [], {}),
+          (["ontology", "semantic web"], [], {"knowledge representation": ["ontology"], "computer science": ["ontology", "semantic web"]}),
+          (["été", "naïve bayes"], ["naïve bayes"], {})]
+
+
+@pytest.mark.parametrize("explanation", [False, True])
+@pytest.mark.parametrize("get_weights", [False, True])
+@pytest.mark.parametrize("filter_output", [False, True])
+def test_roundtrip_of_results(explanation: bool, get_weights: bool, filter_output: bool) -> None:
+    results = {"paper{}".format(number): make_result(*paper, explanation, get_weights, filter_output) for number, paper in enumerate(PAPERS)}
+    encoded = encode_results(results)
+    assert "results" not in encoded # compactly encoded
+    decoded = decode_results(pickle.loads(pickle.dumps(encoded))) # as sent by the workers
+    assert decoded == results
+    assert list(decoded) == list(results)
+    assert [list(result) for result in decoded.values()] == [list(result) for result in results.values()]
+
+
+def test_roundtrip_of_empty_results() -> None:
+    assert decode_results(encode_results(dict())) == dict()
+
+    results = {"paper": make_result([], [], {}, True, True, True)}
+    encoded = encode_results(results)
+    assert "results" not in encoded
+    assert decode_results(encoded) == results
+
+
+def test_roundtrip_of_weights() -> None:
+    results = {"paper1": {"syntactic_weights": {"a": 1.0, "b": 0.1 + 0.2}, "semantic_weights": {}},
+               "paper2": {"syntactic_weights": {}, "semantic_weights": {"b": 1e-300, "c": 0.3333333333333333}}}
+    encoded = encode_results(results)
+    assert "results" not in encoded
+    assert decode_results(encoded) == results
+
+
+@pytest.mark.parametrize("results", [
+    {"paper1": {"union": ["a"]}, "paper2": {"union": ["a"], "enhanced": []}},                     # different fields
+    {"paper1": {"union": ["a"]}, "paper2": {"union": {"a": 1.0}}},                                # list and dict
+    {"paper1": {"union": "a"}},                                                                   # not a list or dict
+    {"paper1": {"syntactic_weights": {"a": 1}}},                                                  # integer weights
+    {"paper1": {"syntactic_weights": {"a": 1.0}}, "paper2": {"syntactic_weights": {"a": ["b"]}}}, # numbers and lists
+    {"paper1": {"explanation": {"a": "b"}}},                                                      # strings
+    {"paper1": {"union": [""]}},                                                                  # empty string
+    {"paper1": {"explanation": {"a": ["a chunk\nover two lines"]}}},                              # separator
+    {"paper1": {"union": ["a"], "explanation": None}},                                            # None
+])
+def test_fallback_to_raw_results(results: dict) -> None:
+    encoded = encode_results(results)
+    assert encoded == {"results": results}
+    assert decode_results(encoded) == results
+
+
+def test_encoded_results_are_arrays() -> None:
+    results = {"paper{}".format(number): make_result(*paper, True, True) for number, paper in enumerate(PAPERS)}
+    encoded = encode_results(results)
+    for column in encoded["fields"].values():
+        assert all(isinstance(value, np.ndarray) for name, value in column.items() if name not in ("kind", "values"))
+
+
+STRING_ITEMS = {"machine learning": "machine learning", "ml": "machine learning", "ontologies": "ontology", "été": "summer"}
+LIST_ITEMS = {"mach": ["machine learning", "machine translation"], "onto": ["ontology", "ontologies"], "summ": ["summer"],
+              "empt": [], "été ": ["été"]}
+
+
+def make_views(tmp_path) -> tuple:
+    """ Functionality that writes and memory-maps a compiled set of dicts, as done for the ontology."""
+    labels = dict.fromkeys(list(STRING_ITEMS) + list(STRING_ITEMS.values()) + list(LIST_ITEMS) +
+                           [value for values in LIST_ITEMS.values() for value in values] + ["other label"])
+    arrays = {"strings": StringTable.encode(list(labels))}
+    strings = StringTable(arrays["strings"])
+    for name, encode, items in (("flags", encode_flags, STRING_ITEMS), ("strings_of", encode_strings, STRING_ITEMS), ("lists", encode_lists, LIST_ITEMS)):
+        arrays.update({"{}.{}".format(name, array_name): array for array_name, array in encode(strings, items).items()})
+    path = str(tmp_path / "compiled.bin")
+    write_arrays(path, arrays, {"format": 1})
+    arrays, metadata = read_arrays(path)
+    assert metadata == {"format": 1}
+
+    strings = StringTable(arrays["strings"])
+    def get_arrays(name: str) -> list:
+        return [array for array_name, array in arrays.items() if array_name.startswith(name + ".")]
+    return (FlagView(strings, *get_arrays("flags")), StringView(strings, *get_arrays("strings_of")), ListView(strings, *get_arrays("lists")))
+
+
+def assert_like_dict(view, expected: dict) -> None:
+    assert len(view) == len(expected)
+    assert list(view) == list(expected)
+    assert list(view.keys()) == list(expected.keys())
+    assert list(view.items()) == list(expected.items())
+    assert dict(view) == expected
+    for key, value in expected.items():
+        assert key in view
+        assert view[key] == value
+        assert view.get(key) == value
+        assert view.get(key, "default") == value
+    for missing in ("other label", "missing", "", "machine", 1, None, ("mach",)):
+        assert missing not in view
+        assert view.get(missing) is None
+        assert view.get(missing, "default") == "default"
+        with pytest.raises(KeyError):
+            view[missing]
+
+
+def test_views_behave_like_dicts(tmp_path) -> None:
+    flags, strings_of, lists = make_views(tmp_path)
+    assert_like_dict(flags, dict.fromkeys(STRING_ITEMS, True))
+    assert_like_dict(strings_of, STRING_ITEMS)
+    assert_like_dict(lists, LIST_ITEMS)
+
+
+def test_string_table_index(tmp_path) -> None:
+    labels = ["machine learning", "", "été", "machine", "machine learning systems", "a" * 40, "zeta"]
+    arrays = {"strings": StringTable.encode(labels)}
+    arrays.update({"strings.{}".format(name): array for name, array in StringTable.encode_index(labels).items()})
+    path = str(tmp_path / "strings.bin")
+    write_arrays(path, arrays, {})
+    arrays = read_arrays(path)[0]
+
+    missing = ["machine learnin", "Machine", "machine learning\0", "été\0", "a" * 41, "zzz"]
+    for index in ({"sorted": arrays["strings.sorted"], "ids": arrays["strings.ids"]}, None):
+        strings = StringTable(arrays["strings"], index)
+        strings.cache_size = 2
+        for _ in range(2):
+            assert [strings.get_id(label) for label in labels] == list(range(len(labels)))
+            assert [strings.get_id(label) for label in missing + [None, 1, ("zeta",)]] == [-1] * (len(missing) + 3)
+            assert len(strings.cache) <= 2
+        assert strings.get_ids(missing + labels).tolist() == [-1] * len(missing) + list(range(len(labels)))
+        assert strings.get_ids([]).tolist() == []
+    with pytest.raises(ValueError):
+        StringTable.encode_index(["null\0"])
+
+
+def test_views_define_their_values(tmp_path) -> None:
+    flags = make_views(tmp_path)[0]
+    with pytest.raises(TypeError):
+        KeyedView(flags.strings, flags.keys_ids)
+
+    class UndefinedView(KeyedView):
+        pass
+
+    with pytest.raises(TypeError):
+        UndefinedView(flags.strings, flags.keys_ids)
+
+
+def test_list_view_cache(tmp_path) -> None:
+    lists = make_views(tmp_path)[2]
+    lists.cache_size = 2
+    for _ in range(3):
+        for key, values in LIST_ITEMS.items():
+            assert lists[key] == values
+            assert lists[key] is lists[key] # decoded once
+            assert len(lists.cache) <= 2
+    assert_like_dict(lists, LIST_ITEMS)
+
+
+CACHED_MODEL = {"mach": [{"topic": "machine learning", "sim_t": 1.0, "wet": "machine_learning", "sim_w": 0.8},
+                         {"topic": "machine translation", "sim_t": 0.95, "wet": "machine_learning", "sim_w": 0.75}],
+                "onto": [{"topic": "ontology", "sim_t": 1, "wet": "ontologies", "sim_w": 1}],
+                "été ": [{"topic": "été", "sim_t": 0.9, "wet": "été", "sim_w": 0.7}], "empt": []}
+
+
+def test_cached_model_view(tmp_path) -> None:
+    path = str(tmp_path / "model.bin")
+    write_arrays(path, encode_cached_model(CACHED_MODEL), {})
+    model = CachedModelView(read_arrays(path)[0])
+    model.cache_size = 2
+    for _ in range(3):
+        for word, items in CACHED_MODEL.items():
+            assert word in model and "missing" not in model
+            assert model[word] == items
+            assert model.get(word) is model[word] # decoded once
+            assert len(model.cache) <= 2
+    assert_like_dict(model, dict(sorted(CACHED_MODEL.items(), key=lambda item: item[0].encode("utf-8"))))
+
+
+def test_compiled_ontology_behaves_like_dicts(tmp_path, use_directory) -> None:
+    use_directory(str(tmp_path))
+    write_triples(str(tmp_path / "assets" / "cso.csv"), synthetic_triples(20))
+    compiled = Ontology(silent = True)
+    expected = Ontology(load_ontology = False, silent = True)
+    expected._Ontology__load_triples(expected._Ontology__read_triples(expected.config.get_cso_path()))
+    expected._Ontology__generate_topic_stems()
+    expected._Ontology__get_all_branches()
+
+    for attr in expected.ontology_attr:
+        view = getattr(compiled, attr)
+        assert isinstance(view, COMPILED_VIEWS[attr])
+        if attr == 'all_broaders':
+            assert list(view) == list(expected.all_broaders)
+            assert all(set(view[topic]) == set(expected.all_broaders[topic]) for topic in expected.all_broaders)
+        else:
+            assert_like_dict(view, getattr(expected, attr))
+
+    # the strings are looked up in the index of the compiled file
+    assert all(isinstance(array, np.memmap) for array in compiled.strings.index.values())
+    topics = list(expected.topics)
+    assert compiled.get_topic_ids(["machine learning", "ontologies", "missing", "ontology"]).tolist() == \
+        [topics.index("machine learning"), topics.index("ontologies"), -1, topics.index("ontology")]
@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from cso_classifier.misc import get_similar_strings
+
+MetricLCS = pytest.importorskip("strsimpy.metric_lcs").MetricLCS
+
+
+LABELS = ["semantic web", "semantic webs", "web semantics", "ontology", "ontologies", "ontology engineering",
+          "machine learning", "deep learning", "learning", "social networks", "social network", "networks",
+          "computer vision", "vision", "data mining", "text mining", "information retrieval", "retrieval",
+          "a", "ab", "abc", "abcd", "x", ""]
+
+
+def metric_lcs_similar(first: str, second: str, max_distance: float = 0.5) -> bool:
+    """ Functionality that takes the decision of the previous implementation, based on strsimpy's MetricLCS."""
+    return MetricLCS().distance(first, second) < max_distance
+
+
+def fast_similar(first: str, second: str, max_distance: float = 0.5) -> bool:
+    return len(get_similar_strings([first], [second], max_distance)) > 0
+
+
+def mutate(label: str, generator: random.Random) -> str:
+    alphabet = "abcdefghijklmnopqrstuvwxyz "
+    characters = list(label)
+    for _ in range(generator.randint(0, max(1, len(characters) // 2))):
+        operation = generator.random()
+        position = generator.randint(0, len(characters))
+        if operation < 0.4 and position < len(characters):
+            del characters[position]
+        elif operation < 0.7:
+            characters.insert(position, generator.choice(alphabet))
+        elif position < len(characters):
+            characters[position] = generator.choice(alphabet)
+    return "".join(characters)
+
+
+@pytest.mark.parametrize("first", LABELS)
+@pytest.mark.parametrize("second", LABELS)
+def test_fixed_pairs_match_metric_lcs(first: str, second: str) -> None:
+    assert fast_similar(first, second) == metric_lcs_similar(first, second)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("abcd", "ab"),          # distance exactly 0.5: not similar
+    ("abcd", "abc"),         # distance 0.25
+    ("abcdef", "abc"),       # distance exactly 0.5
+    ("abcdef", "abcd"),      # distance 1/3
+    ("abcdef", "axbxcx"),    # LCS of 3 out of 6: exactly 0.5
+    ("abcdefgh", "abcdxxxx"),
+    ("abcdefgh", "abcdexxx"),
+])
+def test_threshold_boundary(first: str, second: str) -> None:
+    assert fast_similar(first, second) == metric_lcs_similar(first, second)
+    assert fast_similar(second, first) == metric_lcs_similar(second, first)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("", ""),
+    ("", "a"),
+    ("a", ""),
+    ("", "semantic web"),
+    ("a", "semantic web"),
+    ("web", "semantic web services and applications"),
+    ("semantic web", "semantic web services and applications for the world wide web"),
+])
+def test_empty_and_unequal_lengths(first: str, second: str) -> None:
+    assert fast_similar(first, second) == metric_lcs_similar(first, second)
+    assert fast_similar(second, first) == metric_lcs_similar(second, first)
+
+
+@pytest.mark.parametrize("max_distance", [0.2, 0.5, 0.8])
+def test_random_pairs_match_metric_lcs(max_distance: float) -> None:
+    generator = random.Random(42)
+    labels = [label for label in LABELS if label]
+    for _ in range(2000):
+        first = generator.choice(labels)
+        second = mutate(first, generator) if generator.random() < 0.7 else generator.choice(labels)
+        assert fast_similar(first, second, max_distance) == metric_lcs_similar(first, second, max_distance), (first, second)
+
+
+def test_many_strings_and_candidates() -> None:
+    generator = random.Random(7)
+    labels = [label for label in LABELS if label]
+    strings = generator.sample(labels, 5)
+    candidates = [mutate(generator.choice(labels), generator) for _ in range(500)]
+    expected = {candidate for candidate in candidates if any(metric_lcs_similar(string, candidate) for string in strings)}
+    assert get_similar_strings(strings, candidates) == expected
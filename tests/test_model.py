@@ -0,0 +1,130 @@
+import os
+import pickle
+
+import numpy as np
+from gensim.models import KeyedVectors
+
+from cso_classifier.model import Model
+from cso_classifier.ontology import Ontology
+
+from conftest import synthetic_triples, write_triples
+
+
+def write_word2vec_model(path: str, words: list, seed: int = 0) -> KeyedVectors:
+    """ Functionality that saves a small word2vec model, with a random vector for each word, as loaded by Model."""
+    model = KeyedVectors(vector_size = 8)
+    model.add_vectors(words, np.random.default_rng(seed).normal(size = (len(words), 8)).astype(np.float32))
+    with open(path, "wb") as file:
+        pickle.dump(model, file)
+    return model
+
+
+def expected_embeddings(model: KeyedVectors, topics: list) -> np.ndarray:
+    embeddings = np.zeros((len(topics), model.vector_size), dtype=np.float32)
+    for topic_id, topic in enumerate(topics):
+        terms = [topic.replace(" ", "_")] if topic.replace(" ", "_") in model.key_to_index else topic.split(" ")
+        for term in terms:
+            if term in model.key_to_index:
+                embeddings[topic_id] += model[term]
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return np.divide(embeddings, norms, out=np.zeros_like(embeddings), where=norms > 0)
+
+
+def load_ontology(directory: str, triples: list) -> Ontology:
+    """ Functionality that replaces the ontology in the directory, and loads it."""
+    for name in ("cso_compiled.bin", "cso_graph.p", "cso_distances.npy"):
+        if os.path.exists(os.path.join(directory, "assets", name)):
+            os.remove(os.path.join(directory, "assets", name))
+    write_triples(os.path.join(directory, "assets", "cso.csv"), triples)
+    return Ontology(silent = True)
+
+
+def test_topic_embeddings_follow_the_topics(tmp_path, use_directory) -> None:
+    directory = use_directory(str(tmp_path))
+    triples = synthetic_triples()
+    cso = load_ontology(directory, triples)
+    words = sorted({word for topic in cso.topics for word in topic.split(" ")}) + ["semantic_web", "renamed"]
+    word2vec = write_word2vec_model(os.path.join(directory, "assets", "model.p"), words)
+
+    model = Model(load_model = False, silent = True)
+    model.load_topic_embeddings(cso)
+    assert np.allclose(model.topic_embeddings, expected_embeddings(word2vec, list(cso.topics)))
+    assert os.path.exists(model.config.get_topic_embeddings_path() + ".fingerprint")
+    assert [name for name in os.listdir(os.path.join(directory, "assets")) if ".tmp" in name] == []
+
+    # loaded again without being created
+    created = os.stat(model.config.get_topic_embeddings_path()).st_mtime_ns
+    model = Model(load_model = False, silent = True)
+    model.load_topic_embeddings(cso)
+    assert os.stat(model.config.get_topic_embeddings_path()).st_mtime_ns == created
+
+    # same number of topics, one of them renamed
+    renamed = [tuple("renamed" if value == "databases" else value for value in triple) for triple in triples]
+    cso = load_ontology(directory, renamed)
+    model = Model(load_model = False, silent = True)
+    model.load_topic_embeddings(cso)
+    assert np.allclose(model.topic_embeddings, expected_embeddings(word2vec, list(cso.topics)))
+
+    # same topics, in a different order
+    labels = [triple for triple in renamed if triple[1] == "rdfs:label"]
+    cso = load_ontology(directory, labels[::-1] + [triple for triple in renamed if triple[1] != "rdfs:label"])
+    model = Model(load_model = False, silent = True)
+    model.load_topic_embeddings(cso)
+    assert np.allclose(model.topic_embeddings, expected_embeddings(word2vec, list(cso.topics)))
+
+
+def test_update_of_topic_embeddings(tmp_path, use_directory) -> None:
+    directory = use_directory(str(tmp_path))
+    triples = synthetic_triples()
+    cso = load_ontology(directory, triples)
+    words = sorted({word for topic in cso.topics for word in topic.split(" ")}) + ["quantum_computing", "new"]
+    word2vec = write_word2vec_model(os.path.join(directory, "assets", "model.p"), words)
+    Model(load_model = False, silent = True).load_topic_embeddings(cso)
+    previous_topics = list(cso.topics)
+
+    cso = load_ontology(directory, [("new topic", "rdfs:label", "new topic")] + [triple for triple in triples if "databases" not in triple])
+    model = Model(load_model = False, silent = True)
+    model.update_topic_embeddings(cso, previous_topics)
+    model.load_topic_embeddings(cso)
+    assert np.allclose(model.topic_embeddings, expected_embeddings(word2vec, list(cso.topics)))
+
+    # the previous topics do not match the ones of the matrix: it is created from scratch
+    model = Model(load_model = False, silent = True)
+    model.update_topic_embeddings(cso, previous_topics[::-1])
+    model.load_topic_embeddings(cso)
+    assert np.allclose(model.topic_embeddings, expected_embeddings(word2vec, list(cso.topics)))
+
+
+def merge_by_counting(model: dict, grams: list) -> list:
+    """ Functionality that merges the topics of the tokens of an n-gram as Semantic did before the merge was moved to
+    Model: counting the occurrences of each topic over the lists of the tokens found in the cached model.
+    """
+    items, counts = dict(), dict()
+    for gram in grams:
+        for topic_item in model.get(gram, []):
+            items[topic_item["topic"]] = topic_item
+            counts[topic_item["topic"]] = counts.get(topic_item["topic"], 0) + 1
+    return [items[topic] for topic, count in counts.items() if count >= len(grams)]
+
+
+def test_merged_words_match_counting() -> None:
+    rng = np.random.default_rng(0)
+    topics = ["topic_{}".format(number) for number in range(12)]
+    words = ["word_{}".format(number) for number in range(8)]
+    cached_model = {word: [{"topic": topics[topic], "sim_t": float(position), "wet": word, "sim_w": 0.5}
+                           for position, topic in enumerate(rng.integers(0, len(topics), size=rng.integers(0, 10)))]
+                    for word in words}
+    cached_model["repeated"] = [{"topic": topic, "sim_t": float(position), "wet": "repeated", "sim_w": 0.5}
+                                for position, topic in enumerate(["topic_1", "topic_2", "topic_1", "topic_1"])]
+    model = Model(load_model = False, silent = True)
+    model.model = cached_model
+
+    # topics repeated within the list of a token count more than once, and tokens missing from the model are skipped
+    assert model.get_merged_words_from_model(["repeated", "missing"]) == [cached_model["repeated"][3]]
+    assert model.get_merged_words_from_model(["repeated", "repeated", "repeated"]) == [cached_model["repeated"][3], cached_model["repeated"][1]]
+    assert model.get_merged_words_from_model(["missing", "missing"]) == []
+
+    for _ in range(500):
+        grams = list(rng.choice(words + ["repeated", "missing"], size=rng.integers(2, 4)))
+        assert model.get_merged_words_from_model(grams) == merge_by_counting(cached_model, grams), grams
+        assert model.get_merged_words_from_model(tuple(grams)) == merge_by_counting(cached_model, grams), grams # from the cache
@@ -0,0 +1,191 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from cso_classifier.ontology import UNREACHABLE_DISTANCE, Ontology
+
+from conftest import synthetic_triples, write_triples
+
+
+def build(use_directory, directory: str, triples: list) -> Ontology:
+    """ Functionality that builds all the artifacts of an ontology from scratch, and loads it."""
+    use_directory(directory)
+    write_triples(os.path.join(directory, "assets", "cso.csv"), triples)
+    ontology = Ontology(silent = True)
+    ontology.read_distance_oracle()
+    return ontology
+
+
+def assert_same_ontology(found: Ontology, expected: Ontology) -> None:
+    for attr in expected.ontology_attr:
+        if attr == 'all_broaders':
+            assert list(found.all_broaders) == list(expected.all_broaders)
+            for topic in expected.all_broaders:
+                assert set(found.all_broaders[topic]) == set(expected.all_broaders[topic]), topic
+        else:
+            assert list(getattr(found, attr).items()) == list(getattr(expected, attr).items()), attr
+
+    topics = list(expected.topics)
+    assert np.array_equal(found.get_graph_distances_in_topics(topics), expected.get_graph_distances_in_topics(topics))
+    for topic in topics:
+        assert found.get_all_descendants_of_topic(topic) == expected.get_all_descendants_of_topic(topic), topic
+    assert found.climb_ontology(topics, 'all') == expected.climb_ontology(topics, 'all')
+    assert sorted(found.get_ontology_graph().get_edgelist()) == sorted(expected.get_ontology_graph().get_edgelist())
+
+
+def update(directory: str, triples: list) -> Ontology:
+    """ Functionality that replaces the csv of the ontology in the directory and updates its artifacts incrementally."""
+    previous_path = os.path.join(directory, "assets", "cso.csv.previous")
+    os.replace(os.path.join(directory, "assets", "cso.csv"), previous_path)
+    write_triples(os.path.join(directory, "assets", "cso.csv"), triples)
+    Ontology(load_ontology = False, silent = True)._Ontology__update_from_previous_version(previous_path)
+    return Ontology(silent = True)
+
+
+# with 200 more topics, only a few distances change and the oracle is updated in place, otherwise it is created again
+@pytest.mark.parametrize("extra_topics", [0, 200])
+def test_update_from_previous_version_matches_full_build(tmp_path, use_directory, extra_topics: int) -> None:
+    previous_triples = synthetic_triples(extra_topics)
+    triples = [triple for triple in previous_triples
+               if triple not in {("computer networks", "klink:broaderGeneric", "social networks"),    # removed edge
+                                 ("semantic web", "klink:broaderGeneric", "ontology"),               # removed edge
+                                 ("semantic web technologies", "klink:primaryLabel", "semantic web")} # changed below
+               and "reinforcement learning" not in triple]                                           # renamed below
+    triples = triples[:5] + [("reinforcement learning", "rdfs:label", "reinforcement learning"),    # renamed topic
+                             ("graph neural networks", "rdfs:label", "graph neural networks")] + triples[5:] # new topic
+    triples += [("machine learning", "klink:broaderGeneric", "reinforcement learning"),
+                ("deep learning", "klink:broaderGeneric", "graph neural networks"),                  # edges of the new topic
+                ("social networks", "klink:broaderGeneric", "graph neural networks"),
+                ("artificial intelligence", "klink:broaderGeneric", "data mining"),                  # added edges
+                ("quantum computing", "klink:broaderGeneric", "databases"),
+                ("semantic web technologies", "klink:primaryLabel", "semantic web technologies")]    # changed label
+
+    previous_triples = [triple if "reinforcement learning" not in triple else tuple(
+        "reinforcement-learning" if value == "reinforcement learning" else value for value in triple) for triple in previous_triples]
+
+    directory = str(tmp_path / "updated")
+    build(use_directory, directory, previous_triples)
+    updated = update(directory, triples)
+
+    expected = build(use_directory, str(tmp_path / "rebuilt"), triples)
+    use_directory(directory)
+    assert_same_ontology(updated, expected)
+
+
+def test_update_of_edges_only(tmp_path, use_directory) -> None:
+    previous_triples = synthetic_triples(200)
+    triples = [triple for triple in previous_triples if triple != ("machine learning", "klink:broaderGeneric", "deep learning")]
+    triples += [("artificial intelligence", "klink:broaderGeneric", "deep learning"), ("computer science", "klink:broaderGeneric", "data mining")]
+
+    directory = str(tmp_path / "updated")
+    build(use_directory, directory, previous_triples)
+    updated = update(directory, triples)
+
+    expected = build(use_directory, str(tmp_path / "rebuilt"), triples)
+    use_directory(directory)
+    assert_same_ontology(updated, expected)
+
+
+def test_update_without_changes(tmp_path, use_directory) -> None:
+    directory = str(tmp_path / "updated")
+    build(use_directory, directory, synthetic_triples(200))
+    updated = update(directory, synthetic_triples(200))
+
+    expected = build(use_directory, str(tmp_path / "rebuilt"), synthetic_triples(200))
+    use_directory(directory)
+    assert_same_ontology(updated, expected)
+
+
+def test_distance_oracle_follows_the_ontology(tmp_path, use_directory) -> None:
+    directory = str(tmp_path / "changed")
+    triples = synthetic_triples()
+    build(use_directory, directory, triples)
+    assets = os.path.join(directory, "assets")
+    assert os.path.exists(os.path.join(assets, "cso_distances.npy.fingerprint"))
+    assert [name for name in os.listdir(assets) if ".tmp" in name] == []
+
+    # the compiled ontology is replaced by one with the same number of topics (one of them renamed, with a
+    # different broader), while the previous oracle is still on disk
+    changed = [triple for triple in triples if triple != ("computer networks", "klink:broaderGeneric", "social networks")]
+    changed = [tuple("renamed" if value == "databases" else value for value in triple) for triple in changed]
+    changed += [("quantum computing", "klink:broaderGeneric", "social networks")]
+    expected = build(use_directory, str(tmp_path / "rebuilt"), changed)
+    shutil.copy(str(tmp_path / "rebuilt" / "assets" / "cso_compiled.bin"), os.path.join(assets, "cso_compiled.bin"))
+
+    use_directory(directory)
+    found = Ontology(silent = True)
+    found.read_distance_oracle()
+    topics = list(expected.topics)
+    assert len(found.distances) == len(expected.distances)
+    assert np.array_equal(found.distances, expected.distances)
+    assert np.array_equal(found.get_graph_distances_in_topics(topics), expected.get_graph_distances_in_topics(topics))
+
+
+def test_distance_oracle_without_fingerprint(tmp_path, use_directory) -> None:
+    directory = str(tmp_path / "ontology")
+    expected = build(use_directory, directory, synthetic_triples())
+    distances = np.array(expected.distances)
+    path = expected.config.get_cso_distances_path()
+    os.remove(path + ".fingerprint")
+    np.save(path, np.zeros_like(distances))
+
+    found = Ontology(silent = True)
+    found.read_distance_oracle()
+    assert np.array_equal(found.distances, distances)
+
+
+def test_distance_oracle_matches_shortest_paths(tmp_path, use_directory) -> None:
+    ontology = build(use_directory, str(tmp_path), synthetic_triples(20))
+    topics = list(ontology.topics)
+    graph = ontology.get_ontology_graph()
+
+    expected = np.array(graph.distances(topics, topics))
+    expected[np.isinf(expected) | (expected >= UNREACHABLE_DISTANCE)] = 99
+    assert np.array_equal(ontology.get_graph_distances_in_topics(topics), expected.astype(int))
+    assert (expected == 99).any() # e.g., quantum computing
+
+    # pairs of topics, in any order, with repetitions and topics that are not in the ontology
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        sample = [topics[position] for position in rng.integers(0, len(topics), size=8)] + ["not a topic"]
+        rng.shuffle(sample)
+        found = ontology.get_graph_distances_in_topics(sample)
+        for row, first in enumerate(sample):
+            for column, second in enumerate(sample):
+                if "not a topic" in (first, second):
+                    assert found[row][column] == 99
+                else:
+                    assert found[row][column] == expected[topics.index(first)][topics.index(second)]
+
+
+def get_broaders_by_fixed_point(ontology: Ontology, found_topics: list) -> dict:
+    """ Functionality that finds all the broaders of the topics as climb_ontology did before the ancestor closure:
+    calling get_broader_of_topics until no more broaders are found.
+    """
+    all_broaders = dict()
+    while True:
+        previous = {topic: set(narrowers) for topic, narrowers in all_broaders.items()}
+        all_broaders = ontology.get_broader_of_topics(found_topics, all_broaders)
+        if previous == all_broaders:
+            return all_broaders
+
+
+def test_enhancement_matches_fixed_point(tmp_path, use_directory) -> None:
+    ontology = build(use_directory, str(tmp_path), synthetic_triples(20))
+    topics = list(ontology.topics)
+    rng = np.random.default_rng(0)
+    samples = [topics, [], ["not a topic"], ["computer science"], ["deep learning", "ontologies", "sentiment analysis"]]
+    samples += [[topics[position] for position in rng.choice(len(topics), size=size, replace=False)] for size in (1, 2, 5, 10, 30) for _ in range(10)]
+
+    for found_topics in samples:
+        expected = get_broaders_by_fixed_point(ontology, found_topics)
+        assert ontology.get_all_broaders_of_topics(found_topics) == expected, found_topics
+
+        inferred_topics = dict()
+        for broader, narrowers in expected.items():
+            inferred_topics.setdefault(ontology.get_primary_label(broader), set()).update(narrowers)
+        found = ontology.climb_ontology(found_topics, 'all')
+        assert {topic: set(inferred["broader of"]) for topic, inferred in found.items()} == inferred_topics, found_topics
+        assert all(inferred["matched"] == len(inferred["broader of"]) for inferred in found.values())
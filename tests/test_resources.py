@@ -0,0 +1,101 @@
+import pytest
+
+from cso_classifier.classifier import CSOClassifier
+from cso_classifier.resources import ResourceHandle
+
+from conftest import requires_fork
+
+
+class Loader:
+    """ Stands in for the loader of the ontology and the model, returning new placeholders at each call."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self) -> tuple:
+        self.calls += 1
+        return "ontology {}".format(self.calls), "model {}".format(self.calls)
+
+
+def test_set_and_unload() -> None:
+    loader = Loader()
+    handle = ResourceHandle(loader, silent = True)
+    handle.set(model = "my model")
+    assert handle.current.cso is None and not handle.current.is_complete() and loader.calls == 0
+
+    # the missing ontology is loaded when needed, and the model set is kept
+    with handle.acquire() as resources:
+        assert (resources.cso, resources.model) == ("ontology 1", "my model")
+        handle.set(cso = "my ontology")
+        assert (handle.current.cso, handle.current.model) == ("my ontology", "my model")
+        assert (resources.cso, resources.model) == ("ontology 1", "my model") # in use until released
+    assert resources.retired and resources.cso is None
+    assert handle.get() is handle.current and loader.calls == 1
+
+    handle.unload()
+    assert handle.current is None
+    assert (handle.get().cso, handle.get().model) == ("ontology 2", "model 2")
+
+
+def test_reload_while_in_use() -> None:
+    loader = Loader()
+    handle = ResourceHandle(loader, silent = True)
+    with handle.acquire() as resources:
+        assert (resources.cso, resources.version, resources.in_flight) == ("ontology 1", 1, 1)
+        handle.reload(wait = True)
+
+        # the new snapshot serves the following requests, while the old one is retired but still usable
+        assert (handle.current.cso, handle.current.model, handle.current.version, handle.versions) == ("ontology 2", "model 2", 2, 2)
+        assert resources.retired and (resources.cso, resources.model) == ("ontology 1", "model 1")
+        with handle.acquire() as new_resources:
+            assert new_resources is handle.current and not new_resources.retired
+        assert resources.in_flight == 1 and resources.cso == "ontology 1"
+
+    # and it is freed with its last request
+    assert resources.in_flight == 0 and resources.cso is None and resources.model is None
+    assert handle.current.cso == "ontology 2" and handle.current.in_flight == 0 and loader.calls == 2
+
+
+@requires_fork
+def test_reload_replaces_the_pools(monkeypatch: pytest.MonkeyPatch) -> None:
+    loader = Loader()
+    monkeypatch.setattr(CSOClassifier, "_load_resources", lambda self, shared_arrays = None: loader())
+    monkeypatch.setattr(CSOClassifier, "_create_batch_modules", lambda self, cso, model, tagger = None: {"cso": cso, "model": model})
+    with CSOClassifier(silent = True) as classifier:
+        # the workers sharing the resources of this process hold them until they are replaced
+        pool = classifier.get_pool(1, share_resources = True)
+        shared = classifier.pool_resources
+        assert (shared.cso, shared.in_flight) == ("ontology 1", 1)
+        classifier.reload(wait = True)
+        assert shared.retired and shared.cso == "ontology 1"
+        assert classifier.get_pool(1, share_resources = True) is not pool
+        assert shared.cso is None and classifier.pool_resources.cso == "ontology 2"
+        with pytest.raises(ValueError):
+            pool.apply_async(len, ([],))
+
+        # the workers loading their own resources are replaced as well
+        pool = classifier.get_pool(1)
+        assert classifier.get_pool(1) is pool and classifier.pool_resources is None
+        classifier.reload(wait = True)
+        assert classifier.get_pool(1) is not pool
+        assert classifier.cso == "ontology 3"
+
+
+def test_classifier_resources_can_be_set() -> None:
+    classifier = CSOClassifier(silent = True)
+    classifier.resources.loader = loader = Loader()
+    assert not classifier.models_loaded and classifier.cso is None and classifier.model is None
+
+    classifier.cso = "my ontology"
+    classifier.model = "my model"
+    classifier.models_loaded = True
+    assert classifier.models_loaded and loader.calls == 0
+    assert (classifier.cso, classifier.model) == ("my ontology", "my model")
+    with classifier.resources.acquire() as resources:
+        assert (resources.cso, resources.model) == ("my ontology", "my model")
+
+    classifier.models_loaded = False
+    assert not classifier.models_loaded and classifier.cso is None
+    classifier.model = "another model"
+    classifier.models_loaded = True
+    assert (classifier.cso, classifier.model) == ("ontology 1", "another model")
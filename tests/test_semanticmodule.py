@@ -0,0 +1,111 @@
+import os
+from typing import Any, Dict, List, Tuple, Union
+
+import pytest
+from nltk import everygrams
+
+from cso_classifier.ontology import Ontology
+from cso_classifier.semanticmodule import Semantic
+
+from conftest import synthetic_triples, write_triples
+
+
+# chunks of a paper in which the same unigrams, bigrams and trigrams recur, within and across chunks
+CONCEPTS = ["deep learning", "machine learning", "deep learning for social networks", "deep learning",
+            "online social networks", "social networks", "ontologies", "semantic web ontologies", "ontology",
+            "linked data", "deep learning", "learning", "text mining text mining", "quantum computing",
+            "semantic web technologies", "databases", "recurrent neural networks", "neural networks"]
+
+
+class StubModel:
+    """ Stands in for the cached and the full word2vec models: every topic is similar to itself and each of its words
+    is similar to the topic, with deterministic similarities. A few words match topics too loosely, or words that are not
+    topics, to exercise the filters.
+    """
+
+    def __init__(self, topics: List[str]) -> None:
+        self.words = dict()
+        for topic in topics:
+            self.words.setdefault(topic.replace(" ", "_"), []).append((topic.replace(" ", "_"), 1.0, 1.0))
+            for position, word in enumerate(topic.split(" ")):
+                self.words.setdefault(word, []).append((topic.replace(" ", "_"), 0.9 + 0.01 * (position % 10), 0.6 + 0.01 * (len(topic) % 30)))
+        self.words.setdefault("learning", []).append(("learning_theory", 0.95, 0.7))     # not a topic
+        self.words.setdefault("networks", []).append(("computer_networks", 0.5, 0.9))    # not similar enough
+
+    def check_word_in_model(self, word: str) -> bool:
+        return word in self.words
+
+    def get_words_from_model(self, word: str) -> List[Dict[str, Any]]:
+        return [{"topic": topic, "sim_t": sim_t, "wet": word, "sim_w": sim_w} for topic, sim_t, sim_w in self.words.get(word, [])]
+
+    def get_merged_words_from_model(self, grams: Union[Tuple[str, ...], List[str]]) -> List[Dict[str, Any]]:
+        shared = set.intersection(*[{topic for topic, _, _ in self.words.get(gram, [])} for gram in grams])
+        return [item for item in self.get_words_from_model(grams[-1]) if item["topic"] in shared]
+
+    def check_word_in_full_model(self, word: str) -> bool:
+        return word in self.words
+
+    def get_top_similar_words_from_full_model(self, grams: Union[str, List[str]]) -> List[Tuple[str, float]]:
+        grams = [grams] if isinstance(grams, str) else grams
+        return [(topic, sim_w) for gram in grams for topic, _, sim_w in self.words.get(gram, []) if topic != gram]
+
+
+def find_topics_per_occurrence(semantic: Semantic, concepts: List[str]) -> Tuple[Dict[str, Any], Dict[str, set]]:
+    """ Functionality that finds the topics as Semantic did before resolving each unique gram once: every occurrence
+    of a gram is looked up in the model and accounted for separately.
+    """
+    found_topics = dict()
+    explanation = dict()
+    for concept in concepts:
+        for grams in everygrams(concept.split(), 1, 3):
+            gram = "_".join(grams)
+            if semantic.fast_classification:
+                list_of_matched_topics = semantic._Semantic__get_similar_words_from_cached_model(gram, grams)
+            else:
+                list_of_matched_topics = semantic._Semantic__get_similar_words_from_full_model(gram, grams)
+            for topic_item in list_of_matched_topics:
+                topic, str_sim, wet, sim = topic_item["topic"], topic_item["sim_t"], topic_item["wet"], topic_item["sim_w"]
+                if str_sim >= semantic.min_similarity and topic in semantic.cso.topics_wu:
+                    if topic in found_topics:
+                        found_topics[topic]["times"] += 1
+                        found_topics[topic]["gram_similarity"].append(sim)
+                        found_topics[topic]["grams"][gram] = found_topics[topic]["grams"].get(gram, 0) + 1
+                        if str_sim > found_topics[topic]["embedding_similarity"]:
+                            found_topics[topic]["embedding_similarity"] = str_sim
+                            found_topics[topic]["embedding_matched"] = wet
+                    else:
+                        found_topics[topic] = {'grams': {gram: 1}, 'embedding_matched': wet, 'embedding_similarity': str_sim,
+                                               'gram_similarity': [sim], 'times': 1, 'topic': topic}
+                    if sim == 1:
+                        found_topics[topic]["syntactic"] = True
+                    explanation.setdefault(semantic.cso.get_primary_label_wu(topic), set()).add(" ".join(grams))
+    return found_topics, explanation
+
+
+@pytest.fixture
+def cso(tmp_path, use_directory) -> Ontology:
+    directory = use_directory(str(tmp_path))
+    write_triples(os.path.join(directory, "assets", "cso.csv"), synthetic_triples())
+    return Ontology(silent = True)
+
+
+@pytest.mark.parametrize("fast_classification", [True, False])
+def test_unique_grams_match_every_occurrence(cso: Ontology, fast_classification: bool) -> None:
+    semantic = Semantic(StubModel(list(cso.topics)), cso, fast_classification)
+
+    found_topics, explanation = semantic._Semantic__find_topics(CONCEPTS)
+    expected_topics, expected_explanation = find_topics_per_occurrence(semantic, CONCEPTS)
+    assert explanation == expected_explanation
+    assert len(found_topics) > 0 and list(found_topics) == list(expected_topics)
+    for topic, expected in expected_topics.items():
+        found = found_topics[topic]
+        # the similarities are the same, grouped by gram rather than in order of occurrence
+        assert sorted(found.pop("gram_similarity")) == sorted(expected.pop("gram_similarity")), topic
+        assert list(found["grams"].items()) == list(expected["grams"].items()), topic
+        assert found == expected, topic
+    assert any(topic["times"] > len(topic["grams"]) for topic in found_topics.values()) # repeated grams
+
+    # and so is the outcome of the classification
+    output = semantic.classify_chunks(CONCEPTS)
+    semantic._Semantic__find_topics = lambda concepts: find_topics_per_occurrence(semantic, concepts)
+    assert output == semantic.classify_chunks(CONCEPTS)
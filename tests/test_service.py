@@ -0,0 +1,83 @@
+import threading
+import time
+from typing import Any, Callable, Dict
+
+import pytest
+
+from cso_classifier.classifier import CSOClassifier
+from cso_classifier.service import MicroBatcher
+
+
+@pytest.fixture
+def classifier() -> CSOClassifier:
+    """ Fixture returning a classifier whose threads, rather than classifying the papers, return their lane. The batches
+    of the bulk lane wait for the event classifier.release.
+    """
+    classifier = CSOClassifier(silent = True)
+    classifier.release = threading.Event()
+
+    def run_in_thread(papers: Dict[str, Any]) -> Dict[str, Any]:
+        if any(paper["lane"] == "bulk" for paper in papers.values()):
+            assert classifier.release.wait(10)
+        return {"results": {paper_id: {"lane": paper["lane"]} for paper_id, paper in papers.items()},
+                "worker": threading.get_ident(), "memory": None, "time": 0.0}
+
+    classifier._run_in_thread = run_in_thread
+    yield classifier
+    classifier.release.set()
+    classifier.close()
+
+
+def wait_for(condition: Callable[[], bool], timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+def test_bulk_requests_do_not_take_the_reserved_workers(classifier: CSOClassifier) -> None:
+    batcher = MicroBatcher(classifier, workers = 3, max_batch_size = 2, max_wait = 0, reserved_workers = 1, threads = True)
+    bulk = batcher.submit({"bulk {}".format(number): {"lane": "bulk"} for number in range(20)}, "bulk")
+    more_bulk = batcher.submit({"more bulk": {"lane": "bulk"}}, "bulk")
+    assert wait_for(lambda: batcher.get_statistics()["lanes"]["bulk"]["in_flight_batches"] == 2)
+
+    # the bulk batches hold all the workers but the reserved one, which keeps answering the interactive requests
+    for number in range(10):
+        assert batcher.classify({"paper": {"lane": "interactive"}}, timeout = 5) == {"paper": {"lane": "interactive"}}
+        statistics = batcher.get_statistics()["lanes"]
+        assert statistics["bulk"]["in_flight_batches"] == 2 and statistics["bulk"]["queued_papers"] == 17
+    assert not bulk.done() and not more_bulk.done()
+    assert batcher.get_statistics()["lanes"]["interactive"]["requests"] == 10
+
+    classifier.release.set()
+    assert bulk.result(5) == {"bulk {}".format(number): {"lane": "bulk"} for number in range(20)}
+    assert more_bulk.result(5) == {"more bulk": {"lane": "bulk"}}
+    batcher.close()
+
+
+def test_batch_mode_does_not_replace_the_workers_of_the_batcher(classifier: CSOClassifier) -> None:
+    classifier.release.set()
+    batcher = MicroBatcher(classifier, workers = 2, max_wait = 0, threads = True)
+    pool = batcher.pool
+
+    # batch mode with other workers, and then closing them
+    classifier.get_pool(3, threads = True)
+    classifier.close()
+
+    assert batcher.pool is pool
+    assert batcher.classify({"paper": {"lane": "interactive"}}, timeout = 5) == {"paper": {"lane": "interactive"}}
+    assert batcher.classify({"papers": {"lane": "bulk"}}, "bulk", timeout = 5) == {"papers": {"lane": "bulk"}}
+    batcher.close()
+
+
+def test_close_completes_the_requests_received(classifier: CSOClassifier) -> None:
+    batcher = MicroBatcher(classifier, workers = 2, max_batch_size = 4, max_wait = 0, threads = True)
+    bulk = batcher.submit({"bulk {}".format(number): {"lane": "bulk"} for number in range(10)}, "bulk")
+    threading.Timer(0.1, classifier.release.set).start()
+    batcher.close()
+
+    assert bulk.done() and len(bulk.result()) == 10
+    with pytest.raises(RuntimeError):
+        batcher.submit({"paper": {"lane": "interactive"}})